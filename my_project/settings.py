@@ -146,6 +146,23 @@ DATABASES = {
 
 DATABASE_ROUTERS = ["my_project.db_routers.ReportingRouter"]
 
+# Cached report payloads and the version tokens that invalidate cached data
+# (report models, work calendar, org chart) must be shared by every web worker and
+# management command, so they live in the database (run
+# `python manage.py createcachetable` once). "default" stays per process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "reports": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "time_management_report_cache",
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+REPORT_CACHE_ALIAS = "reports"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
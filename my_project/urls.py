@@ -25,7 +25,13 @@ from django.http import JsonResponse
 from time_management.views import MyTokenObtainPairView, run_biometric_sync
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from time_management.dtms_bio.views import dtms_event_summary, dtms_event_time
+from time_management.dtms_bio.views import (
+    dtms_event_summary,
+    dtms_event_summary_range,
+    dtms_event_time,
+    dtms_event_time_range,
+    dtms_event_time_stream,
+)
 
 urlpatterns = [
     path("api/test-debug/", lambda r: JsonResponse({"ok": True})),
@@ -39,6 +45,26 @@ urlpatterns = [
         dtms_event_summary,
         name="dtms_event_time",
     ),
+    path(
+        "api/dtms-event-time/from/<str:start_str>/to/<str:end_str>/",
+        dtms_event_time_range,
+        name="dtms_event_time_range",
+    ),
+    path(
+        "api/dtms-event-time/<str:start_str>/stream/",
+        dtms_event_time_stream,
+        name="dtms_event_time_stream",
+    ),
+    path(
+        "api/dtms-event-time/from/<str:start_str>/to/<str:end_str>/stream/",
+        dtms_event_time_stream,
+        name="dtms_event_time_range_stream",
+    ),
+    path(
+        "api/dtms-event-summary/from/<str:start_str>/to/<str:end_str>/",
+        dtms_event_summary_range,
+        name="dtms_event_summary_range",
+    ),
     path("api/token/", MyTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -39,6 +39,11 @@ from .models import (
     MonthlyLeaveAvailed,
     MonthlyLeaveBalance,
     LeaveDay,
+    IdSequence,
+    OrgClosure,
+    ProjectHoursDaily,
+    ReportJob,
+    SyncWatermark,
 )
 
 admin.site.register(Employee)
@@ -81,3 +86,8 @@ admin.site.register(LeaveOpeningBalance)
 admin.site.register(MonthlyLeaveAvailed)
 admin.site.register(MonthlyLeaveBalance)
 admin.site.register(LeaveDay)
+admin.site.register(IdSequence)
+admin.site.register(OrgClosure)
+admin.site.register(ProjectHoursDaily)
+admin.site.register(ReportJob)
+admin.site.register(SyncWatermark)
@@ -153,6 +153,11 @@ from time_management.reports.views import (
     weekly_employees,
     attrition_report,
     monthly_attendance_summary,
+    report_cache_metrics,
+    timesheet_pivot,
+    submit_report_job,
+    report_job_status,
+    report_job_download,
 )
 from time_management.variations.views import variation_api
 from time_management.building.views import (
@@ -315,6 +320,11 @@ urlpatterns = [
     path("employee-lop/", employee_lop_view),
     path("attrition-report/", attrition_report),
     path("monthly-attendance-report/", monthly_attendance_summary),
+    path("report-cache-stats/", report_cache_metrics),
+    path("timesheet-pivot/", timesheet_pivot),
+    path("report-jobs/", submit_report_job),
+    path("report-jobs/<str:job_id>/", report_job_status),
+    path("report-jobs/<str:job_id>/download/", report_job_download),
     path("leave-request/", leave_request_api),
     path("leave-request/<str:manager_id>/", leave_request_api),
     # Calendar
@@ -16,6 +16,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 class EmployeeSerializer(serializers.ModelSerializer):
@@ -1,3 +1,4 @@
+from django.db import models
 from rest_framework import serializers
 from ..models import (
     BiometricData,
@@ -67,6 +68,69 @@ class BiometricAttendanceDataSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+def biometric_task_context(rows):
+    """
+    Everything BiometricTaskDataSerializer shows next to a set of biometric
+    rows, loaded in a fixed number of queries: pass the result as the
+    serializer context (or let BiometricTaskListSerializer build it).
+    """
+    from time_management.leaves_available.views import comp_off_thresholds
+
+    rows = list(rows)
+    keys = {(row.employee_id, row.date) for row in rows if row.employee_id}
+    context = {
+        "calendar_map": {},
+        "leaveday_map": {},
+        "timesheet_map": {},
+        "employee_map": {},
+        "comp_off": comp_off_thresholds(),
+    }
+    if not rows:
+        return context
+
+    dates = {row.date for row in rows}
+    emp_ids = {emp_id for emp_id, _ in keys}
+    date_range = (min(dates), max(dates))
+
+    context["calendar_map"] = {
+        cal.date: cal for cal in Calendar.objects.filter(date__range=date_range)
+    }
+    context["employee_map"] = Employee.objects.in_bulk(emp_ids)
+
+    leave_rows = LeaveDay.objects.select_related("employee").filter(
+        employee_id__in=emp_ids, date__range=date_range
+    )
+    context["leaveday_map"] = {
+        (leave.employee_id, leave.date): leave
+        for leave in leave_rows
+        if (leave.employee_id, leave.date) in keys
+    }
+
+    timesheet_rows = TimeSheet.objects.select_related(
+        "task_assign__task",
+        "task_assign__building_assign__building",
+        "task_assign__building_assign__project_assign__project",
+    ).filter(employee_id__in=emp_ids, date__range=date_range)
+    timesheet_map = context["timesheet_map"]
+    for sheet in timesheet_rows:
+        key = (sheet.employee_id, sheet.date)
+        if key in keys:
+            timesheet_map.setdefault(key, []).append(sheet)
+    return context
+
+
+class BiometricTaskListSerializer(serializers.ListSerializer):
+    """Loads the maps for the whole list once instead of per row."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        rows = list(data)
+        if "timesheet_map" not in self.context:
+            self.child.batch_context = biometric_task_context(rows)
+        return super().to_representation(rows)
+
+
 class BiometricTaskDataSerializer(serializers.ModelSerializer):
     calendar = serializers.SerializerMethodField()
     leaveday = serializers.SerializerMethodField()
@@ -99,44 +163,45 @@ class BiometricTaskDataSerializer(serializers.ModelSerializer):
             "leaveday",
             "leave_deduction",
         ]
+        list_serializer_class = BiometricTaskListSerializer
+
+    def _maps(self, obj):
+        # Context from the view > maps of the enclosing list > this row alone
+        if "timesheet_map" in self.context:
+            return self.context
+        maps = getattr(self, "batch_context", None)
+        if maps is None:
+            maps = self.batch_context = biometric_task_context([obj])
+        return maps
 
     def get_leaveday(self, obj):
-        try:
-            leave = LeaveDay.objects.filter(
-                employee=obj.employee, date=obj.date
-            ).first()
-            return LeaveDaySerializer(leave).data
-        except LeaveDay.DoesNotExist:
-            return None
+        leave = self._maps(obj)["leaveday_map"].get((obj.employee_id, obj.date))
+        return LeaveDaySerializer(leave).data
 
     def get_calendar(self, obj):
-        try:
-            calendar = Calendar.objects.get(date=obj.date)
-            return CalendarMiniSerializer(calendar).data
-        except Calendar.DoesNotExist:
+        calendar = self._maps(obj)["calendar_map"].get(obj.date)
+        if calendar is None:
             return None
+        return CalendarMiniSerializer(calendar).data
 
     def get_employee_names(self, obj):
-        try:
-            employee_names = Employee.objects.get(employee_id=obj.employee)
-            return EmployeeNameSerializer(employee_names).data
-        except Employee.DoesNotExist:
+        employee_names = self._maps(obj)["employee_map"].get(obj.employee_id)
+        if employee_names is None:
             return None
+        return EmployeeNameSerializer(employee_names).data
 
     def get_timesheets(self, obj):
-        try:
-            timesheets = TimeSheet.objects.filter(employee=obj.employee, date=obj.date)
-            return TimeSheetTaskSerializer(timesheets, many=True).data
-        except TimeSheet.DoesNotExist:
-            return None
+        timesheets = self._maps(obj)["timesheet_map"].get((obj.employee_id, obj.date))
+        return TimeSheetTaskSerializer(timesheets or [], many=True).data
 
     def get_leave_deduction(self, obj):
         from time_management.leaves_available.views import get_comp_off
 
-        print("Object", obj)
         try:
-            return get_comp_off(float(obj.total_duration or 0))
-        except:
+            return get_comp_off(
+                float(obj.total_duration or 0), self._maps(obj)["comp_off"]
+            )
+        except (TypeError, ValueError):
             return 0
 
 
@@ -198,7 +263,9 @@ class EmployeeWeekSerializer(serializers.ModelSerializer):
                     "date": cal.date,
                     "calendar": CalendarMiniSerializer(cal).data,
                     "biometric": (
-                        BiometricTaskDataSerializer(biometric).data
+                        BiometricTaskDataSerializer(
+                            biometric, context=self.context
+                        ).data
                         if biometric
                         else None
                     ),
@@ -7,11 +7,10 @@ from time_management.biometric.serializers import (
     BiometricTaskDataSerializer,
     EmployeeAttendanceSerializer,
     EmployeeWeekSerializer,
+    biometric_task_context,
 )
-from time_management.hierarchy.serializers import (
-    emp_under_manager,
-    get_emp_under_manager,
-)
+from time_management.services.team_cache import team_ids
+from time_management.services.work_calendar import is_working_day
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -233,9 +232,9 @@ def attendance(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = get_emp_under_manager(manager)
+        employee_ids = team_ids(manager)
 
-        biometric_qs = BiometricData.objects.filter(employee__in=employees)
+        biometric_qs = BiometricData.objects.filter(employee_id__in=employee_ids)
 
         serializer = BiometricDataSerializer(biometric_qs, many=True)
 
@@ -278,13 +277,10 @@ def attendance_track(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        team = get_emp_under_manager(manager)
-        # Normalize to a queryset of employees incl. manager
-        if hasattr(team, "values"):
-            employees_qs = (team | Employee.objects.filter(pk=manager.pk)).distinct()
-        else:
-            ids = [e.pk for e in team] + [manager.pk]
-            employees_qs = Employee.objects.filter(pk__in=ids)
+        # The manager's team (all levels) plus the manager
+        employees_qs = Employee.objects.filter(
+            employee_id__in=team_ids(manager, include_self=True)
+        )
     else:
         employees_qs = Employee.objects.all()
 
@@ -317,6 +313,8 @@ def attendance_track(request, employee_id=None):
     # Build fast lookup maps keyed by (employee_pk, date)
     bio_map = {(row.employee_id, row.date): row for row in biometric_rows}
     leave_map = {(row.employee_id, row.date): row for row in leave_rows}
+    # Calendar / leave / timesheet / employee rows behind each biometric entry
+    biometric_context = biometric_task_context(bio_map.values())
 
     # Serialize employees with week detail
     ser = EmployeeWeekSerializer(
@@ -326,6 +324,7 @@ def attendance_track(request, employee_id=None):
             "calendar_days": calendar_days,
             "bio_map": bio_map,
             "leave_map": leave_map,
+            **biometric_context,
         },
     )
     return Response(ser.data, status=status.HTTP_200_OK)
@@ -356,16 +355,10 @@ def weekly_attendance_track(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        # Whatever your helper returns (QuerySet or list), we’ll normalize it
-        team_qs = get_emp_under_manager(manager)  # includes subordinates
-        # Make sure the manager is included too
-        if isinstance(team_qs, Employee.__class__):
-            # already a QuerySet
-            employees_qs = team_qs | Employee.objects.filter(pk=manager.pk)
-        else:
-            # assume list/iterable of Employee
-            ids = [e.pk for e in team_qs] + [manager.pk]
-            employees_qs = Employee.objects.filter(pk__in=ids)
+        # Subordinates at all levels, and the manager too
+        employees_qs = Employee.objects.filter(
+            employee_id__in=team_ids(manager, include_self=True)
+        )
     else:
         employees_qs = Employee.objects.all()
 
@@ -385,8 +378,15 @@ def weekly_attendance_track(request, employee_id=None):
         )
     )
 
+    employees = list(employees_qs)
+    biometric_context = biometric_task_context(
+        row for employee in employees for row in employee.biometric_entries
+    )
+
     # Serialize employees; nested list may be empty
-    serializer = EmployeeAttendanceSerializer(employees_qs, many=True)
+    serializer = EmployeeAttendanceSerializer(
+        employees, many=True, context=biometric_context
+    )
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -453,6 +453,8 @@ def biometric_weekly_track(request, employee_id=None):
     # ---- Build lookup maps keyed by (employee_pk, date) ----
     bio_map = {(row.employee_id, row.date): row for row in biometric_rows}
     leave_map = {(row.employee_id, row.date): row for row in leave_rows}
+    # Calendar / leave / timesheet / employee rows behind each biometric entry
+    biometric_context = biometric_task_context(bio_map.values())
 
     # ---- Serialize in the same shape as attendance_track ----
     ser = EmployeeWeekSerializer(
@@ -462,6 +464,7 @@ def biometric_weekly_track(request, employee_id=None):
             "calendar_days": calendar_days,
             "bio_map": bio_map,
             "leave_map": leave_map,
+            **biometric_context,
         },
     )
     return Response(ser.data, status=status.HTTP_200_OK)
@@ -483,14 +486,9 @@ def weekly_attendance(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = get_emp_under_manager(manager)
-        print("manager", manager)
-        print(employees, "Employees")
+        employee_ids = team_ids(manager, include_self=True)
 
-        biometric_qs = BiometricData.objects.filter(employee__in=employees)
-        manager_biometric_qs = BiometricData.objects.filter(employee=manager)
-        biometric_qs = biometric_qs | manager_biometric_qs
-        print(biometric_qs, "Biometric qs")
+        biometric_qs = BiometricData.objects.filter(employee_id__in=employee_ids)
         if today:
             weekday = today.weekday()
             start = today - timedelta(days=weekday)
@@ -535,9 +533,9 @@ def weekly_attendance_leave(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = get_emp_under_manager(manager)
+        employee_ids = team_ids(manager)
 
-        biometric_qs = BiometricData.objects.filter(employee__in=employees)
+        biometric_qs = BiometricData.objects.filter(employee_id__in=employee_ids)
         if today:
             weekday = today.weekday()
             start = today - timedelta(days=weekday)
@@ -575,9 +573,9 @@ def attendance_admin(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = get_emp_under_manager(manager)
+        employee_ids = team_ids(manager)
 
-        biometric_qs = BiometricData.objects.filter(employee__in=employees)
+        biometric_qs = BiometricData.objects.filter(employee_id__in=employee_ids)
         modified_biometric = biometric_qs.filter(modified_by=employee_id)
 
         serializer = BiometricDataSerializer(modified_biometric, many=True)
@@ -625,9 +623,9 @@ def biometric_manager_daily_task(request, manager_id=None):
         today = False
 
     if manager_id:
-        employees = get_emp_under_manager(manager_id)
+        employee_ids = team_ids(manager_id)
         # Base queryset filtered by employee list
-        base_qs = BiometricData.objects.filter(employee__in=employees)
+        base_qs = BiometricData.objects.filter(employee_id__in=employee_ids)
 
         # Subquery to get latest biometric entry per employee for the date
 
@@ -733,14 +731,8 @@ def bulk_biometric_upload(request):
     # Loop through the date range and generate records for each valid date
     current_date = start_date
     while current_date <= end_date:
-        # Check if the date is a weekend or holiday using the Calendar table
-        calendar_data = Calendar.objects.filter(date=current_date).first()
-
-        if (
-            not include_holidays
-            and calendar_data
-            and (calendar_data.is_weekend or calendar_data.is_holiday)
-        ):
+        # Check if the date is a weekend or holiday (cached Calendar flags)
+        if not include_holidays and not is_working_day(current_date):
             # Skip weekend or holiday dates
             current_date += timedelta(days=1)
             continue
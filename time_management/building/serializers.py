@@ -24,6 +24,7 @@ class BuildingAssignSerializer(serializers.ModelSerializer):
     class Meta:
         model = BuildingAssign
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 class BuildingAndAssignSerializer(serializers.ModelSerializer):
@@ -45,6 +46,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 class ProjectAssignSerializer(serializers.ModelSerializer):
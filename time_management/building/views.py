@@ -142,7 +142,7 @@ def building_assign_update(request):
                 )
                 assign.building_hours = building_hours
                 assign.status = status_update
-                assign.save()
+                assign.save(update_fields=["building_hours", "status"])
                 updated.append(building_assign_id)
                 received_ids.append(building_assign_id)
             except BuildingAssign.DoesNotExist:
@@ -18,7 +18,7 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime
-from time_management.hierarchy.serializers import get_emp_under_manager
+from time_management.services.team_cache import team_ids
 
 
 @api_view(["GET", "POST", "PUT", "PATCH", "DELETE"])
@@ -149,9 +149,9 @@ def compoff_manager_view_api(request, compoff_request_id=None, manager_id=None):
             )
     elif manager_id:
         try:
-            employee_qs = get_emp_under_manager(manager_id)
+            employee_ids = team_ids(manager_id)
 
-            compoffs = CompOffRequest.objects.filter(employee__in=employee_qs)
+            compoffs = CompOffRequest.objects.filter(employee_id__in=employee_ids)
             if today:
                 compoff = compoffs.filter(date=today)
             else:
@@ -1,59 +1,141 @@
 from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from django.db import connection, connections
+from django.conf import settings
 from datetime import datetime
 
+from time_management.services.biometric_sync import (
+    date_window,
+    event_summary_rows,
+    punch_events,
+)
+from time_management.services.streaming_export import streaming_ndjson_response
 
-# GET /api/dtms_event_time/2025-08-07/
+MAX_RANGE_DAYS = getattr(settings, "DTMS_MAX_RANGE_DAYS", 62)
+MAX_STREAM_DAYS = getattr(settings, "DTMS_MAX_STREAM_DAYS", 366)
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _date_range(start_str, end_str, max_days=MAX_RANGE_DAYS):
+    """(start, end) or an error Response."""
+    try:
+        start, end = _parse_date(start_str), _parse_date(end_str)
+    except ValueError:
+        return None, Response({"error": "Invalid date format"}, status=400)
+    if start > end:
+        return None, Response({"error": "'from' is after 'to'"}, status=400)
+    if (end - start).days + 1 > max_days:
+        return None, Response(
+            {"error": f"At most {max_days} days per request"}, status=400
+        )
+    return (start, end), None
+
+
+def _per_day(start, end, rows, field):
+    """{"YYYY-MM-DD": [rows]} for every day of the window, empty days included."""
+    days = {day.isoformat(): [] for day in date_window(start, end)}
+    for row in rows:
+        days[str(row[field])[:10]].append(row)
+    return days
+
+
+# GET /api/dtms_event_time/2025-08-07/?emp_code=123
 @api_view(["GET"])
 def dtms_event_time(request, date_str=None):
     try:
-        selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        selected_date = _parse_date(date_str)
     except ValueError:
         return Response({"error": "Invalid date format"}, status=400)
 
-    sql = """
-        SELECT 
-            EMPCode,
-            PunchDateTime,
-            INOutType,
-            DownloadDatetime
-        FROM sync_DTMS_bio
-        WHERE DATE(PunchDateTime) = %s
-        ORDER BY PunchDateTime
+    emp_code = request.query_params.get("emp_code")
+    result = list(punch_events(selected_date, selected_date, emp_code))
+    return Response(result)
+
+
+# GET /api/dtms-event-time/from/2025-08-01/to/2025-08-07/?emp_code=123
+@api_view(["GET"])
+def dtms_event_time_range(request, start_str=None, end_str=None):
+    window, error = _date_range(start_str, end_str)
+    if error:
+        return error
+
+    emp_code = request.query_params.get("emp_code")
+    rows = punch_events(*window, emp_code)
+    return Response(_per_day(*window, rows, "PunchDateTime"))
+
+
+# GET /api/dtms-event-time/2025-08-07/stream/
+# GET /api/dtms-event-time/from/2025-08-01/to/2025-08-31/stream/
+#     ?emp_code=123&after_time=2025-08-03T09:15:02&after_emp=1042
+#     &after_type=0&after_download=2025-08-03T09:20:00&limit=50000
+@api_view(["GET"])
+def dtms_event_time_stream(request, start_str=None, end_str=None):
+    """
+    Raw punches as NDJSON, one object per line in (PunchDateTime, EmpCode,
+    InOutType, DownloadDateTime) order, streamed off the reporting cursor.
+    To resume a pull, pass those four values of the last line received as
+    ``after_time`` / ``after_emp`` / ``after_type`` / ``after_download``
+    (empty when it was null); a page of ``limit`` lines means there may be
+    more.
     """
-    with connections["reporting"].cursor() as cursor:
-        cursor.execute(sql, [selected_date])
-        rows = cursor.fetchall()
+    window, error = _date_range(start_str, end_str or start_str, MAX_STREAM_DAYS)
+    if error:
+        return error
 
-    columns = ["EmpCode", "PunchDateTime", "InOutType", "DownloadDateTime"]
-    result = [dict(zip(columns, row)) for row in rows]
-    return Response(result)
+    params = request.query_params
+    after = None
+    if params.get("after_time"):
+        cursor = ("after_emp", "after_type", "after_download")
+        if not params.get("after_emp") or not params.get("after_type"):
+            return Response(
+                {"error": f"after_time needs {', '.join(cursor)} as well"},
+                status=400,
+            )
+        try:
+            downloaded = params.get("after_download")
+            after = (
+                datetime.fromisoformat(params["after_time"]),
+                params["after_emp"],
+                int(params["after_type"]),
+                datetime.fromisoformat(downloaded) if downloaded else None,
+            )
+        except ValueError:
+            return Response({"error": "Invalid after_* cursor"}, status=400)
+    try:
+        limit = int(params.get("limit") or 0)
+    except ValueError:
+        return Response({"error": "Invalid limit"}, status=400)
+    if limit < 0:
+        return Response({"error": "Invalid limit"}, status=400)
 
+    rows = punch_events(*window, params.get("emp_code"), after=after, limit=limit)
+    return streaming_ndjson_response(rows)
 
-# GET /api/dtms_event_summary/2025-08-07/
+
+# GET /api/dtms_event_summary/2025-08-07/?emp_code=123
 @api_view(["GET"])
 def dtms_event_summary(request, date_str=None):
     try:
-        selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        selected_date = _parse_date(date_str)
     except ValueError:
         return Response({"error": "Invalid date format"}, status=400)
 
-    sql = """
-        SELECT 
-            EMPCode,
-            MIN(CASE WHEN INOutType = 0 THEN PunchDateTime END) AS FirstIn,
-            MAX(CASE WHEN INOutType = 1 THEN PunchDateTime END) AS LastOut
-        FROM sync_DTMS_bio
-        WHERE DATE(PunchDateTime) = %s
-        GROUP BY EMPCode
-        ORDER BY EMPCode
-    """
-    with connections["reporting"].cursor() as cursor:
-        cursor.execute(sql, [selected_date])
-        rows = cursor.fetchall()
-
-    columns = ["EmpCode", "FirstIn", "LastOut", "Date"]
-    result = [dict(zip(columns, list(row) + [selected_date])) for row in rows]
+    # Same aggregation the sync commands read directly (--source reporting)
+    emp_code = request.query_params.get("emp_code")
+    result = list(event_summary_rows(selected_date, selected_date, emp_code))
     return Response(result)
+
+
+# GET /api/dtms-event-summary/from/2025-08-01/to/2025-08-07/?emp_code=123
+@api_view(["GET"])
+def dtms_event_summary_range(request, start_str=None, end_str=None):
+    window, error = _date_range(start_str, end_str)
+    if error:
+        return error
+
+    emp_code = request.query_params.get("emp_code")
+    rows = event_summary_rows(*window, emp_code)
+    return Response(_per_day(*window, rows, "Date"))
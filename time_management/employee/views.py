@@ -9,10 +9,7 @@ from time_management.employee.serializers import (
     EmployeeListSerializer,
     EmployeeAllSerializer,
 )
-from time_management.hierarchy.serializers import (
-    emp_under_manager,
-    get_emp_under_manager,
-)
+from time_management.services.team_cache import team_ids
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
@@ -209,8 +206,8 @@ def emp_under_mngr_view(request, employee_id=None):
         if employee_id:
             try:
                 manager = Employee.objects.get(employee_id=employee_id)
-                employees = get_emp_under_manager(manager)
-                employee = Employee.objects.filter(employee_id__in=employees)
+                employee_ids = team_ids(manager)
+                employee = Employee.objects.filter(employee_id__in=employee_ids)
                 serializer = EmployeeViewSerializer(employee, many=True)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             except Employee.DoesNotExist:
@@ -235,9 +232,9 @@ def active_emp_under_mngr_view(request, employee_id=None):
         if employee_id:
             try:
                 manager = Employee.objects.get(employee_id=employee_id)
-                employees = get_emp_under_manager(manager)
+                employee_ids = team_ids(manager)
                 employee = Employee.objects.filter(
-                    employee_id__in=employees, status="active"  # checking if active
+                    employee_id__in=employee_ids, status="active"  # checking if active
                 )
                 serializer = EmployeeViewSerializer(employee, many=True)
                 return Response(serializer.data, status=status.HTTP_200_OK)
@@ -278,9 +275,9 @@ def active_emp_under_mngr_resign_date_view(request, employee_id=None):
                 # resignation_date
 
                 manager = Employee.objects.get(employee_id=employee_id)
-                employees = get_emp_under_manager(manager)
+                employee_ids = team_ids(manager)
                 employee = Employee.objects.filter(
-                    employee_id__in=employees,  # status="active"  # checking if active
+                    employee_id__in=employee_ids,  # status="active"  # checking if active
                 )
 
                 # Apply additional date filters if `today` is given
@@ -326,8 +323,8 @@ def additional_resource_view(request, employee_id=None):
         if employee_id:
             try:
                 manager = Employee.objects.get(employee_id=employee_id)
-                employees = get_emp_under_manager(manager)
-                employee = Employee.objects.exclude(employee_id__in=employees).filter(
+                employee_ids = team_ids(manager)
+                employee = Employee.objects.exclude(employee_id__in=employee_ids).filter(
                     status="active"
                 )
                 serializer = EmployeeViewSerializer(employee, many=True)
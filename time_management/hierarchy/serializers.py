@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from ..models import Employee, Hierarchy
+from time_management.services.org_closure import subordinates
 
 
 class EmployeeSerializer(serializers.ModelSerializer):
@@ -17,57 +18,18 @@ class HierarchySerializer(serializers.ModelSerializer):
 #### The Very important helper function to get employee object under a manager upto 2 levels
 #### Helper function
 def emp_under_manager(emp_id):
-    try:
-        manager = Employee.objects.get(employee_id=emp_id)
-    except Employee.DoesNotExist:
+    if not Employee.objects.filter(employee_id=emp_id).exists():
         return None
 
-    teamleads_data = []
-    employee_list = []
-
-    # filtering all employees in the hierarchy table who reports to the manager
-    teamleads_qs = Hierarchy.objects.filter(reporting_to=manager)
-
-    # Iterating through each filtered hierarchy entry to get team leads and their employees
-    for tl_hierarchy in teamleads_qs:
-        teamlead_emp = (
-            tl_hierarchy.employee
-        )  # Getting the employee from hierarchy table
-        employees_qs = Hierarchy.objects.filter(reporting_to=teamlead_emp)
-
-        for emp_hierarchy in employees_qs:
-            employee_emp = (
-                emp_hierarchy.employee
-            )  # Getting the employee from hierarchy table
-            employee_list.append(employee_emp)
-
-        teamleads_data.append(teamlead_emp)
-
-    # Combining teamleads_data and employees_data // This is a list of employee objects
-    all_employees = teamleads_data + employee_list
-    ## returning the employee objects
-    return all_employees
+    # Team leads (level 1) followed by their employees (level 2), read from
+    # the org closure table in one query // This is a list of employee objects
+    return list(subordinates(emp_id, max_depth=2))
 
 
 def get_all_subordinates(manager, visited=None):
-
-    if visited is None:
-        visited = set()
-
-    subordinates = []
-    direct_reports = Hierarchy.objects.filter(reporting_to=manager)
-
-    for hierarchy_entry in direct_reports:
-        employee = hierarchy_entry.employee
-        if employee.employee_id in visited:
-            continue  # Prevent infinite recursion
-        visited.add(employee.employee_id)
-
-        subordinates.append(employee)
-        # Recursive call for each direct report
-        subordinates.extend(get_all_subordinates(employee, visited))
-
-    return subordinates
+    # Every level below the manager (reporting_to edges), cycle-safe by
+    # construction of the closure table; ``visited`` is kept for callers.
+    return list(subordinates(manager.employee_id))
 
 
 def get_emp_under_manager(emp_id):
@@ -5,10 +5,9 @@ from time_management.hierarchy.serializers import (
     HierarchySerializer,
     EmployeeChartSerializer,
     HierarchyChartSerializer,
-    emp_under_manager,
-    get_emp_under_manager,
-    build_tree,
 )
+from time_management.services.org_tree import cached_org_payload
+from time_management.services.team_cache import team_ids
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -95,7 +94,7 @@ def get_emp_all(request, manager_id=None):
     except Employee.DoesNotExist:
         return Response({"error": "Manager not found"}, status=404)
 
-    all_complete_employee = get_emp_under_manager(manager)
+    all_complete_employee = team_ids(manager)
     # all_employee = all_complete_employee
 
     all_employee = Employee.objects.filter(
@@ -135,56 +134,54 @@ def get_emp_all(request, manager_id=None):
 
 @api_view(["GET"])
 def manager_hierarchy(request, manager_id=None):
-    try:
-        manager = Employee.objects.get(employee_id=manager_id)
-    except Employee.DoesNotExist:
-        return Response({"error": "Manager not found"}, status=404)
+    def build(tree):
+        manager = tree.nodes.get(manager_id)
+        if manager is None:
+            return None
+
+        teamleads_data = []
+        direct_employees = []
+
+        for teamlead_emp in tree.direct_reports(manager_id):
+            if teamlead_emp["role"] == "teamlead":
+                # This employee is a teamlead, get their employees
+                employee_list = [
+                    {
+                        "employee_id": emp["id"],
+                        "employee_name": emp["name"],
+                        "employee_code": emp["code"],
+                    }
+                    for emp in tree.direct_reports(teamlead_emp["id"])
+                ]
 
-    teamleads_data = []
-    direct_employees = []
+                teamleads_data.append(
+                    {
+                        "teamlead_id": teamlead_emp["id"],
+                        "teamlead_name": teamlead_emp["name"],
+                        "employee_code": teamlead_emp["code"],
+                        "employees": employee_list,
+                    }
+                )
+            else:
+                # This employee is not a teamlead, add to manager's direct employees
+                direct_employees.append(
+                    {
+                        "employee_id": teamlead_emp["id"],
+                        "employee_name": teamlead_emp["name"],
+                        "employee_code": teamlead_emp["code"],
+                    }
+                )
 
-    teamleads_qs = Hierarchy.objects.filter(reporting_to=manager)
-
-    for tl_hierarchy in teamleads_qs:
-        teamlead_emp = tl_hierarchy.employee
-        user_qs = User.objects.filter(employee_id=teamlead_emp).first()
-
-        if user_qs and user_qs.role == "teamlead":
-            # This employee is a teamlead, get their employees
-            employees_qs = Hierarchy.objects.filter(reporting_to=teamlead_emp)
-            employee_list = [
-                {
-                    "employee_id": emp_h.employee.employee_id,
-                    "employee_name": emp_h.employee.employee_name,
-                    "employee_code": emp_h.employee.employee_code,
-                }
-                for emp_h in employees_qs
-            ]
-
-            teamleads_data.append(
-                {
-                    "teamlead_id": teamlead_emp.employee_id,
-                    "teamlead_name": teamlead_emp.employee_name,
-                    "employee_code": teamlead_emp.employee_code,
-                    "employees": employee_list,
-                }
-            )
-        else:
-            # This employee is not a teamlead, add to manager's direct employees
-            direct_employees.append(
-                {
-                    "employee_id": teamlead_emp.employee_id,
-                    "employee_name": teamlead_emp.employee_name,
-                    "employee_code": teamlead_emp.employee_code,
-                }
-            )
+        return {
+            "manager_id": manager["id"],
+            "manager_name": manager["name"],
+            "employees": direct_employees,
+            "teamleads": teamleads_data,
+        }
 
-    response = {
-        "manager_id": manager.employee_id,
-        "manager_name": manager.employee_name,
-        "employees": direct_employees,
-        "teamleads": teamleads_data,
-    }
+    response = cached_org_payload(f"manager_hierarchy:{manager_id}", build)
+    if response is None:
+        return Response({"error": "Manager not found"}, status=404)
 
     return Response(response)
 
@@ -220,65 +217,58 @@ def teamlead_hierarchy(request, emp_id=None):
 
 @api_view(["GET"])
 def org_hierarchy(request, emp_id=None):
-    try:
-        manager = Employee.objects.get(employee_id=emp_id)
-    except Employee.DoesNotExist:
-        return Response({"error": "Employee not found"}, status=404)
+    def build(tree):
+        manager = tree.nodes.get(emp_id)
+        if manager is None:
+            return None
+
+        teamleads_data = []
+        direct_employees = []
+
+        # everyone whose hierarchy entry reports to the manager
+        for teamlead_emp in tree.direct_reports(emp_id):
+            if teamlead_emp["has_user"]:
+                # This employee, get their employees
+                employee_list = [
+                    {
+                        "employee_id": emp["id"],
+                        "employee_name": emp["name"],
+                        "employee_role": emp["designation"],
+                        "employee_code": emp["code"],
+                    }
+                    for emp in tree.direct_reports(teamlead_emp["id"])
+                ]
 
-    teamleads_data = []
-    direct_employees = []
+                teamleads_data.append(
+                    {
+                        "teamlead_id": teamlead_emp["id"],
+                        "teamlead_name": teamlead_emp["name"],
+                        "teamlead_role": teamlead_emp["designation"],
+                        "employee_code": teamlead_emp["code"],
+                        "employees": employee_list,
+                    }
+                )
+            else:
+                # This employee is not a teamlead, add to manager's direct employees
+                direct_employees.append(
+                    {
+                        "employee_id": teamlead_emp["id"],
+                        "employee_name": teamlead_emp["name"],
+                        "employee_role": teamlead_emp["designation"],
+                        "employee_code": teamlead_emp["code"],
+                    }
+                )
 
-    # filtering all employees in the hierarchy table who reports to the manager
-    teamleads_qs = Hierarchy.objects.filter(reporting_to=manager)
-
-    # iterating through each filtered hierarchy table entry
-    for tl_hierarchy in teamleads_qs:
-        teamlead_emp = (
-            tl_hierarchy.employee
-        )  # getting the employee id from the filtered hierarchy table
-        user_qs = User.objects.filter(
-            employee_id=teamlead_emp
-        ).first()  # matching the employee id in user table
-
-        if user_qs:
-            # This employee, get their employees
-            employees_qs = Hierarchy.objects.filter(reporting_to=teamlead_emp)
-            employee_list = [
-                {
-                    "employee_id": emp_h.employee.employee_id,
-                    "employee_name": emp_h.employee.employee_name,
-                    "employee_role": emp_h.employee.designation,
-                    "employee_code": emp_h.employee.employee_code,
-                }
-                for emp_h in employees_qs
-            ]
-
-            teamleads_data.append(
-                {
-                    "teamlead_id": teamlead_emp.employee_id,
-                    "teamlead_name": teamlead_emp.employee_name,
-                    "teamlead_role": teamlead_emp.designation,
-                    "employee_code": teamlead_emp.employee_code,
-                    "employees": employee_list,
-                }
-            )
-        else:
-            # This employee is not a teamlead, add to manager's direct employees
-            direct_employees.append(
-                {
-                    "employee_id": teamlead_emp.employee_id,
-                    "employee_name": teamlead_emp.employee_name,
-                    "employee_role": teamlead_emp.designation,
-                    "employee_code": teamlead_emp.employee_code,
-                }
-            )
+        return {
+            "manager_id": manager["id"],
+            "manager_name": manager["name"],
+            "teamleads": teamleads_data,
+            "employees": direct_employees,
+        }
 
-    response = {
-        "manager_id": manager.employee_id,
-        "manager_name": manager.employee_name,
-        "teamleads": teamleads_data,
-        "employees": direct_employees,
-    }
+    response = cached_org_payload(f"org_hierarchy:{emp_id}", build)
+    if response is None:
+        return Response({"error": "Employee not found"}, status=404)
 
     return Response(response)
 
@@ -367,81 +357,34 @@ def get_hierarchy_by_employee(request, employee_id):
 
 @api_view(["GET"])
 def manager_chart(request):
-    employees = Employee.objects.all()
-
-    # Map of manager_id → list of subordinates
-    employees_map = {}
-    for emp in employees:
-        if emp.reporting_manager:
-            employees_map.setdefault(emp.reporting_manager, []).append(emp)
-
-    # Build tree starting at each manager (with subordinates)
-    managers_data = {}
-    for manager_id, subordinates in employees_map.items():
-        try:
-            manager = Employee.objects.get(employee_id=manager_id)
-        except Employee.DoesNotExist:
-            continue
-
-        managers_data[manager_id] = {
-            "manager": {
-                "id": manager.employee_id,
-                "name": manager.employee_name,
-                "designation": manager.designation,
-                "profile_picture": (
-                    manager.profile_picture.url if manager.profile_picture else None
-                ),
-            },
-            "children": [
-                {
-                    "id": emp.employee_id,
-                    "name": emp.employee_name,
-                    "designation": emp.designation,
-                    "profile_picture": (
-                        emp.profile_picture.url if emp.profile_picture else None
-                    ),
-                    "children": build_tree(emp.employee_id, employees_map),
-                }
-                for emp in subordinates
-            ],
-        }
-
+    depth = _chart_depth(request)
+    # manager_id → {"manager": ..., "children": nested subordinates}
+    managers_data = cached_org_payload(
+        f"manager_chart:{depth}", lambda tree: tree.manager_chart(depth)
+    )
     return Response(managers_data)
 
 
 @api_view(["GET"])
 def department_chart(request):
-    employees = Employee.objects.all()
-    departments = {}
-
-    # Map: manager_id → [subordinates]
-    employees_map = {}
-    for emp in employees:
-        if emp.reporting_manager:
-            employees_map.setdefault(emp.reporting_manager, []).append(emp)
-
-    # Find top-level employees in each department (no manager or manager in another dept)
-    for emp in employees:
-        dept = emp.department or "Unassigned"
-        if dept not in departments:
-            departments[dept] = []
-
-        if not emp.reporting_manager:  # top-level node
-            departments[dept].append(
-                {
-                    "id": emp.employee_id,
-                    "name": emp.employee_name,
-                    "designation": emp.designation,
-                    "profile_picture": (
-                        emp.profile_picture.url if emp.profile_picture else None
-                    ),
-                    "children": build_tree(emp.employee_id, employees_map),
-                }
-            )
-
+    # Top-level employees (no reporting manager) of each department, with
+    # everyone below them
+    depth = _chart_depth(request)
+    departments = cached_org_payload(
+        f"department_chart:{depth}", lambda tree: tree.department_chart(depth)
+    )
     return Response(departments)
 
 
+def _chart_depth(request):
+    # Optional ?depth=N limits the nested levels (all levels by default)
+    try:
+        depth = int(request.query_params.get("depth", ""))
+    except ValueError:
+        return None
+    return depth if depth > 0 else None
+
+
 # @api_view(["GET"])
 # def org_hierarchy(request, emp_id=None):
 #     try:
@@ -15,6 +15,13 @@ from datetime import datetime
 from time_management.hierarchy.serializers import get_emp_under_manager
 from time_management.leaveday.serializers import LeaveDaySerializer
 from time_management.services.leave_ledger import get_monthly_leave_report
+from time_management.services.report_cache import cached_report
+from time_management.services.xlsx_export import (
+    Sheet,
+    dict_rows,
+    wants_xlsx,
+    xlsx_response,
+)
 from decimal import Decimal
 from django.db.models.functions import Coalesce
 
@@ -113,13 +120,34 @@ def _zero():
     )
 
 
+LEDGER_COLUMNS = (
+    "employee_id",
+    "employee_code",
+    "employee_name",
+    "employment_type",
+    "doj",
+    "open_cl",
+    "open_ml",
+    "open_comp",
+    "co_earned",
+    "availed_cl",
+    "availed_ml",
+    "availed_comp",
+    "bal_cl",
+    "bal_ml",
+    "bal_comp",
+)
+
+
 @api_view(["GET"])
+@cached_report("leave-ledger-ytd", depends_on=(Employee, LeaveOpeningBalance, LeaveDay))
 def leave_ledger_ytd(request, year: int):
     """
     Year-to-date leave ledger per employee.
     Query params:
       - month: optional int 1..12 (default 12). Aggregates availed/earned up to this month.
       - employee_id: optional filter to a single employee
+      - export=xlsx: download the ledger as an Excel workbook
     """
     try:
         upto_month = int(request.query_params.get("month", 12))
@@ -249,6 +277,19 @@ def leave_ledger_ytd(request, year: int):
         .order_by("employee_code")
     )
 
+    if wants_xlsx(request):
+        # Rows go from the DB cursor into the sheet without a list in between
+        return xlsx_response(
+            f"leave_ledger_{year}_upto_{upto_month:02d}.xlsx",
+            [
+                Sheet(
+                    f"Leave ledger {year}",
+                    LEDGER_COLUMNS,
+                    dict_rows(qs.iterator(chunk_size=2000), LEDGER_COLUMNS),
+                )
+            ],
+        )
+
     rows = list(qs)
 
     return Response(
@@ -404,6 +445,16 @@ def _zero():
 
 @api_view(["GET"])
 # @permission_classes([IsAuthenticated])
+@cached_report(
+    "opening-monthly-all",
+    depends_on=(
+        Employee,
+        MonthlyLeaveBalance,
+        LeaveOpeningBalance,
+        LeaveDay,
+        CompOffRequest,
+    ),
+)
 def opening_plus_monthly_availed_all(request, year: int):
     """
     GET /api/leave/opening-monthly-all/<year>/?month=8
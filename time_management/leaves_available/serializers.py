@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from ..models import LeavesAvailable, CompOff, LeavesTaken
+from ..models import LeavesAvailable, CompOff
+from time_management.services.lop import lop_summary
 
 
 class LeavesAvailableSerializer(serializers.ModelSerializer):
@@ -24,20 +25,8 @@ class LeavesAvailableWithLOPSerializer(serializers.ModelSerializer):
         ]
 
     def get_lop(self, obj):
-        request = self.context.get("request")
-        filter_year = request.GET.get("year") if request else None
-
-        leaves = LeavesTaken.objects.filter(
-            employee=obj.employee, leave_type="lop", start_date__year=filter_year
-        )
-
-        total_lop = 0
-
-        for leave in leaves:
-
-            total_lop += float(leave.duration)
-
-        return total_lop
+        year = self.context.get("year")
+        return lop_summary(year, [obj.employee_id]).total_of(obj.employee_id)
 
 
 class CompOffSerializer(serializers.ModelSerializer):
@@ -166,29 +166,32 @@ def comp_off_api(request, id=None):
             )
 
 
-def get_comp_off(hours_worked):
+def comp_off_thresholds():
+    """{leave_type: CompOff} for the half / full day thresholds (one query)."""
+    return {c.leave_type: c for c in CompOff.objects.all()}
+
+
+def get_comp_off(hours_worked, thresholds=None):
     """
     Returns:
     - 0.5 → Half day
     - 1.0 → Full day
     - 0.0 → No deduction (if above max for both)
+
+    Pass ``thresholds`` (from comp_off_thresholds()) when scoring many rows.
     """
+    if thresholds is None:
+        thresholds = comp_off_thresholds()
 
     # First, check for half day
-    try:
-        half_day = CompOff.objects.get(leave_type="half_day")
-        if half_day.min_hours <= hours_worked <= half_day.max_hours:
-            return 0.5
-    except CompOff.DoesNotExist:
-        pass  # No threshold defined
+    half_day = thresholds.get("half_day")
+    if half_day and half_day.min_hours <= hours_worked <= half_day.max_hours:
+        return 0.5
 
     # Then, check for full day
-    try:
-        full_day = CompOff.objects.get(leave_type="full_day")
-        if full_day.min_hours <= hours_worked <= full_day.max_hours:
-            return 1.0
-    except CompOff.DoesNotExist:
-        pass
+    full_day = thresholds.get("full_day")
+    if full_day and full_day.min_hours <= hours_worked <= full_day.max_hours:
+        return 1.0
 
     # If none matched → no deduction
     return 0.0
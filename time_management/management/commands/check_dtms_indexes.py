@@ -0,0 +1,66 @@
+# time_management/management/commands/check_dtms_indexes.py
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from time_management.services.biometric_sync import REPORTING_INDEXES
+
+TABLE = "sync_DTMS_bio"
+
+INDEX_COLUMNS_SQL = """
+    SELECT INDEX_NAME, COLUMN_NAME
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    ORDER BY INDEX_NAME, SEQ_IN_INDEX
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        f"Check {TABLE} on the reporting DB for the indexes the dtms endpoints "
+        "and the biometric sync use, and print the CREATE INDEX statements "
+        "for the missing ones (nothing is changed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="reporting",
+            help="Connection holding the sync_DTMS_bio table.",
+        )
+
+    def handle(self, *args, **options):
+        with connections[options["database"]].cursor() as cursor:
+            cursor.execute(INDEX_COLUMNS_SQL, [TABLE])
+            existing = {}
+            for index_name, column in cursor.fetchall():
+                existing.setdefault(index_name, []).append(column.lower())
+
+        missing = []
+        for name, columns in REPORTING_INDEXES.items():
+            wanted = [c.lower() for c in columns]
+            # Any index whose leading columns are these serves the same queries
+            found = next(
+                (
+                    index_name
+                    for index_name, have in existing.items()
+                    if have[: len(wanted)] == wanted
+                ),
+                None,
+            )
+            if found:
+                self.stdout.write(f"OK       ({', '.join(columns)}) -> {found}")
+            else:
+                self.stdout.write(f"MISSING  ({', '.join(columns)})")
+                missing.append(
+                    f"CREATE INDEX {name} ON {TABLE} ({', '.join(columns)});"
+                )
+
+        if not missing:
+            self.stdout.write(self.style.SUCCESS("All recommended indexes exist."))
+            return
+        self.stdout.write(
+            self.style.WARNING("Recommended (run on the reporting DB by its owner):")
+        )
+        for statement in missing:
+            self.stdout.write(statement)
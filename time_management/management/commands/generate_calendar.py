@@ -1,4 +1,6 @@
 from time_management.models import Calendar
+from time_management.services.sequences import assign_ids
+from time_management.services.work_calendar import bump_version
 from django.core.management.base import BaseCommand
 
 from django.db import transaction
@@ -29,9 +31,6 @@ class Command(BaseCommand):
         entries = []
 
         with transaction.atomic():
-            last = Calendar.objects.all().order_by("-calendar_id").first()
-            counter = int(last.calendar_id.split("_")[1]) + 1 if last else 1
-
             while current < end_date:
                 weekday = current.weekday()  # Monday=0, Sunday=6
                 # is_weekend = weekday >= 5
@@ -53,7 +52,6 @@ class Command(BaseCommand):
 
                 entries.append(
                     Calendar(
-                        calendar_id=f"CAL_{counter:05d}",
                         date=current,
                         year=current.year,
                         fiscal_year=current.year,  # You can change this if your fiscal year is April–March
@@ -70,10 +68,11 @@ class Command(BaseCommand):
                     )
                 )
 
-                counter += 1
                 current += timedelta(days=1)
 
-            Calendar.objects.bulk_create(entries)
+            Calendar.objects.bulk_create(assign_ids(entries))
+            # bulk_create sends no post_save; refresh the cached calendar
+            transaction.on_commit(bump_version)
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from time_management.services.leave_balances import rebuild_balances_for
+
+
+class Command(BaseCommand):
+    help = "Rebuild MonthlyLeaveBalance for a year (all employees, or the given ones) in one set-based pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--year", type=int, help="Year to rebuild (default: current year)"
+        )
+        parser.add_argument(
+            "--start-month", type=int, default=1, help="First month to recompute"
+        )
+        parser.add_argument(
+            "--employee",
+            action="append",
+            dest="employees",
+            help="Employee id to rebuild (repeatable; default: all employees)",
+        )
+
+    def handle(self, *args, **options):
+        year = options["year"] or timezone.now().year
+        written = rebuild_balances_for(
+            options["employees"], year, options["start_month"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written} monthly balance row(s) for {year}."
+            )
+        )
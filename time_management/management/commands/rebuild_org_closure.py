@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from time_management.services.org_closure import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = "Rebuild the org-chart closure table (OrgClosure) from Hierarchy."
+
+    def handle(self, *args, **options):
+        rows = rebuild_closure()
+        self.stdout.write(
+            self.style.SUCCESS(f"Org closure rebuilt with {rows} manager/report pair(s).")
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from time_management.services.project_facts import rebuild_project_facts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ProjectHoursDaily fact table from approved timesheets."
+
+    def handle(self, *args, **options):
+        rows = rebuild_project_facts()
+        self.stdout.write(
+            self.style.SUCCESS(f"Project hours rebuilt with {rows} daily row(s).")
+        )
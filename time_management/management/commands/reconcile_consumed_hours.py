@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from time_management.services.hours_ledger import recompute_consumed_hours
+
+
+class Command(BaseCommand):
+    help = "Recompute consumed hours (project, building assign, task assign) from approved timesheets and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Write the recomputed totals back instead of only reporting.",
+        )
+
+    def handle(self, *args, **options):
+        fix = options["fix"]
+        drift = recompute_consumed_hours(fix=fix)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Consumed hours are in sync."))
+            return
+
+        for d in drift:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{d.level} {d.pk}: stored {d.stored}, actual {d.actual} "
+                    f"(drift {d.stored - d.actual})"
+                )
+            )
+
+        summary = f"{len(drift)} row(s) drifted"
+        if fix:
+            self.stdout.write(self.style.SUCCESS(f"{summary}; corrected."))
+        else:
+            self.stdout.write(
+                self.style.ERROR(f"{summary}. Re-run with --fix to correct them.")
+            )
@@ -11,6 +11,7 @@ from decimal import Decimal
 from django.db import transaction
 
 from time_management.signals import rebuild_monthly_balances
+from time_management.services.rebuild_queue import defer_rebuilds, mark_dirty
 
 
 FULLTIME_DEFAULTS = {
@@ -55,6 +56,7 @@ def get_comp_off_carry_forward(employee: Employee, prev_year: int) -> Decimal:
 class Command(BaseCommand):
     help = "Jan 1 rollover: carry forward ONLY Comp-Off; reset SL/CL/EL to policy; upsert LeaveOpeningBalance; rebuild this year's monthly balances."
 
+    @defer_rebuilds()
     def handle(self, *args, **kwargs):
         today = timezone.now().date()
         current_year = today.year
@@ -70,112 +72,110 @@ class Command(BaseCommand):
         # You can switch to Employee.objects.all() if you don't rely on existing LeavesAvailable.
         employees = Employee.objects.all().iterator()
 
-    if today.month == 1:
-
-        for emp in employees:
-            with transaction.atomic():
-                policy = policy_entitlements_for(emp)
-                comp_cf = get_comp_off_carry_forward(emp, prev_year)
-
-                # 1) Snapshot: LeavesAvailable reflects the NEW opening
-                leaves_avail, _ = LeavesAvailable.objects.get_or_create(employee=emp)
-                leaves_avail.sick_leave = policy["sick"]
-                leaves_avail.casual_leave = policy["casual"]
-                leaves_avail.earned_leave = policy["earned"]
-                leaves_avail.comp_off = comp_cf
-                leaves_avail.save(
-                    update_fields=[
-                        "sick_leave",
-                        "casual_leave",
-                        "earned_leave",
-                        "comp_off",
-                    ]
-                )
-
-                # 2) Upsert: LeaveOpeningBalance for current_year
-                lob, created = LeaveOpeningBalance.objects.get_or_create(
-                    employee=emp,
-                    year=current_year,
-                    defaults=dict(
-                        sick_leave_opening=policy["sick"],
-                        casual_leave_opening=policy["casual"],
-                        earned_leave_opening=policy["earned"],
-                        comp_off_opening=comp_cf,
-                    ),
-                )
-                if not created:
-                    lob.sick_leave_opening = policy["sick"]
-                    lob.casual_leave_opening = policy["casual"]
-                    lob.earned_leave_opening = policy["earned"]
-                    lob.comp_off_opening = comp_cf
-                    lob.save(
+        if today.month == 1:
+
+            for emp in employees:
+                with transaction.atomic():
+                    policy = policy_entitlements_for(emp)
+                    comp_cf = get_comp_off_carry_forward(emp, prev_year)
+
+                    # 1) Snapshot: LeavesAvailable reflects the NEW opening
+                    leaves_avail, _ = LeavesAvailable.objects.get_or_create(employee=emp)
+                    leaves_avail.sick_leave = policy["sick"]
+                    leaves_avail.casual_leave = policy["casual"]
+                    leaves_avail.earned_leave = policy["earned"]
+                    leaves_avail.comp_off = comp_cf
+                    leaves_avail.save(
                         update_fields=[
-                            "sick_leave_opening",
-                            "casual_leave_opening",
-                            "earned_leave_opening",
-                            "comp_off_opening",
+                            "sick_leave",
+                            "casual_leave",
+                            "earned_leave",
+                            "comp_off",
                         ]
                     )
 
-                # 3) Rebuild this year's monthly balances (Jan→Dec)
-                rebuild_monthly_balances(
-                    employee_id=emp.pk, year=current_year, start_month=1
-                )
-
-                count += 1
-    else:
-
-        for emp in employees:
-            with transaction.atomic():
-                policy = policy_entitlements_for(emp)
-                comp_cf = get_comp_off_carry_forward(emp, prev_year)
-
-                # 1) Snapshot: LeavesAvailable reflects the NEW opening
-                leaves_avail, _ += LeavesAvailable.objects.get_or_create(employee=emp)
-                leaves_avail.sick_leave += policy["sick"]
-                leaves_avail.casual_leave += policy["casual"]
-                leaves_avail.earned_leave += policy["earned"]
-                leaves_avail.comp_off += comp_cf
-                leaves_avail.save(
-                    update_fields=[
-                        "sick_leave",
-                        "casual_leave",
-                        "earned_leave",
-                        "comp_off",
-                    ]
-                )
-
-                # 2) Upsert: LeaveOpeningBalance for current_year
-                lob, created = LeaveOpeningBalance.objects.get_or_create(
-                    employee=emp,
-                    year=current_year,
-                    defaults=dict(
-                        sick_leave_opening=policy["sick"],
-                        casual_leave_opening=policy["casual"],
-                        earned_leave_opening=policy["earned"],
-                        comp_off_opening=comp_cf,
-                    ),
-                )
-                if not created:
-                    lob.sick_leave_opening += policy["sick"]
-                    lob.casual_leave_opening += policy["casual"]
-                    lob.earned_leave_opening += policy["earned"]
-                    lob.comp_off_opening += comp_cf
-                    lob.save(
+                    # 2) Upsert: LeaveOpeningBalance for current_year
+                    lob, created = LeaveOpeningBalance.objects.get_or_create(
+                        employee=emp,
+                        year=current_year,
+                        defaults=dict(
+                            sick_leave_opening=policy["sick"],
+                            casual_leave_opening=policy["casual"],
+                            earned_leave_opening=policy["earned"],
+                            comp_off_opening=comp_cf,
+                        ),
+                    )
+                    if not created:
+                        lob.sick_leave_opening = policy["sick"]
+                        lob.casual_leave_opening = policy["casual"]
+                        lob.earned_leave_opening = policy["earned"]
+                        lob.comp_off_opening = comp_cf
+                        lob.save(
+                            update_fields=[
+                                "sick_leave_opening",
+                                "casual_leave_opening",
+                                "earned_leave_opening",
+                                "comp_off_opening",
+                            ]
+                        )
+
+                    # 3) Rebuild this year's monthly balances (Jan→Dec), once,
+                    #    when the rollover finishes
+                    mark_dirty(emp.pk, current_year, 1)
+
+                    count += 1
+        else:
+
+            for emp in employees:
+                with transaction.atomic():
+                    policy = policy_entitlements_for(emp)
+                    comp_cf = get_comp_off_carry_forward(emp, prev_year)
+
+                    # 1) Snapshot: LeavesAvailable reflects the NEW opening
+                    leaves_avail, _ = LeavesAvailable.objects.get_or_create(employee=emp)
+                    leaves_avail.sick_leave += policy["sick"]
+                    leaves_avail.casual_leave += policy["casual"]
+                    leaves_avail.earned_leave += policy["earned"]
+                    leaves_avail.comp_off += comp_cf
+                    leaves_avail.save(
                         update_fields=[
-                            "sick_leave_opening",
-                            "casual_leave_opening",
-                            "earned_leave_opening",
-                            "comp_off_opening",
+                            "sick_leave",
+                            "casual_leave",
+                            "earned_leave",
+                            "comp_off",
                         ]
                     )
 
-                # 3) Rebuild this year's monthly balances (Jan→Dec)
-                rebuild_monthly_balances(
-                    employee_id=emp.pk, year=current_year, start_month=1
-                )
-
-                count += 1
+                    # 2) Upsert: LeaveOpeningBalance for current_year
+                    lob, created = LeaveOpeningBalance.objects.get_or_create(
+                        employee=emp,
+                        year=current_year,
+                        defaults=dict(
+                            sick_leave_opening=policy["sick"],
+                            casual_leave_opening=policy["casual"],
+                            earned_leave_opening=policy["earned"],
+                            comp_off_opening=comp_cf,
+                        ),
+                    )
+                    if not created:
+                        lob.sick_leave_opening += policy["sick"]
+                        lob.casual_leave_opening += policy["casual"]
+                        lob.earned_leave_opening += policy["earned"]
+                        lob.comp_off_opening += comp_cf
+                        lob.save(
+                            update_fields=[
+                                "sick_leave_opening",
+                                "casual_leave_opening",
+                                "earned_leave_opening",
+                                "comp_off_opening",
+                            ]
+                        )
+
+                    # 3) Rebuild this year's monthly balances (Jan→Dec), once,
+                    #    when the rollover finishes
+                    mark_dirty(emp.pk, current_year, 1)
+
+                    count += 1
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -0,0 +1,83 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from time_management.services.report_jobs import (
+    claim_next,
+    purge_finished,
+    requeue_stale,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = "Run queued background report jobs with a local pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "REPORT_JOB_WORKERS", 2),
+            help="Number of jobs run at the same time.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=2.0,
+            help="Seconds to wait before looking for new jobs when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for new jobs.",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        purged = purge_finished()
+        if requeued or purged:
+            self.stdout.write(
+                f"Requeued {requeued} stale job(s), purged {purged} old job(s)."
+            )
+
+        self._stop = threading.Event()
+        workers = [
+            threading.Thread(
+                target=self._work,
+                args=(options["once"], options["poll"]),
+                name=f"report-job-{n}",
+                daemon=True,
+            )
+            for n in range(max(1, options["workers"]))
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            self._stop.set()
+            self.stdout.write("Stopping after the running job(s)...")
+            for worker in workers:
+                worker.join()
+
+        self.stdout.write(self.style.SUCCESS("Report job workers stopped."))
+
+    def _work(self, once, poll):
+        try:
+            while not self._stop.is_set():
+                job = claim_next()
+                if job is None:
+                    if once:
+                        return
+                    self._stop.wait(poll)
+                    continue
+                job = run_job(job)
+                style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+                self.stdout.write(style(f"{job.report} {job.job_id}: {job.status}"))
+        finally:
+            # Every thread has its own connection
+            connection.close()
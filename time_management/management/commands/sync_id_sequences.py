@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from time_management.services.sequences import SEQUENCES, sync_sequence
+
+
+class Command(BaseCommand):
+    help = "Move the ID sequence counters up to the highest id already stored (run after importing rows with explicit ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            help="Model names to sync (default: all sequenced models)",
+        )
+
+    def handle(self, *args, **options):
+        names = options["models"] or list(SEQUENCES)
+
+        for name in names:
+            if name not in SEQUENCES:
+                self.stdout.write(self.style.WARNING(f"No sequence for model '{name}'"))
+                continue
+            model = apps.get_model("time_management", name)
+            last_value = sync_sequence(model)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{SEQUENCES[name].prefix}: counter at {last_value}"
+                )
+            )
@@ -0,0 +1,63 @@
+# time_management/management/commands/sync_incremental_biometric.py
+
+from django.core.management.base import BaseCommand, CommandError
+from time_management.services.biometric_sync import (
+    BiometricIngestor,
+    get_watermark,
+    sync_new_punches,
+)
+
+from datetime import datetime, date
+import logging
+import os
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync only the biometric days that received punches since the last run "
+        "(DownloadDatetime watermark on the reporting DB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Start from this download time (YYYY-MM-DD HH:MM:SS) instead of "
+            "the stored watermark.",
+        )
+
+    def handle(self, *args, **options):
+        # --- Setup logging with monthly rotation ---
+        log_dir = "/tmp/biometric_logs"
+        os.makedirs(log_dir, exist_ok=True)
+        log_month = date.today().strftime("%Y-%m")
+        log_file = os.path.join(log_dir, f"biometric_sync_{log_month}.log")
+
+        logging.basicConfig(
+            filename=log_file,
+            level=logging.INFO,
+            format="%(asctime)s [%(levelname)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                raise CommandError("Invalid --since. Use YYYY-MM-DD HH:MM:SS.")
+
+        start = since or get_watermark()
+        logging.info(f"---- Incremental biometric sync from {start} ----")
+        ingestor = BiometricIngestor("incremental", warn=self.warn)
+        stats, days, mark = sync_new_punches(ingestor, since=since)
+
+        if not days:
+            summary = "No new punches."
+        else:
+            summary = f"{days} employee day(s) re-synced. {stats}. Watermark: {mark}"
+        self.stdout.write(self.style.SUCCESS(summary))
+        logging.info(summary)
+
+    def warn(self, message):
+        self.stdout.write(self.style.WARNING(message))
+        logging.warning(message)
@@ -1,21 +1,30 @@
 # time_management/management/commands/sync_intime_biometric.py
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from time_management.models import Employee, BiometricData
-from my_project.settings import DEFAULT_BIOMETRIC_URL
-
-import requests
-from datetime import datetime, timedelta, date
+from time_management.services.biometric_sync import (
+    SYNC_SOURCE,
+    BiometricIngestor,
+    biometric_session,
+    event_summary_rows,
+    fetch_day,
+)
+
+from datetime import datetime, date
 import logging
 import os
 
-from django.db.models import Q
-
 
 class Command(BaseCommand):
     help = "Sync biometric attendance data from external API"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            choices=["api", "reporting"],
+            default=SYNC_SOURCE,
+            help="Read punches through the dtms API or straight from the reporting DB.",
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("Starting biometric data sync (API)...")
 
@@ -36,113 +45,36 @@ class Command(BaseCommand):
         logging.info("---- Biometric API sync started ----")
 
         # Get today's date
-        today_str = datetime.today().strftime("%Y-%m-%d")
-
-        # Use it in your API URL
-        api_url = f"{DEFAULT_BIOMETRIC_URL}/dtms-event-summary/{today_str}/"
-
-        # --- 1️ Fetch JSON data from API ---
-        try:
-            # api_url = "http://192.168.0.10:8000/api/attendance/today/"
-            response = requests.get(api_url)
-            response.raise_for_status()
-            biometric_rows = response.json()
-        except Exception as e:
-            error_msg = f"Failed to fetch data from API: {e}"
-            self.stdout.write(self.style.ERROR(error_msg))
-            logging.error(error_msg)
-            return
-
-        if not biometric_rows:
-            msg = "No biometric records received from API."
-            self.stdout.write(msg)
-            logging.info(msg)
-            return
-
-        created_count = 0
-        updated_count = 0
-
-        # --- 2️ Process each row ---
-        for row in biometric_rows:
-            user_id = row.get("EmpCode")
-            record_date = row.get("Date")
-            first_in = row.get("FirstIn")
-            last_out = row.get("LastOut")
-
-            try:
-                employee = Employee.objects.get(employee_code=str(user_id))
-            except Employee.DoesNotExist:
-                warning_msg = f"Employee with code {user_id} not found. Skipping."
-                self.stdout.write(self.style.WARNING(warning_msg))
-                logging.warning(warning_msg)
-                continue
-
-            # --- 3️ Skip if first_in/last_out missing ---
-            if not first_in:
-                warning_msg = f"Skipping {user_id} on {record_date} — first_in or last_out missing."
-                self.stdout.write(self.style.WARNING(warning_msg))
-                logging.warning(warning_msg)
-                continue
-
-            # --- 4️ Parse datetimes and calculate work hours ---
+        today = datetime.today().date()
+
+        ingestor = BiometricIngestor("in_time", warn=self.warn)
+        if options["source"] == "reporting":
+            # --- 1️ Aggregate straight from the reporting DB, bulk write ---
+            stats = ingestor.ingest_stream(event_summary_rows(today, today))
+        else:
+            # --- 1️ Fetch JSON data from API (timeouts + retries) ---
             try:
-                # Example first_in: "2025-05-08 09:36:02"
-                first_in_dt = datetime.strptime(first_in, "%Y-%m-%dT%H:%M:%S")
-
-                in_time_obj = first_in_dt.time()
-
+                biometric_rows = fetch_day(biometric_session(1), today)
             except Exception as e:
-                error_msg = (
-                    f"Datetime parsing error for {user_id} on {record_date}: {e}"
-                )
+                error_msg = f"Failed to fetch data from API: {e}"
                 self.stdout.write(self.style.ERROR(error_msg))
                 logging.error(error_msg)
-                continue
+                return
 
-            # --- 5️ Create or update BiometricData ---
-            with transaction.atomic():
-                # bio_obj, created = BiometricData.objects.get_or_create(
-                #     employee=employee,
-                #     date=record_date,
-                #     defaults={
-                #         "employee_code": employee.employee_code,
-                #         "employee_name": employee.employee_name,
-                #         "in_time": in_time_obj,
-                #         "status": "Present",
-                #         "remarks": "",
-                #         "modified_by": None,
-                #     },
-                # )
+            if not biometric_rows:
+                msg = "No biometric records received from API."
+                self.stdout.write(msg)
+                logging.info(msg)
+                return
 
-                # if not created:
-                qs = BiometricData.objects.filter(employee=employee, date=record_date)
-                count = qs.count()
+            # --- 2️ Bulk create / update the in_time of BiometricData ---
+            stats = ingestor.ingest(biometric_rows)
 
-                if count > 1:
-                    warning_msg = f"Multiple records for Employee={user_id}, Date={record_date}. Skipping."
-                    self.stdout.write(self.style.WARNING(warning_msg))
-                    logging.warning(warning_msg)
-                    continue
-                elif count == 1:
-                    bio_obj = qs.first()
-                    bio_obj.in_time = in_time_obj
-                    bio_obj.status = "Present"
-                    bio_obj.save()
-                    updated_count += 1
-                else:
-                    BiometricData.objects.create(
-                        employee=employee,
-                        date=record_date,
-                        employee_code=employee.employee_code,
-                        employee_name=employee.employee_name,
-                        in_time=in_time_obj,
-                        status="Present",
-                        remarks="",
-                        modified_by=None,
-                    )
-                    created_count += 1
-
-        summary = f"Sync complete. Created: {created_count}, Updated: {updated_count}"
+        summary = f"Sync complete. {stats}"
         self.stdout.write(self.style.SUCCESS(summary))
         logging.info(summary)
         logging.info("---- Biometric API sync ended ----\n")
+
+    def warn(self, message):
+        self.stdout.write(self.style.WARNING(message))
+        logging.warning(message)
@@ -3,6 +3,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from time_management.models import LeavesTaken
+from time_management.services.rebuild_queue import defer_rebuilds
 
 
 class Command(BaseCommand):
@@ -21,6 +22,7 @@ class Command(BaseCommand):
         )
 
     @transaction.atomic
+    @defer_rebuilds()  # one balance rebuild per employee/year, after commit
     def handle(self, *args, **options):
         approved_only = options["approved_only"]
         dry_run = options["dry_run"]
@@ -5,7 +5,7 @@
 
 # ### models.py
 
-from django.db import models, transaction
+from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from datetime import date
 from datetime import timedelta
@@ -20,6 +20,26 @@ import uuid
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from time_management.querysets import LeaveDayQuerySet
+from time_management.services.sequences import next_id
+
+
+# Counter behind the PREFIX_000nn primary keys (see services/sequences.py)
+class IdSequence(models.Model):
+    prefix = models.CharField(max_length=20, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix} ({self.last_value})"
+
+
+class SyncWatermark(models.Model):
+    # High-water mark of an incremental sync (e.g. sync_DTMS_bio download time)
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
 
 
 # Employee Table
@@ -146,15 +166,7 @@ class Employee(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.employee_id:
-            with transaction.atomic():
-                last = Employee.objects.select_for_update().aggregate(
-                    models.Max("employee_id")
-                )["employee_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.employee_id = f"EMP_{last_num + 1:05d}"
-                else:
-                    self.employee_id = "EMP_00001"
+            self.employee_id = next_id(Employee)
         # --------- ARRIS EXPERIENCE AUTO-CALCULATION ---------
 
         if self.doj and isinstance(self.doj, date):
@@ -350,15 +362,7 @@ class User(models.Model):
                 pass
 
         if not self.user_id:
-            with transaction.atomic():
-                last = User.objects.select_for_update().aggregate(
-                    models.Max("user_id")
-                )["user_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.user_id = f"USR_{last_num + 1:05d}"
-                else:
-                    self.user_id = "USR_00001"
+            self.user_id = next_id(User)
 
         # Password hashing
         if self.password and not self.password.startswith("pbkdf2_"):
@@ -535,15 +539,7 @@ class Hierarchy(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.hierarchy_id:
-            with transaction.atomic():
-                last = Hierarchy.objects.select_for_update().aggregate(
-                    models.Max("hierarchy_id")
-                )["hierarchy_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.hierarchy_id = f"HR_{last_num + 1:05d}"
-                else:
-                    self.hierarchy_id = "HR_00001"
+            self.hierarchy_id = next_id(Hierarchy)
 
         # Sync designation and department from the employee model
         if self.employee:
@@ -571,6 +567,35 @@ class Hierarchy(models.Model):
         return f"{self.employee} reports to {self.reporting_to}"
 
 
+# Org-chart closure table: one row per (manager, report) pair at any depth.
+# Maintained from Hierarchy by services/org_closure.py.
+class OrgClosure(models.Model):
+    ancestor = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="org_descendants"
+    )
+    descendant = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="org_ancestors"
+    )
+    # Shortest path over reporting_to + second_reporting_to edges
+    depth = models.PositiveIntegerField()
+    # Shortest path over reporting_to edges only (null: second-reporting only)
+    primary_depth = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="unique_org_closure_pair"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["ancestor", "depth"]),
+            models.Index(fields=["ancestor", "primary_depth"]),
+        ]
+
+    def __str__(self):
+        return f"{self.descendant_id} under {self.ancestor_id} ({self.depth})"
+
+
 class CompOff(models.Model):
 
     leave_type = models.CharField(
@@ -659,15 +684,7 @@ class CompOffRequest(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.compoff_request_id:
-            with transaction.atomic():
-                last = CompOffRequest.objects.select_for_update().aggregate(
-                    models.Max("compoff_request_id")
-                )["compoff_request_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.compoff_request_id = f"CR_{last_num + 1:05d}"
-                else:
-                    self.compoff_request_id = "CR_00001"
+            self.compoff_request_id = next_id(CompOffRequest)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -695,15 +712,7 @@ class LeaveOpeningBalance(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.balance_id:
-            with transaction.atomic():
-                last = LeaveOpeningBalance.objects.select_for_update().aggregate(
-                    models.Max("balance_id")
-                )["balance_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.balance_id = f"LVOPN_{last_num + 1:05d}"
-                else:
-                    self.balance_id = "LVOPN_00001"
+            self.balance_id = next_id(LeaveOpeningBalance)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -730,15 +739,7 @@ class MonthlyLeaveAvailed(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.availed_id:
-            with transaction.atomic():
-                last = MonthlyLeaveAvailed.objects.select_for_update().aggregate(
-                    models.Max("availed_id")
-                )["availed_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.availed_id = f"LVAVLD_{last_num + 1:05d}"
-                else:
-                    self.availed_id = "LVAVLD_00001"
+            self.availed_id = next_id(MonthlyLeaveAvailed)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -765,15 +766,7 @@ class MonthlyLeaveBalance(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.monthly_balance_id:
-            with transaction.atomic():
-                last = MonthlyLeaveBalance.objects.select_for_update().aggregate(
-                    models.Max("monthly_balance_id")
-                )["monthly_balance_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.monthly_balance_id = f"MNLV_{last_num + 1:05d}"
-                else:
-                    self.monthly_balance_id = "MNLV_00001"
+            self.monthly_balance_id = next_id(MonthlyLeaveBalance)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -801,15 +794,7 @@ class LeavesAvailable(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.leave_avail_id:
-            with transaction.atomic():
-                last = LeavesAvailable.objects.select_for_update().aggregate(
-                    models.Max("leave_avail_id")
-                )["leave_avail_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.leave_avail_id = f"LVAVL_{last_num + 1:05d}"
-                else:
-                    self.leave_avail_id = "LVAVL_00001"
+            self.leave_avail_id = next_id(LeavesAvailable)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -868,15 +853,7 @@ class LeavesTaken(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.leave_taken_id:
-            with transaction.atomic():
-                last = LeavesTaken.objects.select_for_update().aggregate(
-                    models.Max("leave_taken_id")
-                )["leave_taken_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.leave_taken_id = f"LVTKN_{last_num + 1:05d}"
-                else:
-                    self.leave_taken_id = "LVTKN_00001"
+            self.leave_taken_id = next_id(LeavesTaken)
 
         super().save(*args, **kwargs)
 
@@ -935,15 +912,7 @@ class Calendar(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.calendar_id:
-            with transaction.atomic():
-                last = Calendar.objects.select_for_update().aggregate(
-                    models.Max("calendar_id")
-                )["calendar_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.calendar_id = f"CAL_{last_num + 1:05d}"
-                else:
-                    self.calendar_id = "CAL_00001"
+            self.calendar_id = next_id(Calendar)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -978,15 +947,7 @@ class BiometricData(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.biometric_id:
-            with transaction.atomic():
-                last = BiometricData.objects.select_for_update().aggregate(
-                    models.Max("biometric_id")
-                )["biometric_id__max"]
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.biometric_id = f"BIO_{last_num + 1:09d}"
-                else:
-                    self.biometric_id = "BIO_000000001"
+            self.biometric_id = next_id(BiometricData)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1047,6 +1008,24 @@ class ClientPOC(models.Model):
 ### Projects Table
 
 
+def ledger_safe_save_kwargs(instance, kwargs):
+    """
+    consumed_hours is moved only by the hours ledger's F() deltas
+    (services/hours_ledger.py). A plain save() of an existing row would write
+    back the value loaded earlier and lose any delta applied since, so it
+    updates every other column instead.
+    """
+    if instance._state.adding or kwargs.get("force_insert"):
+        return kwargs
+    if kwargs.get("update_fields") is None:
+        kwargs["update_fields"] = [
+            field.name
+            for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name != "consumed_hours"
+        ]
+    return kwargs
+
+
 class Project(models.Model):
     project_id = models.CharField(max_length=20, primary_key=True, blank=True)
     project_title = models.CharField(max_length=255, blank=True, null=True)
@@ -1076,16 +1055,7 @@ class Project(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.project_id:
-            with transaction.atomic():
-                last = Project.objects.select_for_update().aggregate(
-                    models.Max("project_id")
-                )["project_id__max"]
-
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.project_id = f"PROJ_{last_num + 1:05d}"
-                else:
-                    self.project_id = "PROJ_00001"
+            self.project_id = next_id(Project)
 
         # Recalculate total hours
         self.total_hours = (self.estimated_hours or 0) + (self.variation_hours or 0)
@@ -1117,24 +1087,12 @@ class Project(models.Model):
                 self.completed_date = timezone.now().date()
             else:
                 self.completed_date = None
-        super().save(*args, **kwargs)
+        super().save(*args, **ledger_safe_save_kwargs(self, kwargs))
 
     def __str__(self):
         return f"{self.project_title} ({self.project_id})"
 
 
-# Helper function to generate auto ID
-
-
-def generate_auto_id(model_class, prefix):
-    pk_name = model_class._meta.pk.name
-    last = model_class.objects.order_by(f"-{pk_name}").first()
-    if last and hasattr(last, model_class._meta.pk.name):
-        last_num = int(getattr(last, model_class._meta.pk.name).split("_")[1])
-        return f"{prefix}_{last_num + 1:05d}"
-    return f"{prefix}_00001"
-
-
 class Building(models.Model):
     building_id = models.CharField(max_length=50, primary_key=True, blank=True)
     building_title = models.CharField(max_length=200)
@@ -1150,7 +1108,7 @@ class Building(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.building_id:
-            self.building_id = generate_auto_id(Building, "BLD")
+            self.building_id = next_id(Building)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1177,7 +1135,7 @@ class Task(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.task_id:
-            self.task_id = generate_auto_id(Task, "TASK")
+            self.task_id = next_id(Task)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1206,7 +1164,7 @@ class ProjectAssign(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.project_assign_id:
-            self.project_assign_id = generate_auto_id(ProjectAssign, "PRASS")
+            self.project_assign_id = next_id(ProjectAssign)
         super().save(*args, **kwargs)
 
 
@@ -1229,11 +1187,13 @@ class BuildingAssign(models.Model):
     project_assign = models.ForeignKey(
         ProjectAssign, on_delete=models.SET_NULL, null=True, blank=True
     )
+    # Approved timesheet hours, maintained by services/hours_ledger.py
+    consumed_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
     def save(self, *args, **kwargs):
         if not self.building_assign_id:
-            self.building_assign_id = generate_auto_id(BuildingAssign, "BLASS")
-        super().save(*args, **kwargs)
+            self.building_assign_id = next_id(BuildingAssign)
+        super().save(*args, **ledger_safe_save_kwargs(self, kwargs))
 
 
 class TaskAssign(models.Model):
@@ -1260,11 +1220,13 @@ class TaskAssign(models.Model):
     building_assign = models.ForeignKey(
         BuildingAssign, on_delete=models.SET_NULL, null=True, blank=True
     )
+    # Approved timesheet hours, maintained by services/hours_ledger.py
+    consumed_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
     def save(self, *args, **kwargs):
         if not self.task_assign_id:
-            self.task_assign_id = generate_auto_id(TaskAssign, "TKASS")
-        super().save(*args, **kwargs)
+            self.task_assign_id = next_id(TaskAssign)
+        super().save(*args, **ledger_safe_save_kwargs(self, kwargs))
 
 
 class TimeSheet(models.Model):
@@ -1283,25 +1245,18 @@ class TimeSheet(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.timesheet_id:
-            with transaction.atomic():
-                last = TimeSheet.objects.select_for_update().aggregate(
-                    models.Max("timesheet_id")
-                )["timesheet_id__max"]
-
-                if last:
-                    last_num = int(last.split("_")[1])
-                    self.timesheet_id = f"TS_{last_num + 1:015d}"
-                else:
-                    self.timesheet_id = "TS_000000000000001"
+            self.timesheet_id = next_id(TimeSheet)
         super().save(*args, **kwargs)
         # -- CompOff eligibility check after saving --
         if self.date and self.employee:
-            try:
-                calendar = Calendar.objects.get(date=self.date)
+            from time_management.services.work_calendar import work_calendar
+
+            # Calendar flags come from the per-process cache (no query)
+            if work_calendar.has_entry(self.date):
                 if (
-                    # calendar.is_weekend or
-                    calendar.is_holiday
-                    or calendar.day_of_week == 6
+                    # work_calendar.is_weekend(self.date) or
+                    work_calendar.is_holiday(self.date)
+                    or self.date.weekday() == 6
                 ):
 
                     # # Check if already exists
@@ -1351,7 +1306,7 @@ class TimeSheet(models.Model):
                             date=self.date,
                             defaults={
                                 "duration": duration,
-                                "reason": f"Worked on {'Weekend' if calendar.is_weekend else 'Holiday'}",
+                                "reason": f"Worked on {'Weekend' if work_calendar.is_weekend(self.date) else 'Holiday'}",
                                 # "expiry_date": self.date + timedelta(days=180),
                                 "expiry_date": self.date + timedelta(days=expiry_days),
                                 "status": "eligible",
@@ -1368,9 +1323,76 @@ class TimeSheet(models.Model):
                             reason="Hours dropped below comp off threshold",
                         )
 
-            except Calendar.DoesNotExist:
-                # Optional: log warning or skip silently
-                pass
+            # No Calendar row: skip silently, as before
+
+
+# Approved timesheet hours per (project, building, task, department, date).
+# Maintained from TimeSheet by services/project_facts.py; project reports
+# group over it instead of joining TimeSheet up to Project.
+class ProjectHoursDaily(models.Model):
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="hours_daily"
+    )
+    building = models.ForeignKey(
+        Building, on_delete=models.CASCADE, null=True, blank=True
+    )
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, null=True, blank=True)
+    department = models.CharField(max_length=100, blank=True, null=True)
+    date = models.DateField(null=True, blank=True)
+    hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    entries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "building", "task", "department", "date"],
+                name="unique_project_hours_daily_cell",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["project", "date"]),
+            models.Index(fields=["department", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.date}: {self.hours}h"
+
+
+class ReportJob(models.Model):
+    job_id = models.CharField(max_length=32, primary_key=True, blank=True)
+    report = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64, db_index=True)
+    # Set while queued / running, so identical requests share one job
+    inflight_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="queued",
+    )
+    result_path = models.CharField(max_length=255, blank=True, null=True)
+    filename = models.CharField(max_length=255, blank=True, null=True)
+    content_type = models.CharField(max_length=100, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def save(self, *args, **kwargs):
+        if not self.job_id:
+            self.job_id = uuid.uuid4().hex
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.report} {self.job_id} ({self.status})"
 
 
 class Variation(models.Model):
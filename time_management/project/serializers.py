@@ -29,6 +29,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 class ProjectAssignSerializer(serializers.ModelSerializer):
@@ -89,6 +90,7 @@ class TaskAssignSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskAssign
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 # Building Serializer
@@ -182,6 +184,7 @@ class ProjectFullSerializer(serializers.ModelSerializer):
             "attachments",
             "variation",
         ]
+        read_only_fields = ["consumed_hours"]
 
     def get_assigns(self, obj):
         assigns = ProjectAssign.objects.filter(project=obj)
@@ -202,3 +205,4 @@ class ProjectClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
@@ -3,13 +3,14 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
 
-import csv
-import io
 from datetime import datetime
-from django.http import HttpResponse
-from django.db import connection
 
 from time_management.employee.serializers import EmployeeViewSerializer
+from time_management.services.streaming_export import (
+    stream_query,
+    streaming_csv_response,
+)
+from time_management.services.xlsx_export import Sheet, wants_xlsx, xlsx_response
 
 
 from ..models import (
@@ -503,9 +504,21 @@ def project_creator(request, employee_id=None):
     return Response(serializer.data)
 
 
-@api_view(["GET"])
-def export_report(request):
-    query = """
+EXPORT_REPORT_COLUMNS = [
+    "Date",
+    "Project ID",
+    "Project Name",
+    "Sub Division",
+    "Employee Name",
+    "Employee ID",
+    "Designation",
+    "Department",
+    "Area of Work",
+    "Variation",
+    "Total Hours",
+]
+
+EXPORT_REPORT_SQL = """
         SELECT 
     ts.date AS `Date`,
     p.project_code AS `Project ID`,
@@ -529,6 +542,7 @@ LEFT JOIN time_management_projectassign pa ON ba.project_assign_id = pa.project_
 LEFT JOIN time_management_projectassign_employee pae ON pa.project_assign_id = pae.projectassign_id AND pae.employee_id = e.employee_id
 LEFT JOIN time_management_project p ON pa.project_id = p.project_id
 LEFT JOIN time_management_variation v ON v.project_id = p.project_id
+{where}
 GROUP BY 
     ts.date,
     p.project_code, p.project_title,
@@ -540,23 +554,58 @@ GROUP BY
 ORDER BY p.project_code, e.employee_name;
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(query)
-        columns = [col[0] for col in cursor.description]
-        rows = cursor.fetchall()
+
+def _export_report_filters(params):
+    """
+    WHERE clause + params from ?start=&end= (YYYY-MM-DD, inclusive),
+    ?project= (project_id or project_code) and ?department=.
+    """
+    clauses, values = [], []
+    for key, clause in (("start", "ts.date >= %s"), ("end", "ts.date <= %s")):
+        if params.get(key):
+            clauses.append(clause)
+            values.append(datetime.strptime(params[key], "%Y-%m-%d").date())
+    if params.get("project"):
+        clauses.append("(p.project_id = %s OR p.project_code = %s)")
+        values += [params["project"], params["project"]]
+    if params.get("department"):
+        clauses.append("e.department = %s")
+        values.append(params["department"])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, values
+
+
+@api_view(["GET"])
+def export_report(request):
+    """
+    GET /export-report/?start=2025-01-01&end=2025-03-31&project=..&department=..&gzip=1
+
+    Streams the project timesheet report as CSV (gzip-compressed with
+    ?gzip=1), or as an Excel workbook with ?export=xlsx. Rows are read from a
+    server-side cursor and written out in batches, so memory stays flat
+    however much history is exported.
+    """
+    try:
+        where, params = _export_report_filters(request.query_params)
+    except ValueError:
+        return Response(
+            {"error": "Invalid 'start'/'end' format. Use YYYY-MM-DD."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
     # Generate timestamped filename
     now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     filename = f"projects_report_{now}.csv"
 
-    # Create CSV in memory
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(columns)
-    for row in rows:
-        writer.writerow(row)
-
-    # Prepare HTTP response
-    response = HttpResponse(buffer.getvalue(), content_type="text/csv")
-    response["Content-Disposition"] = f"attachment; filename={filename}"
-    return response
+    rows = stream_query(EXPORT_REPORT_SQL.format(where=where), params)
+    if wants_xlsx(request):
+        return xlsx_response(
+            f"projects_report_{now}.xlsx",
+            [Sheet("Project hours", EXPORT_REPORT_COLUMNS, rows)],
+        )
+    return streaming_csv_response(
+        filename,
+        EXPORT_REPORT_COLUMNS,
+        rows,
+        gzip=request.query_params.get("gzip") in ("1", "true"),
+    )
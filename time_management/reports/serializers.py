@@ -17,6 +17,7 @@ from ..models import (
     Calendar,
     LeaveOpeningBalance,
     MonthlyLeaveAvailed,
+    ReportJob,
 )
 from collections import defaultdict
 from datetime import timedelta
@@ -27,6 +28,10 @@ from time_management.project.serializers import (
 )
 
 from time_management.task.serializers import TaskEntrySerializer
+from time_management.services.headcount import HeadcountTimeline
+from time_management.services.lop import lop_summary
+from time_management.services.work_calendar import PRESENT, WEEKEND, work_calendar
+from time_management.services.project_facts import project_hours_by_period
 
 
 class EmployeeSerializer(serializers.ModelSerializer):
@@ -148,6 +153,7 @@ class ProjectHoursSerializer(serializers.ModelSerializer):
             "consumed_hours",
             "assigns",
         ]
+        read_only_fields = ["consumed_hours"]
 
     def get_assigns(self, obj):
         assigns = ProjectAssign.objects.filter(project=obj)
@@ -158,6 +164,17 @@ class ProjectHoursSerializer(serializers.ModelSerializer):
         return VariationSerializer(variation, many=True).data
 
 
+def _project_hours(serializer, project, period, department=None):
+    """
+    Period rows of ``project``: from ``context["project_hours"]`` when the
+    view computed them for every project at once, else one small query.
+    """
+    hours = serializer.context.get("project_hours")
+    if hours is None:
+        hours = project_hours_by_period(period, [project.pk], department=department)
+    return hours.get(project.pk, [])
+
+
 # weekly Project Serializer
 class ProjectWeeklyHoursSerializer(serializers.ModelSerializer):
 
@@ -175,27 +192,22 @@ class ProjectWeeklyHoursSerializer(serializers.ModelSerializer):
             "consumed_hours",
             "task_consumed_hours_by_week",
         ]
+        read_only_fields = ["consumed_hours"]
 
     def get_task_consumed_hours_by_week(self, obj):
-        # Group timesheet entries by week and sum approved hours
-        qs = (
-            TimeSheet.objects.filter(
-                task_assign__building_assign__project_assign__project=obj, approved=True
-            )
-            .annotate(week=TruncWeek("date"))
-            .values("week")
-            .annotate(total=Sum("task_hours"))
-            .order_by("week")
-        )
-        return [
-            {
-                "week": (
-                    entry["week"].strftime("%G-W%V") if entry["week"] else "Unknown"
-                ),
-                "hours": float(entry["total"]),
-            }
-            for entry in qs
-        ]
+        # Approved hours by week, from the ProjectHoursDaily fact table
+        return _project_hours(self, obj, "week")
+
+
+def _non_weekend_days(week_start):
+    # Calendar rows of the week that are not weekends (holidays included, as
+    # before), read from the cached work calendar
+    count = 0
+    for offset in range(7):
+        flags = work_calendar.flags(week_start + timedelta(days=offset))
+        if flags & PRESENT and not flags & WEEKEND:
+            count += 1
+    return count
 
 
 class ProjectDepartmentWeeklyStatsSerializer(serializers.ModelSerializer):
@@ -214,45 +226,33 @@ class ProjectDepartmentWeeklyStatsSerializer(serializers.ModelSerializer):
         filter_year = self.context.get("year")
 
         # Step 1: Get all weeks in the year
-        calendar_weeks = (
-            Calendar.objects.filter(year=filter_year)
-            .annotate(week=TruncWeek("date"))
-            .values("week")
-            .order_by("week")
-            .distinct()
+        days = list(
+            Calendar.objects.filter(year=filter_year).values_list("date", flat=True)
+        )
+        week_starts = sorted(
+            {day - timedelta(days=day.weekday()) for day in days if day}
         )
+        unknown_weeks = any(day is None for day in days)
+
+        # Step 2: Active employees at each week start, from one Employee query
+        filters = {"status": "active"}
+        if filter_department:
+            filters["department"] = filter_department
+        timeline = HeadcountTimeline.load(exit_fields=("relieving_date",), **filters)
+        active_counts = timeline.active_on(week_starts).tolist()
 
         stats = []
-        for entry in calendar_weeks:
-            week_start = entry["week"]
-            if not week_start:
-                stats.append(
-                    {
-                        "week": "Unknown",
-                        "working_days": 0,
-                        "active_employees": 0,
-                    }
-                )
-                continue
-
-            week_end = week_start + timedelta(days=6)
-
-            # Step 2: Working Days
-            working_days = Calendar.objects.filter(
-                date__range=(week_start, week_end), is_weekend=False
-            ).count()
-
-            # Identify active employees on the week
-            active_employees = Employee.objects.filter(
-                Q(doj__lte=week_start),
-                Q(relieving_date__isnull=True) | Q(relieving_date__gte=week_start),
-                status="active",
+        if unknown_weeks:
+            stats.append(
+                {
+                    "week": "Unknown",
+                    "working_days": 0,
+                    "active_employees": 0,
+                }
             )
 
-            if filter_department:
-                active_employees = active_employees.filter(department=filter_department)
-
-            active_employee_count = active_employees.count()
+        for week_start, active_employee_count in zip(week_starts, active_counts):
+            working_days = _non_weekend_days(week_start)
 
             stats.append(
                 {
@@ -283,6 +283,7 @@ class ProjectDepartmentWeeklyHoursSerializer(serializers.ModelSerializer):
             "consumed_hours",
             "task_consumed_hours_by_week",
         ]
+        read_only_fields = ["consumed_hours"]
 
     # def get_working_days(self, obj):
     #     filter_department = self.context.get("department")
@@ -388,42 +389,11 @@ class ProjectDepartmentWeeklyHoursSerializer(serializers.ModelSerializer):
     #     return result
 
     def get_task_consumed_hours_by_week(self, obj):
-        # Group timesheet entries by week and sum approved hours
-        request = self.context.get("request")
-        filter_department = self.context.get("department")
-        # print("Department", filter_department)
-        if filter_department:
-            qs = (
-                TimeSheet.objects.filter(
-                    task_assign__building_assign__project_assign__project=obj,
-                    approved=True,
-                    employee__department=filter_department,
-                )
-                .annotate(week=TruncWeek("date"))
-                .values("week")
-                .annotate(total=Sum("task_hours"))
-                .order_by("week")
-            )
-        else:
-            qs = (
-                TimeSheet.objects.filter(
-                    task_assign__building_assign__project_assign__project=obj,
-                    approved=True,
-                )
-                .annotate(week=TruncWeek("date"))
-                .values("week")
-                .annotate(total=Sum("task_hours"))
-                .order_by("week")
-            )
-        return [
-            {
-                "week": (
-                    entry["week"].strftime("%G-W%V") if entry["week"] else "Unknown"
-                ),
-                "hours": float(entry["total"]),
-            }
-            for entry in qs
-        ]
+        # Approved hours by week (of the context department, if any), from
+        # the ProjectHoursDaily fact table
+        return _project_hours(
+            self, obj, "week", department=self.context.get("department")
+        )
 
 
 # Yearly Project Serializer
@@ -443,25 +413,11 @@ class ProjectYearlyHoursSerializer(serializers.ModelSerializer):
             "consumed_hours",
             "task_consumed_hours_by_year",
         ]
+        read_only_fields = ["consumed_hours"]
 
     def get_task_consumed_hours_by_year(self, obj):
-        # Group timesheet entries by week and sum approved hours
-        qs = (
-            TimeSheet.objects.filter(
-                task_assign__building_assign__project_assign__project=obj, approved=True
-            )
-            .annotate(year=TruncYear("date"))
-            .values("year")
-            .annotate(total=Sum("task_hours"))
-            .order_by("year")
-        )
-        return [
-            {
-                "year": (entry["year"].strftime("%Y") if entry["year"] else "Unknown"),
-                "hours": float(entry["total"]),
-            }
-            for entry in qs
-        ]
+        # Approved hours by year, from the ProjectHoursDaily fact table
+        return _project_hours(self, obj, "year")
 
 
 # Monthly Project Serializer
@@ -481,27 +437,11 @@ class ProjectMonthlyHoursSerializer(serializers.ModelSerializer):
             "consumed_hours",
             "task_consumed_hours_by_month",
         ]
+        read_only_fields = ["consumed_hours"]
 
     def get_task_consumed_hours_by_month(self, obj):
-        # Group timesheet entries by week and sum approved hours
-        qs = (
-            TimeSheet.objects.filter(
-                task_assign__building_assign__project_assign__project=obj, approved=True
-            )
-            .annotate(month=TruncMonth("date"))
-            .values("month")
-            .annotate(total=Sum("task_hours"))
-            .order_by("month")
-        )
-        return [
-            {
-                "month": (
-                    entry["month"].strftime("%Y-%m") if entry["month"] else "Unknown"
-                ),
-                "hours": float(entry["total"]),
-            }
-            for entry in qs
-        ]
+        # Approved hours by month, from the ProjectHoursDaily fact table
+        return _project_hours(self, obj, "month")
 
 
 class TimeSheetTaskSerializer(serializers.ModelSerializer):
@@ -538,20 +478,7 @@ class LeavesFullAvailableSerializer(serializers.ModelSerializer):
         ]
 
     def get_lop(self, obj):
-        request = self.context.get("request")
-        filter_year = request.GET.get("year") if request else None
-
-        leaves = LeavesTaken.objects.filter(
-            employee=obj.employee, leave_type="lop", start_date__year=filter_year
-        )
-
-        total_lop = 0
-
-        for leave in leaves:
-
-            total_lop += float(leave.duration)
-
-        return total_lop
+        return _lop_summary(self, obj.employee_id).total_of(obj.employee_id)
 
 
 def add_months(month, year, offset):
@@ -561,6 +488,21 @@ def add_months(month, year, offset):
     return new_month, new_year
 
 
+def _lop_summary(serializer, employee_id):
+    """
+    LOP days for the ``?year=`` of the request: the LopSummary the list views
+    put in ``context["lop"]`` (every employee in one query), else a query for
+    this employee only.
+    """
+    if "lop" in serializer.context:
+        return serializer.context["lop"]
+    year = serializer.context.get("year")
+    if year is None:
+        request = serializer.context.get("request")
+        year = request.GET.get("year") if request else None
+    return lop_summary(year, [employee_id])
+
+
 class EmployeeLOPSerializer(serializers.ModelSerializer):
 
     lop_by_month = serializers.SerializerMethodField()
@@ -580,47 +522,7 @@ class EmployeeLOPSerializer(serializers.ModelSerializer):
         ]
 
     def get_lop_by_month(self, obj):
-
-        request = self.context.get("request")
-        filter_year = request.GET.get("year") if request else None
-
-        leaves = LeavesTaken.objects.filter(employee=obj, leave_type="lop")
-        month_buckets = defaultdict(float)
-
-        for leave in leaves:
-            current_date = leave.start_date
-            end_date = leave.end_date or leave.start_date
-            total_days = (end_date - current_date).days + 1
-            duration_per_day = float(leave.duration) / total_days
-
-            while current_date <= end_date:
-                day = current_date.day
-                month = current_date.month
-                year = current_date.year
-
-                # if day >= 21:
-                #     payroll_month, payroll_year = add_months(month, year, 2)
-                # else:
-                #     payroll_month, payroll_year = add_months(month, year, 1)
-
-                payroll_month = month
-                payroll_year = year
-
-                key = f"{payroll_year}-{str(payroll_month).zfill(2)}"
-
-                # Apply year filter
-                if filter_year and str(payroll_year) != str(filter_year):
-                    current_date += timedelta(days=1)
-                    continue
-
-                month_buckets[key] += duration_per_day
-
-                current_date += timedelta(days=1)
-
-        return [
-            {"month": month, "days": round(days, 2)}
-            for month, days in sorted(month_buckets.items())
-        ]
+        return _lop_summary(self, obj.pk).months_of(obj.pk)
 
 
 # Calendar Serializer
@@ -740,3 +642,29 @@ def get_monthly_leave_balance(employee, year):
         )
 
     return rows
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "job_id",
+            "report",
+            "params",
+            "status",
+            "filename",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != "done":
+            return None
+        path = f"/report-jobs/{obj.job_id}/download/"
+        request = self.context.get("request")
+        return request.build_absolute_uri(path) if request else path
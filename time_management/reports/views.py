@@ -9,7 +9,7 @@ from collections import defaultdict
 import csv
 import io
 from datetime import datetime
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.db import connection
 from datetime import datetime, timedelta, date, time
 
@@ -28,6 +28,8 @@ from ..models import (
     Employee,
     Calendar,
     BiometricData,
+    ProjectHoursDaily,
+    ReportJob,
 )
 
 from time_management.reports.serializers import (
@@ -42,7 +44,21 @@ from time_management.reports.serializers import (
     ProjectDepartmentWeeklyStatsSerializer,
     LeavesFullAvailableSerializer,
     EmployeeMonthlyAttendanceSerializer,
+    ReportJobSerializer,
 )
+from time_management.services.busdays import BusDayEngine
+from time_management.services.headcount import HeadcountTimeline
+from time_management.services.lop import lop_summary
+from time_management.services.xlsx_export import (
+    Sheet,
+    dict_rows,
+    wants_xlsx,
+    xlsx_response,
+)
+from time_management.services.project_facts import project_hours_by_period
+from time_management.services import report_jobs
+from time_management.services.report_cache import cached_report, report_cache_stats
+from time_management.services.timesheet_cube import DIMENSIONS, timesheet_cube
 from time_management.project.serializers import ProjectSerializer
 from time_management.building.serializers import BuildingAndAssignSerializer
 from time_management.leaves_taken.serializers import (
@@ -71,6 +87,7 @@ def hours_project_view(request, project_id=None):
 
 
 @api_view(["GET"])
+@cached_report("weekly-project-hours", depends_on=(Project, ProjectHoursDaily))
 def weekly_hours_project(request, project_id=None):
     if project_id:
         try:
@@ -83,12 +100,18 @@ def weekly_hours_project(request, project_id=None):
 
     else:
         project = Project.objects.all()
-        serializer = ProjectWeeklyHoursSerializer(project, many=True)
+        # One GROUP BY over the fact table for every project
+        serializer = ProjectWeeklyHoursSerializer(
+            project,
+            many=True,
+            context={"project_hours": project_hours_by_period("week")},
+        )
 
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
+@cached_report("weekly-employees", depends_on=(Calendar, Employee))
 def weekly_employees(request, department=None):
 
     year = request.query_params.get("year")
@@ -108,6 +131,9 @@ def weekly_employees(request, department=None):
 
 
 @api_view(["GET"])
+@cached_report(
+    "department-weekly-project-hours", depends_on=(Project, ProjectHoursDaily)
+)
 def department_weekly_hours_project(request, department=None, project_id=None):
 
     year = request.query_params.get("year")
@@ -122,7 +148,14 @@ def department_weekly_hours_project(request, department=None, project_id=None):
             serializer = ProjectDepartmentWeeklyHoursSerializer(
                 project,
                 many=True,
-                context={"request": request, "department": department, "year": year},
+                context={
+                    "request": request,
+                    "department": department,
+                    "year": year,
+                    "project_hours": project_hours_by_period(
+                        "week", department=department
+                    ),
+                },
             )
         except Project.DoesNotExist:
             return Response(
@@ -134,13 +167,21 @@ def department_weekly_hours_project(request, department=None, project_id=None):
         serializer = ProjectDepartmentWeeklyHoursSerializer(
             project,
             many=True,
-            context={"request": request, "department": department, "year": year},
+            context={
+                "request": request,
+                "department": department,
+                "year": year,
+                "project_hours": project_hours_by_period(
+                    "week", department=department
+                ),
+            },
         )
 
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
+@cached_report("monthly-project-hours", depends_on=(Project, ProjectHoursDaily))
 def monthly_hours_project(request, project_id=None):
     if project_id:
         try:
@@ -153,12 +194,18 @@ def monthly_hours_project(request, project_id=None):
 
     else:
         project = Project.objects.all()
-        serializer = ProjectMonthlyHoursSerializer(project, many=True)
+        # One GROUP BY over the fact table for every project
+        serializer = ProjectMonthlyHoursSerializer(
+            project,
+            many=True,
+            context={"project_hours": project_hours_by_period("month")},
+        )
 
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
+@cached_report("yearly-project-hours", depends_on=(Project, ProjectHoursDaily))
 def yearly_hours_project(request, project_id=None):
     if project_id:
         try:
@@ -171,7 +218,12 @@ def yearly_hours_project(request, project_id=None):
 
     else:
         project = Project.objects.all()
-        serializer = ProjectYearlyHoursSerializer(project, many=True)
+        # One GROUP BY over the fact table for every project
+        serializer = ProjectYearlyHoursSerializer(
+            project,
+            many=True,
+            context={"project_hours": project_hours_by_period("year")},
+        )
 
     return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -303,9 +355,11 @@ def leaves_available_report(request):
     year = request.query_params.get("year")
     if request.method == "GET":
         try:
-            obj = LeavesAvailable.objects.all()
+            obj = LeavesAvailable.objects.select_related("employee")
             serializer = LeavesFullAvailableSerializer(
-                obj, many=True, context={"request": request, "year": year}
+                obj,
+                many=True,
+                context={"request": request, "year": year, "lop": lop_summary(year)},
             )
             return Response(serializer.data, status=status.HTTP_200_OK)
         except LeavesAvailable.DoesNotExist:
@@ -320,9 +374,13 @@ def active_leaves_available_report(request):
     year = request.query_params.get("year")
     if request.method == "GET":
         try:
-            obj = LeavesAvailable.objects.filter(employee__user__status="active")
+            obj = LeavesAvailable.objects.filter(
+                employee__user__status="active"
+            ).select_related("employee")
             serializer = LeavesFullAvailableSerializer(
-                obj, many=True, context={"request": request, "year": year}
+                obj,
+                many=True,
+                context={"request": request, "year": year, "lop": lop_summary(year)},
             )
             return Response(serializer.data, status=status.HTTP_200_OK)
         except LeavesAvailable.DoesNotExist:
@@ -340,8 +398,16 @@ def employee_lop_view(request):
     if request.method == "GET":
         try:
             employees = Employee.objects.all()
+            # LOP leaves of the year in one query, split per employee/month
+            lop = lop_summary(year)
+            if wants_xlsx(request):
+                return xlsx_response(
+                    f"lop_report_{year or 'all'}.xlsx", _lop_sheets(employees, lop)
+                )
             serializer = EmployeeLOPSerializer(
-                employees, many=True, context={"request": request, "year": year}
+                employees,
+                many=True,
+                context={"request": request, "year": year, "lop": lop},
             )
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Employee.DoesNotExist:
@@ -350,6 +416,40 @@ def employee_lop_view(request):
             )
 
 
+LOP_EMPLOYEE_FIELDS = (
+    "employee_id",
+    "employee_code",
+    "employee_name",
+    "last_name",
+    "department",
+    "status",
+    "doj",
+    "resignation_date",
+)
+
+
+def _lop_sheets(employees, lop):
+    """LOP workbook: one row per employee, then one row per employee/month."""
+    employee_rows = (
+        row + (lop.total_of(row[0]),)
+        for row in employees.values_list(*LOP_EMPLOYEE_FIELDS).iterator()
+    )
+    month_rows = (
+        (employee_id, entry["month"], entry["days"])
+        for employee_id, months in lop.by_month.items()
+        for entry in months
+    )
+    return [
+        Sheet(
+            "Employees",
+            [f.replace("_", " ").title() for f in LOP_EMPLOYEE_FIELDS]
+            + ["LOP Days"],
+            employee_rows,
+        ),
+        Sheet("LOP by month", ["Employee Id", "Month", "Days"], month_rows),
+    ]
+
+
 def month_bounds_count(y, m):
     start = date(y, m, 1)
     end = date(y, m, monthrange(y, m)[1])
@@ -360,28 +460,8 @@ def month_label(y, m):
     return date(y, m, 1).strftime("%b %Y")  # e.g. "Feb 2025"
 
 
-def closing_headcount(day):
-    # employees active on this day
-    return Employee.objects.filter(doj__lte=day).filter(
-        Q(relieving_date__isnull=True, resignation_date__isnull=True)
-        | Q(relieving_date__gte=day)
-        | Q(resignation_date__gte=day)
-    )
-
-
-def resigned_in_month(start, end):
-    # end-date in the month (prefer relieving_date; else resignation_date)
-    return Employee.objects.filter(
-        Q(relieving_date__range=(start, end))
-        | (Q(relieving_date__isnull=True) & Q(resignation_date__range=(start, end)))
-    )
-
-
-def new_joiners_in_month(start, end):
-    return Employee.objects.filter(doj__range=(start, end))
-
-
 @api_view(["GET"])
+@cached_report("attrition", depends_on=(Employee,))
 def attrition_report(request):
     """
     GET /hr/attrition-report/?year=2025
@@ -409,30 +489,38 @@ def attrition_report(request):
         # e.g., January current year → no months to show
         return Response([], status=status.HTTP_200_OK)
 
-    trend = []
+    months = range(1, max_month + 1)
+    starts, ends = zip(*(month_bounds_count(year, m) for m in months))
+    opening_days = [start - timedelta(days=1) for start in starts]
+
+    # Every month answered from one Employee query
+    timeline = HeadcountTimeline.load()
+    opening_counts = timeline.active_on(opening_days).tolist()
+    # snapshot by employment type at month-end
+    type_counts = {
+        employment_type: counts.tolist()
+        for employment_type, counts in timeline.active_on(
+            ends, by="employment_type"
+        ).items()
+    }
+    resigned_counts = timeline.leavers(starts, ends).tolist()
+    recruit_counts = timeline.joiners(starts, ends).tolist()
+    zeros = [0] * len(months)
 
-    for m in range(1, max_month + 1):
-        start, end = month_bounds_count(year, m)
-        opening_day = start - timedelta(days=1)
+    trend = []
 
-        opening_count = closing_headcount(opening_day).count()
-        closing_qs = closing_headcount(end)
+    for i, m in enumerate(months):
+        opening_count = opening_counts[i]
 
-        # snapshot by employment type at month-end
-        type_counts = dict(
-            closing_qs.values("employment_type")
-            .annotate(c=Count("employee_id"))
-            .values_list("employment_type", "c")
-        )
-        fulltime = type_counts.get("Fulltime", 0)
-        interns = type_counts.get("Internship", 0)
-        trainees = type_counts.get("Trainee", 0)
-        contract = type_counts.get("Contract", 0)
+        fulltime = type_counts.get("Fulltime", zeros)[i]
+        interns = type_counts.get("Internship", zeros)[i]
+        trainees = type_counts.get("Trainee", zeros)[i]
+        contract = type_counts.get("Contract", zeros)[i]
 
         total_resources = fulltime + interns + trainees + contract
 
-        resigned = resigned_in_month(start, end).count()
-        new_recruits = new_joiners_in_month(start, end).count()
+        resigned = resigned_counts[i]
+        new_recruits = recruit_counts[i]
 
         avg_hc = (
             (opening_count + total_resources) / 2
@@ -475,12 +563,17 @@ def daterange(d1: date, d2: date):
 
 
 @api_view(["GET"])
+@cached_report(
+    "monthly-attendance",
+    depends_on=(Employee, LeavesTaken, BiometricData, Calendar),
+)
 def monthly_attendance_summary(request):
     """
     GET /hr/monthly-attendance-summary/?year=2025&month=10
 
     Returns a list of employees (active during the month) with:
       department, name, absent, notes, late, od, wfh
+    (?export=xlsx returns the same rows as an Excel workbook)
 
     Rules:
     - Absent: count *working days* covered by APPROVED LeavesTaken that
@@ -535,17 +628,17 @@ def monthly_attendance_summary(request):
     absent_by_emp = defaultdict(int)
     notes_by_emp = defaultdict(list)
 
-    for lv in leaves:
-        # overlap window
-        s = max(lv.start_date, start_date)
-        e = min(lv.end_date, end_date)
-        if s > e:
-            continue
-        # count only working days within overlap
+    # Working days of every overlap window in one vectorized call
+    # (dates without a Calendar row are not working days, as above)
+    leaves = list(leaves)
+    overlap_days = BusDayEngine(start_date, end_date).count(
+        [max(lv.start_date, start_date) for lv in leaves],
+        [min(lv.end_date, end_date) for lv in leaves],
+    )
+
+    for lv, days in zip(leaves, overlap_days.tolist()):
         # (if you support half days, adjust here)
-        for d in daterange(s, e):
-            if d in working_days:
-                absent_by_emp[lv.employee_id] += 1
+        absent_by_emp[lv.employee_id] += days
         if lv.reason:
             notes_by_emp[lv.employee_id].append(lv.reason.strip())
 
@@ -597,4 +690,138 @@ def monthly_attendance_summary(request):
     serializer = EmployeeMonthlyAttendanceSerializer(
         employees, many=True, context={"summaries": summaries}
     )
+    if wants_xlsx(request):
+        fields = EmployeeMonthlyAttendanceSerializer.Meta.fields
+        return xlsx_response(
+            f"attendance_summary_{year}-{month:02d}.xlsx",
+            [
+                Sheet(
+                    f"Attendance {year}-{month:02d}",
+                    [f.replace("_", " ").title() for f in fields],
+                    dict_rows(serializer.data, fields),
+                )
+            ],
+        )
     return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def _csv_param(params, key, default=()):
+    values = [v.strip() for v in params.get(key, "").split(",") if v.strip()]
+    return values or list(default)
+
+
+def _date_param(params, key):
+    value = params.get(key)
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+@api_view(["GET"])
+def timesheet_pivot(request):
+    """
+    GET /timesheet-pivot/?dimensions=department,project&measures=hours,entries
+        &grain=month&start=2025-01-01&end=2025-12-31&project=P001,P002
+
+    Approved timesheet hours grouped by any of the dimensions (employee,
+    department, project, discipline, building, task) and optionally by
+    period (grain: day / week / month / year). Measures: hours, entries,
+    employees, avg_hours. A dimension given as a parameter filters on its
+    comma-separated values. Answered from the in-memory timesheet cube;
+    ?export=xlsx downloads the rows.
+    """
+    params = request.query_params
+    dimensions = _csv_param(params, "dimensions")
+    measures = _csv_param(params, "measures", ["hours"])
+    filters = {d: _csv_param(params, d) for d in DIMENSIONS if params.get(d)}
+    try:
+        rows = timesheet_cube.pivot(
+            dimensions,
+            measures,
+            grain=params.get("grain") or None,
+            filters=filters,
+            start=_date_param(params, "start"),
+            end=_date_param(params, "end"),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if wants_xlsx(request):
+        columns = list(rows[0]) if rows else dimensions + measures
+        return xlsx_response(
+            "timesheet_pivot.xlsx",
+            [
+                Sheet(
+                    "Pivot",
+                    [c.replace("_", " ").title() for c in columns],
+                    dict_rows(rows, columns),
+                )
+            ],
+        )
+    return Response(rows, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+def report_cache_metrics(request):
+    """Report cache hits / misses per report, for the worker that answers."""
+    return Response(report_cache_stats(), status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+def submit_report_job(request):
+    """
+    POST /report-jobs/ {"report": "employee-lop", "params": {"year": 2025}}
+
+    Queues a background report (see services.report_jobs.REPORTS) and
+    returns the job; an identical job still queued or running is returned
+    instead of a new one (200 rather than 202).
+    """
+    if not isinstance(request.data, dict):
+        return Response(
+            {"error": "Send an object with 'report' and 'params'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        job, created = report_jobs.submit(
+            request.data.get("report"), request.data.get("params")
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        ReportJobSerializer(job, context={"request": request}).data,
+        status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+def report_job_status(request, job_id):
+    try:
+        job = ReportJob.objects.get(job_id=job_id)
+    except ReportJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(
+        ReportJobSerializer(job, context={"request": request}).data,
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+def report_job_download(request, job_id):
+    try:
+        job = ReportJob.objects.get(job_id=job_id)
+    except ReportJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != "done":
+        return Response(
+            {"error": f"Job is {job.status}"}, status=status.HTTP_409_CONFLICT
+        )
+    try:
+        result = open(job.result_path, "rb")
+    except OSError:
+        return Response(
+            {"error": "Result file no longer exists"}, status=status.HTTP_410_GONE
+        )
+    return FileResponse(
+        result,
+        as_attachment=True,
+        filename=job.filename,
+        content_type=job.content_type,
+    )
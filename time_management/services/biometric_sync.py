@@ -0,0 +1,490 @@
+# apps/time_management/services/biometric_sync.py
+"""
+Biometric attendance sync: pooled fetching and bulk ingestion.
+
+Fetching: one ``requests.Session`` per sync with a connection pool as wide
+as the fetch pool, explicit (connect, read) timeouts and bounded
+exponential-backoff retries on connection errors and 429/5xx answers.
+``fetch_days()`` fetches a window of days on a thread pool and yields each
+day's payload as soon as it arrives, so the caller ingests one day while
+the next ones are still on the wire.
+
+Direct mode: ``event_summary_rows()`` runs the FirstIn / LastOut
+aggregation (the one behind the dtms-event-summary endpoint) over
+``sync_DTMS_bio`` for a whole date range in one query on the ``reporting``
+connection and streams it off a server-side cursor, so a sync needs
+neither the HTTP self-call nor JSON in between; ``ingest_stream()`` feeds
+it to the writer in batches.
+
+Incremental mode: ``sync_new_punches()`` keeps a high-water mark of
+``sync_DTMS_bio.DownloadDatetime`` in SyncWatermark. Each run asks which
+(EmpCode, day) pairs got punches downloaded since the mark, re-aggregates
+only those pairs and then moves the mark, so the sync can run every few
+minutes without rescanning whole days.
+
+Ingestion: ``BiometricIngestor`` reads the employee_code -> employee map
+once and the existing BiometricData rows of the days it is given in one
+query per batch, splits the incoming rows into inserts and updates and
+writes them with ``bulk_create`` / ``bulk_update`` (ids reserved in blocks
+through ``sequences.assign_ids``). Each sync command picks a mode saying
+which fields it owns and how duplicate rows are treated; ``IngestStats``
+counts created, updated, skipped and duplicate rows.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import requests
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..models import BiometricData, Employee, SyncWatermark
+from .report_cache import model_changed
+from .sequences import assign_ids
+from .streaming_export import stream_query
+
+logger = logging.getLogger(__name__)
+
+# "api": the dtms-event-summary endpoint, "reporting": the DB behind it
+SYNC_SOURCE = getattr(settings, "BIOMETRIC_SYNC_SOURCE", "api")
+FETCH_WORKERS = getattr(settings, "BIOMETRIC_FETCH_WORKERS", 4)
+FETCH_TIMEOUT = getattr(settings, "BIOMETRIC_FETCH_TIMEOUT", (5, 60))
+FETCH_RETRIES = getattr(settings, "BIOMETRIC_FETCH_RETRIES", 3)
+FETCH_BACKOFF = getattr(settings, "BIOMETRIC_FETCH_BACKOFF", 1.0)
+FETCH_BACKOFF_MAX = 30
+WRITE_BATCH_SIZE = 500
+INGEST_BATCH_SIZE = 5000
+
+API_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+# ---- fetching ----
+
+
+def biometric_session(pool_size=FETCH_WORKERS):
+    retry = Retry(
+        total=FETCH_RETRIES,
+        backoff_factor=FETCH_BACKOFF,
+        backoff_max=FETCH_BACKOFF_MAX,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_day(session, day):
+    """The dtms event summary rows of ``day``."""
+    url = f"{settings.DEFAULT_BIOMETRIC_URL}/dtms-event-summary/{day:%Y-%m-%d}/"
+    response = session.get(url, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_days(days, workers=FETCH_WORKERS, session=None):
+    """
+    Yield (day, rows, error) for every day in completion order; days are
+    fetched ``workers`` at a time.
+    """
+    session = session or biometric_session(workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_day, session, day): day for day in days}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:  # network / HTTP / JSON errors
+                yield futures[future], None, e
+
+
+def date_window(start, end):
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+# ---- direct from the reporting database ----
+
+EVENT_SUMMARY_SQL = """
+    SELECT
+        EMPCode,
+        DATE(PunchDateTime) AS PunchDate,
+        MIN(CASE WHEN INOutType = 0 THEN PunchDateTime END) AS FirstIn,
+        MAX(CASE WHEN INOutType = 1 THEN PunchDateTime END) AS LastOut
+    FROM sync_DTMS_bio
+    WHERE {where}
+    GROUP BY EMPCode, DATE(PunchDateTime)
+    ORDER BY PunchDate, EMPCode
+"""
+PUNCH_EVENTS_SQL = """
+    SELECT EMPCode, PunchDateTime, INOutType, DownloadDatetime
+    FROM sync_DTMS_bio
+    WHERE {where}
+    ORDER BY PunchDateTime, EMPCode, INOutType, {downloaded}
+"""
+# (PunchDateTime, EMPCode) alone repeats (IN and OUT in the same second, a
+# punch downloaded twice), so the keyset also holds INOutType and the
+# download time. NULL download times sort and compare as the lowest value.
+PUNCH_DOWNLOADED = "COALESCE(DownloadDatetime, '1000-01-01')"
+PUNCH_DOWNLOADED_MIN = datetime(1000, 1, 1)
+# Keyset pagination: rows strictly after the last key seen (lexicographic)
+PUNCH_AFTER = f"""PunchDateTime >= %s AND (
+    PunchDateTime > %s OR EMPCode > %s OR (EMPCode = %s AND (
+        INOutType > %s OR (INOutType = %s AND {PUNCH_DOWNLOADED} > %s)
+    ))
+)"""
+# Half-open range on the raw column, so an index on PunchDateTime is usable
+# (DATE(PunchDateTime) = %s scans the whole table)
+PUNCH_RANGE = "PunchDateTime >= %s AND PunchDateTime < %s"
+
+
+# Indexes the queries above (and CHANGED_DAYS_SQL) rely on: name -> leading
+# columns. The reporting table is not ours to migrate, so
+# ``manage.py check_dtms_indexes`` only reports the missing ones.
+REPORTING_INDEXES = {
+    "ix_dtms_punch_key": ("PunchDateTime", "EMPCode", "INOutType", "DownloadDatetime"),
+    "ix_dtms_emp_punch": ("EMPCode", "PunchDateTime"),
+    "ix_dtms_download": ("DownloadDatetime",),
+}
+
+
+def _punch_filter(start, end, emp_code=None):
+    where, params = PUNCH_RANGE, [start, end + timedelta(days=1)]
+    if emp_code:
+        where += " AND EMPCode = %s"
+        params.append(emp_code)
+    return where, params
+
+
+def event_summary_rows(start, end, emp_code=None):
+    """
+    First IN / last OUT punch per employee and day in [start, end], as the
+    dicts the dtms-event-summary endpoint returns, streamed from ``reporting``.
+    """
+    where, params = _punch_filter(start, end, emp_code)
+    yield from _summary_dicts(EVENT_SUMMARY_SQL.format(where=where), params)
+
+
+def punch_events(start, end, emp_code=None, after=None, limit=None):
+    """
+    Every punch in [start, end] ordered by (PunchDateTime, EMPCode,
+    InOutType, DownloadDateTime), as dtms-event-time rows. ``after`` is that
+    key of the last row a client already has; ``limit`` caps the rows
+    returned.
+    """
+    where, params = _punch_filter(start, end, emp_code)
+    if after is not None:
+        punched_at, code, in_out, downloaded = after
+        where += f" AND {PUNCH_AFTER}"
+        params += [punched_at, punched_at, code, code, in_out, in_out]
+        params.append(downloaded or PUNCH_DOWNLOADED_MIN)
+    sql = PUNCH_EVENTS_SQL.format(where=where, downloaded=PUNCH_DOWNLOADED)
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    for code, punched, in_out, downloaded in stream_query(
+        sql, params, using="reporting"
+    ):
+        yield {
+            "EmpCode": code,
+            "PunchDateTime": punched,
+            "InOutType": in_out,
+            "DownloadDateTime": downloaded,
+        }
+
+
+def _summary_dicts(sql, params):
+    for code, day, first_in, last_out in stream_query(sql, params, using="reporting"):
+        yield {"EmpCode": code, "FirstIn": first_in, "LastOut": last_out, "Date": day}
+
+
+# ---- incremental, from the DownloadDatetime watermark ----
+
+WATERMARK_NAME = "sync_DTMS_bio"
+# Punches committed late with a slightly older DownloadDatetime are still
+# picked up; re-aggregating a day twice is harmless
+WATERMARK_OVERLAP = timedelta(
+    seconds=getattr(settings, "BIOMETRIC_WATERMARK_OVERLAP_SECONDS", 300)
+)
+
+CHANGED_DAYS_SQL = """
+    SELECT EMPCode, DATE(PunchDateTime), MAX(DownloadDatetime)
+    FROM sync_DTMS_bio
+    WHERE DownloadDatetime >= %s
+    GROUP BY EMPCode, DATE(PunchDateTime)
+"""
+
+
+def get_watermark(name=WATERMARK_NAME):
+    """Last DownloadDatetime synced (naive, reporting DB local time) or None."""
+    mark = SyncWatermark.objects.filter(name=name).first()
+    if mark is None or mark.value is None:
+        return None
+    return timezone.make_naive(mark.value)
+
+
+def set_watermark(value, name=WATERMARK_NAME):
+    SyncWatermark.objects.update_or_create(
+        name=name, defaults={"value": timezone.make_aware(value)}
+    )
+
+
+def changed_days(since):
+    """
+    ({(EmpCode, date), ...}, newest DownloadDatetime) of the punches
+    downloaded at or after ``since``.
+    """
+    pairs, newest = set(), None
+    with connections["reporting"].cursor() as cursor:
+        cursor.execute(CHANGED_DAYS_SQL, [since])
+        for code, day, downloaded in cursor.fetchall():
+            pairs.add((code, day))
+            if downloaded and (newest is None or downloaded > newest):
+                newest = downloaded
+    return pairs, newest
+
+
+def summary_rows_for(pairs):
+    """
+    Re-aggregate only the (EmpCode, date) pairs: one query whose WHERE is a
+    PunchDateTime range plus the day's employee codes for every day.
+    """
+    codes_by_day = defaultdict(set)
+    for code, day in pairs:
+        codes_by_day[day].add(code)
+    if not codes_by_day:
+        return
+
+    clauses, params = [], []
+    for day, codes in sorted(codes_by_day.items()):
+        placeholders = ", ".join(["%s"] * len(codes))
+        clauses.append(f"({PUNCH_RANGE} AND EMPCode IN ({placeholders}))")
+        params += [day, day + timedelta(days=1), *sorted(codes)]
+    sql = EVENT_SUMMARY_SQL.format(where=" OR ".join(clauses))
+    yield from _summary_dicts(sql, params)
+
+
+def sync_new_punches(ingestor, since=None):
+    """
+    Ingest the days touched by punches downloaded since the watermark (or
+    ``since``) and move the watermark forward. Returns (stats, days, mark).
+    """
+    mark = since or get_watermark()
+    if mark is None:
+        # First run: everything downloaded since the start of yesterday
+        mark = datetime.combine(date.today() - timedelta(days=1), datetime.min.time())
+    else:
+        mark -= WATERMARK_OVERLAP
+
+    pairs, newest = changed_days(mark)
+    stats = ingestor.ingest_stream(summary_rows_for(pairs))
+    if newest is not None:
+        # Only after the rows are written: a failed run is simply retried
+        set_watermark(max(newest, get_watermark() or newest))
+    return stats, len(pairs), newest
+
+
+# ---- ingestion ----
+
+
+@dataclass(frozen=True)
+class IngestMode:
+    require_out: bool  # rows without LastOut are skipped
+    update_fields: tuple  # fields refreshed on an existing row
+    duplicates: str  # stored duplicates: "skip" or "latest" (unless edited)
+
+
+MODES = {
+    # Yesterday's full day (sync_biometric); in_time is kept as stored
+    "daily": IngestMode(
+        True, ("out_time", "work_duration", "total_duration", "status"), "skip"
+    ),
+    # Today's first punch only (sync_intime_biometric)
+    "in_time": IngestMode(False, ("in_time", "status"), "skip"),
+    # Window backfill (sync_monthly_biometric): the latest row is rewritten
+    # unless someone edited it by hand
+    "backfill": IngestMode(
+        True,
+        ("in_time", "out_time", "work_duration", "total_duration", "ot", "status"),
+        "latest",
+    ),
+    # Punches downloaded since the last run (sync_incremental_biometric): a
+    # day still without an OUT punch gets its in_time now, the rest later
+    "incremental": IngestMode(
+        False,
+        ("in_time", "out_time", "work_duration", "total_duration", "ot", "status"),
+        "latest",
+    ),
+}
+
+
+@dataclass
+class IngestStats:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+
+    def add(self, other):
+        self.created += other.created
+        self.updated += other.updated
+        self.skipped += other.skipped
+        self.duplicates += other.duplicates
+
+    def __str__(self):
+        return (
+            f"Created: {self.created}, Updated: {self.updated}, "
+            f"Skipped: {self.skipped}, Duplicates: {self.duplicates}"
+        )
+
+
+def _as_datetime(value):
+    # API rows carry ISO strings, reporting rows datetimes
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, API_DATETIME_FORMAT)
+
+
+def _parse_row(row, mode):
+    """(date, field values) of an API row; raises ValueError when unusable."""
+    first_in, last_out = row.get("FirstIn"), row.get("LastOut")
+    if not first_in or (mode.require_out and not last_out):
+        raise ValueError("first_in or last_out missing")
+
+    day = date.fromisoformat(str(row.get("Date"))[:10])
+    first_in_dt = _as_datetime(first_in)
+    values = {"in_time": first_in_dt.time(), "status": "Present"}
+    if last_out and "out_time" in mode.update_fields:
+        last_out_dt = _as_datetime(last_out)
+        values["out_time"] = last_out_dt.time()
+        # If out_time is earlier than in_time (overnight shift correction)
+        if last_out_dt < first_in_dt:
+            last_out_dt += timedelta(days=1)
+        hours = round((last_out_dt - first_in_dt).total_seconds() / 3600, 2)
+        values.update(work_duration=hours, total_duration=hours, ot=0)
+    return day, values
+
+
+class BiometricIngestor:
+    def __init__(self, mode, warn=None):
+        self.mode = MODES[mode]
+        self.warn = warn or logger.warning
+        self.employees = {
+            str(code): (employee_id, code, name)
+            for employee_id, code, name in Employee.objects.exclude(
+                employee_code=None
+            ).values_list("employee_id", "employee_code", "employee_name")
+        }
+        # (employee_id, date) -> stored rows, latest first
+        self.existing = defaultdict(list)
+        self._loaded = set()
+
+    def prefetch(self, days):
+        """Load the stored rows of ``days`` (one query for the ones not loaded)."""
+        missing = set(days) - self._loaded
+        if not missing:
+            return
+        rows = BiometricData.objects.filter(
+            date__in=missing, employee__isnull=False
+        ).order_by("-modified_on")
+        for row in rows:
+            self.existing[(row.employee_id, row.date)].append(row)
+        self._loaded |= missing
+
+    def _plan(self, rows, stats):
+        """{(employee_id, date): (employee, values)}; the last row sent wins."""
+        planned = {}
+        for row in rows:
+            code = row.get("EmpCode")
+            employee = self.employees.get(str(code))
+            if employee is None:
+                stats.skipped += 1
+                self.warn(f"Employee with code {code} not found. Skipping.")
+                continue
+            try:
+                day, values = _parse_row(row, self.mode)
+            except ValueError as e:
+                stats.skipped += 1
+                self.warn(f"Skipping {code} on {row.get('Date')}: {e}.")
+                continue
+            key = (employee[0], day)
+            if key in planned:
+                stats.duplicates += 1  # sent twice: the later row wins
+            planned[key] = (employee, values)
+        return planned
+
+    def ingest(self, rows):
+        """Write one batch of API rows; returns its IngestStats."""
+        stats = IngestStats()
+        planned = self._plan(rows, stats)
+        self.prefetch({day for _, day in planned})
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for (employee_id, day), (employee, values) in planned.items():
+            _, code, name = employee
+            stored = self.existing.get((employee_id, day), [])
+            if not stored:
+                obj = BiometricData(
+                    employee_id=employee_id,
+                    date=day,
+                    employee_code=code,
+                    employee_name=name,
+                    remarks="",
+                    modified_by=None,
+                    **values,
+                )
+                to_create.append(obj)
+                self.existing[(employee_id, day)].append(obj)
+                continue
+
+            if len(stored) > 1 and (
+                self.mode.duplicates == "skip" or stored[0].modified_by_id
+            ):
+                stats.duplicates += 1
+                self.warn(
+                    f"Multiple records for Employee={code}, Date={day}. Skipping."
+                )
+                continue
+
+            obj = stored[0]
+            for field in self.mode.update_fields:
+                if field in values:
+                    setattr(obj, field, values[field])
+            obj.modified_on = now  # bulk_update skips auto_now
+            to_update.append(obj)
+
+        with transaction.atomic():
+            if to_create:
+                BiometricData.objects.bulk_create(
+                    assign_ids(to_create), batch_size=WRITE_BATCH_SIZE
+                )
+            if to_update:
+                BiometricData.objects.bulk_update(
+                    to_update,
+                    [*self.mode.update_fields, "modified_on"],
+                    batch_size=WRITE_BATCH_SIZE,
+                )
+            if to_create or to_update:
+                model_changed(BiometricData)  # bulk writes send no signals
+
+        stats.created, stats.updated = len(to_create), len(to_update)
+        return stats
+
+    def ingest_stream(self, rows, batch_size=INGEST_BATCH_SIZE):
+        """Ingest an iterator of rows ``batch_size`` at a time."""
+        stats, batch = IngestStats(), []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                stats.add(self.ingest(batch))
+                batch = []
+        if batch:
+            stats.add(self.ingest(batch))
+        return stats
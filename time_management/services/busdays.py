@@ -0,0 +1,120 @@
+# apps/time_management/services/busdays.py
+"""
+Vectorized working-day arithmetic on top of ``numpy.busday_count``.
+
+The off days of a window (Calendar weekends + holidays, plus dates without a
+Calendar row depending on ``missing``) become the holiday list of a
+``numpy.busdaycalendar`` with an all-days weekmask, since Calendar already
+encodes the weekend policy (Sundays, 2nd/4th Saturdays).
+
+Intervals are passed as arrays of inclusive (start, end) dates. Month
+bucketing splits each interval only at month boundaries, so the work grows
+with intervals x months, never with the number of days.
+"""
+from datetime import date
+
+import numpy as np
+
+from .work_calendar import HOLIDAY, PRESENT, WEEKEND, work_calendar
+
+ALL_DAYS = "1111111"
+MISSING_OFF = "off"  # no Calendar row -> not a working day
+MISSING_WORKING = "working"  # no Calendar row -> working day
+MISSING_WEEKDAY = "weekday"  # no Calendar row -> working Mon-Fri
+
+
+def _off_days(start: date, end: date, missing: str) -> np.ndarray:
+    chunks = []
+    for year in range(start.year, end.year + 1):
+        days = np.arange(
+            f"{year}-01-01", f"{year + 1}-01-01", dtype="datetime64[D]"
+        )
+        flags = np.frombuffer(work_calendar.year_flags(year), dtype=np.uint8)
+        flags = flags[: len(days)]
+
+        off = (flags & (WEEKEND | HOLIDAY)) != 0
+        absent = (flags & PRESENT) == 0
+        if missing == MISSING_OFF:
+            off |= absent
+        elif missing == MISSING_WEEKDAY:
+            # numpy weekday of datetime64[D]: 1970-01-01 was a Thursday
+            weekday = (days.astype(np.int64) + 3) % 7  # Monday=0
+            off |= absent & (weekday >= 5)
+        chunks.append(days[off])
+    return np.concatenate(chunks) if chunks else np.array([], dtype="datetime64[D]")
+
+
+class BusDayEngine:
+    """
+    Working-day counter for a date window.
+
+    ``all_days=True`` counts calendar days (no off days at all), which is
+    what the LOP split uses.
+    """
+
+    def __init__(self, start: date, end: date, missing=MISSING_OFF, all_days=False):
+        holidays = (
+            np.array([], dtype="datetime64[D]")
+            if all_days
+            else _off_days(start, end, missing)
+        )
+        self.calendar = np.busdaycalendar(weekmask=ALL_DAYS, holidays=holidays)
+
+    @staticmethod
+    def _as_days(values):
+        return np.asarray(values, dtype="datetime64[D]")
+
+    def count(self, starts, ends) -> np.ndarray:
+        """Working days in each inclusive [start, end] interval."""
+        s, e = self._as_days(starts), self._as_days(ends)
+        if not len(s):
+            return np.zeros(0, dtype=np.int64)
+        return np.where(
+            s <= e, np.busday_count(s, e + 1, busdaycal=self.calendar), 0
+        )
+
+    def count_by_month(self, starts, ends, keys=None, weights=None):
+        """
+        Split every interval at month boundaries and sum the working days
+        (times ``weights``, if given) per (key, "YYYY-MM").
+
+        Returns ``(per_interval, buckets)`` where ``per_interval`` is the
+        working-day count of each whole interval and ``buckets`` maps
+        ``(key, "YYYY-MM")`` (or just ``"YYYY-MM"`` without keys) to a float.
+        """
+        s, e = self._as_days(starts), self._as_days(ends)
+        n = len(s)
+        if not n:
+            return np.zeros(0, dtype=np.int64), {}
+
+        valid = s <= e
+        month_start = s.astype("datetime64[M]")
+        months_spanned = np.where(
+            valid, (e.astype("datetime64[M]") - month_start).astype(np.int64) + 1, 0
+        )
+
+        # One row per (interval, month touched)
+        idx = np.repeat(np.arange(n), months_spanned)
+        offset = np.arange(len(idx)) - np.repeat(
+            np.cumsum(months_spanned) - months_spanned, months_spanned
+        )
+        months = month_start[idx] + offset.astype("timedelta64[M]")
+        piece_start = np.maximum(s[idx], months.astype("datetime64[D]"))
+        piece_end = np.minimum(e[idx] + 1, (months + 1).astype("datetime64[D]"))
+        pieces = np.busday_count(piece_start, piece_end, busdaycal=self.calendar)
+
+        per_interval = np.bincount(idx, weights=pieces, minlength=n).astype(np.int64)
+
+        values = pieces.astype(float)
+        if weights is not None:
+            values = values * np.asarray(weights, dtype=float)[idx]
+
+        labels = np.datetime_as_string(months, unit="M").tolist()
+        if keys is not None:
+            key_of = np.asarray(keys, dtype=object)[idx].tolist()
+            labels = list(zip(key_of, labels))
+
+        buckets = {}
+        for label, value in zip(labels, values.tolist()):
+            buckets[label] = buckets.get(label, 0.0) + value
+        return per_interval, buckets
@@ -0,0 +1,128 @@
+# apps/time_management/services/holiday_posting.py
+"""
+Bulk holiday timesheet posting.
+
+A holiday gives every active employee an approved 8h (09:00-18:00) entry on
+the holiday task. The rows are built in memory, get their ids from one
+sequence reservation and go in with a single ``bulk_create``. That skips
+``TimeSheet.save()`` (and so the per-row comp-off evaluation) and the
+post_save signals; consumed hours are posted to the ledger once and the
+day's ProjectHoursDaily cells are refreshed once.
+"""
+import logging
+from datetime import time
+
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+
+from ..models import Employee, TaskAssign, TimeSheet
+from .hours_ledger import apply_hours_delta
+from .project_facts import mark_facts_dirty
+from .report_cache import model_changed
+from .sequences import assign_ids
+
+logger = logging.getLogger(__name__)
+
+HOLIDAY_TASK_ASSIGN_ID = "TKASS_01011"
+HOLIDAY_HOURS = 8
+DELETE_BATCH = 500
+
+
+def active_employees_on(day):
+    return Employee.objects.filter(
+        Q(doj__lte=day),
+        Q(relieving_date__isnull=True) | Q(relieving_date__gte=day),
+        status="active",
+    )
+
+
+def get_holiday_task_assign():
+    try:
+        return TaskAssign.objects.get(task_assign_id=HOLIDAY_TASK_ASSIGN_ID)
+    except TaskAssign.DoesNotExist:
+        logger.warning("TaskAssign %s not found.", HOLIDAY_TASK_ASSIGN_ID)
+        return None
+
+
+@transaction.atomic
+def post_holiday_timesheets(day, task_assign=None, prune=False) -> int:
+    """
+    Create the missing holiday timesheets for ``day``. With ``prune=True``
+    entries of employees no longer active (and duplicates) are removed, so
+    the day ends up with exactly one entry per active employee.
+    Returns the number of rows created.
+    """
+    task_assign = task_assign or get_holiday_task_assign()
+    if task_assign is None:
+        return 0
+
+    employee_ids = set(active_employees_on(day).values_list("employee_id", flat=True))
+    existing = TimeSheet.objects.filter(date=day, task_assign=task_assign)
+
+    posted, stale = set(), []
+    for pk, employee_id in existing.values_list("pk", "employee_id"):
+        if employee_id in employee_ids and employee_id not in posted:
+            posted.add(employee_id)
+        else:
+            stale.append(pk)
+
+    if prune and stale:
+        _delete_without_signals(TimeSheet.objects.filter(pk__in=stale), task_assign)
+
+    rows = [
+        TimeSheet(
+            employee_id=employee_id,
+            date=day,
+            task_assign=task_assign,
+            task_hours=HOLIDAY_HOURS,
+            start_time=time(9, 0),
+            end_time=time(18, 0),
+            submitted=True,
+            approved=True,
+        )
+        for employee_id in sorted(employee_ids - posted)
+    ]
+    if rows:
+        TimeSheet.objects.bulk_create(assign_ids(rows), batch_size=500)
+        apply_hours_delta(task_assign.pk, HOLIDAY_HOURS * len(rows))
+    if rows or (prune and stale):
+        mark_facts_dirty(task_assign.pk, [day])
+        model_changed(TimeSheet)
+    return len(rows)
+
+
+@transaction.atomic
+def remove_holiday_timesheets(day) -> int:
+    """Drop every holiday timesheet on ``day`` (the date is no longer a holiday)."""
+    qs = TimeSheet.objects.filter(date=day, task_assign_id=HOLIDAY_TASK_ASSIGN_ID)
+    task_assign = TaskAssign.objects.filter(pk=HOLIDAY_TASK_ASSIGN_ID).first()
+    deleted = _delete_without_signals(qs, task_assign)
+    if deleted:
+        mark_facts_dirty(HOLIDAY_TASK_ASSIGN_ID, [day])
+        model_changed(TimeSheet)
+    return deleted
+
+
+def _delete_without_signals(qs, task_assign):
+    """
+    Plain DELETEs by primary key instead of a post_delete (and ledger
+    update) per row; the removed approved hours are taken off the ledger in
+    one go.
+    """
+    removed = qs.filter(approved=True).aggregate(h=Sum("task_hours"))["h"] or 0
+    pks = list(qs.values_list("pk", flat=True))
+    table = connection.ops.quote_name(TimeSheet._meta.db_table)
+    pk_column = connection.ops.quote_name(TimeSheet._meta.pk.column)
+
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), DELETE_BATCH):
+            batch = pks[start : start + DELETE_BATCH]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {pk_column} IN ({placeholders})", batch
+            )
+            deleted += cursor.rowcount
+    if task_assign is not None:
+        apply_hours_delta(task_assign.pk, -removed)
+    return deleted
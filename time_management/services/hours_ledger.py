@@ -0,0 +1,150 @@
+# apps/time_management/services/hours_ledger.py
+"""
+Incremental consumed-hours ledger.
+
+Every TimeSheet write contributes ``task_hours`` (when approved) to its
+TaskAssign, the TaskAssign's BuildingAssign and the Project above it. On
+save/delete only the signed difference between the old and the new
+contribution is applied, with atomic ``F()`` updates, instead of
+re-summing the whole project.
+
+``recompute_consumed_hours()`` rebuilds the three levels from scratch and
+reports (optionally fixes) any drift.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from ..models import BuildingAssign, Project, TaskAssign, TimeSheet
+from .report_cache import model_changed
+
+ZERO = Decimal("0.00")
+
+
+def contribution(task_assign_id, task_hours, approved):
+    """(task_assign_id, hours) a timesheet adds to the ledger."""
+    if not task_assign_id or not approved:
+        return task_assign_id, ZERO
+    return task_assign_id, Decimal(task_hours or 0)
+
+
+STORED_FIELDS = ("task_assign_id", "task_hours", "approved")
+
+
+def remember_previous(instance, prev):
+    """
+    pre_save: stash the stored contribution of an existing timesheet.
+    ``prev`` is the stored row as a dict with STORED_FIELDS (None if new).
+    """
+    instance._ledger_prev = None
+    if prev:
+        instance._ledger_prev = contribution(
+            prev["task_assign_id"], prev["task_hours"], prev["approved"]
+        )
+
+
+def record_saved(instance):
+    """post_save: apply new - old contribution."""
+    old_ta, old_hours = getattr(instance, "_ledger_prev", None) or (None, ZERO)
+    new_ta, new_hours = contribution(
+        instance.task_assign_id, instance.task_hours, instance.approved
+    )
+    if old_ta == new_ta:
+        apply_hours_delta(new_ta, new_hours - old_hours)
+    else:
+        apply_hours_delta(old_ta, -old_hours)
+        apply_hours_delta(new_ta, new_hours)
+    instance._ledger_prev = (new_ta, new_hours)
+
+
+def record_deleted(instance):
+    """post_delete: remove the timesheet's contribution."""
+    task_assign_id, hours = contribution(
+        instance.task_assign_id, instance.task_hours, instance.approved
+    )
+    apply_hours_delta(task_assign_id, -hours)
+
+
+def apply_hours_delta(task_assign_id, delta):
+    """Add ``delta`` hours to the task assign and everything above it."""
+    if not task_assign_id or not delta:
+        return
+
+    chain = (
+        TaskAssign.objects.filter(pk=task_assign_id)
+        .values(
+            "building_assign_id",
+            project_id=F("building_assign__project_assign__project"),
+        )
+        .first()
+    )
+    if chain is None:
+        return
+
+    with transaction.atomic():
+        TaskAssign.objects.filter(pk=task_assign_id).update(
+            consumed_hours=F("consumed_hours") + delta
+        )
+        if chain["building_assign_id"]:
+            BuildingAssign.objects.filter(pk=chain["building_assign_id"]).update(
+                consumed_hours=F("consumed_hours") + delta
+            )
+        if chain["project_id"]:
+            Project.objects.filter(pk=chain["project_id"]).update(
+                consumed_hours=F("consumed_hours") + delta
+            )
+            model_changed(Project)
+
+
+@dataclass
+class Drift:
+    level: str  # "project" | "building_assign" | "task_assign"
+    pk: str
+    stored: Decimal
+    actual: Decimal
+
+
+def _actual_totals(group_by):
+    rows = (
+        TimeSheet.objects.filter(approved=True)
+        .exclude(**{f"{group_by}__isnull": True})
+        .values(key=F(group_by))
+        .annotate(total=Sum("task_hours"))
+    )
+    totals = defaultdict(lambda: ZERO)
+    for r in rows:
+        totals[r["key"]] = r["total"] or ZERO
+    return totals
+
+
+LEVELS = (
+    ("project", Project, "task_assign__building_assign__project_assign__project"),
+    ("building_assign", BuildingAssign, "task_assign__building_assign"),
+    ("task_assign", TaskAssign, "task_assign"),
+)
+
+
+@transaction.atomic
+def recompute_consumed_hours(fix=False):
+    """
+    Recompute consumed hours at every level from approved timesheets and
+    return the rows whose stored value differs. With ``fix=True`` the
+    stored values are corrected.
+    """
+    drift = []
+    for level, model, group_by in LEVELS:
+        actual = _actual_totals(group_by)
+        to_fix = []
+        for obj in model.objects.only(model._meta.pk.name, "consumed_hours"):
+            stored = obj.consumed_hours or ZERO
+            if stored != actual[obj.pk]:
+                drift.append(Drift(level, obj.pk, stored, actual[obj.pk]))
+                obj.consumed_hours = actual[obj.pk]
+                to_fix.append(obj)
+        if fix and to_fix:
+            model.objects.bulk_update(to_fix, ["consumed_hours"], batch_size=500)
+            model_changed(model)
+    return drift
@@ -0,0 +1,150 @@
+# apps/time_management/services/leave_balances.py
+"""
+Set-based MonthlyLeaveBalance rebuild.
+
+For a year it reads the approved LeaveDay totals (per employee, month,
+leave type) and the approved comp-off credits (per employee, month) in one
+query each, runs the opening -> closing chain in memory and writes every
+month back with a single bulk upsert. Works for one employee (signals) or
+the whole company (``rebuild_leave_balances`` command).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth
+
+from ..models import (
+    CompOffRequest,
+    Employee,
+    LeaveDay,
+    LeaveOpeningBalance,
+    MonthlyLeaveBalance,
+)
+from .report_cache import model_changed
+from .sequences import assign_ids
+
+# ---- normalization exactly to your DB keys ----
+VALID_TYPES = ("casual_leave", "sick_leave", "comp_off", "earned_leave")
+BALANCE_FIELDS = [f"{lt}_balance" for lt in VALID_TYPES]
+
+
+def normalize(leave_type: str) -> str:
+    return leave_type.strip().lower() if leave_type else ""
+
+
+def _zero_dict():
+    return {lt: Decimal("0.0") for lt in VALID_TYPES}
+
+
+def _january_opening(ob):
+    """Opening for January comes from LeaveOpeningBalance (or zeros if missing)."""
+    opening = _zero_dict()
+    if ob:
+        for lt in VALID_TYPES:
+            opening[lt] = getattr(ob, f"{lt}_opening") or Decimal("0.0")
+    return opening
+
+
+def _availed_by_month(employee_ids, year):
+    """{(employee_id, month): {leave_type: days}} from approved LeaveDay."""
+    rows = (
+        LeaveDay.objects.approved()
+        .filter(employee_id__in=employee_ids, date__year=year)
+        .values("employee_id", "leave_type", month=ExtractMonth("date"))
+        .annotate(total=Sum("duration"))
+    )
+    availed = defaultdict(_zero_dict)
+    for r in rows:
+        lt = normalize(r["leave_type"])
+        if lt in VALID_TYPES:
+            availed[(r["employee_id"], r["month"])][lt] += r["total"] or Decimal("0.0")
+    return availed
+
+
+def _comp_off_earned_by_month(employee_ids, year):
+    """{(employee_id, month): credits} from APPROVED comp-off requests."""
+    rows = (
+        CompOffRequest.objects.filter(
+            employee_id__in=employee_ids, status="approved", date__year=year
+        )
+        .values("employee_id", month=ExtractMonth("date"))
+        .annotate(total=Sum("duration"))
+    )
+    return {
+        (r["employee_id"], r["month"]): r["total"] or Decimal("0.0") for r in rows
+    }
+
+
+@transaction.atomic
+def rebuild_balances_for(employee_ids, year: int, start_month: int = 1) -> int:
+    """
+    Recompute MonthlyLeaveBalance for ``employee_ids`` (None = every employee)
+    in ``year`` from ``start_month``..12. Returns the number of rows written.
+
+    Per month m:
+      opening(m) = january_opening if m == 1 else closing(m - 1)
+      closing(m) = opening(m) - availed(m)       (+ earned(m) for comp_off)
+
+    If an employee's previous-month row is missing the chain is rebuilt from
+    January, as before.
+    """
+    m0 = max(1, min(12, start_month))
+    if employee_ids is None:
+        employee_ids = Employee.objects.values_list("employee_id", flat=True)
+    employee_ids = list(employee_ids)
+    if not employee_ids:
+        return 0
+
+    existing = {
+        (row.employee_id, row.month): row
+        for row in MonthlyLeaveBalance.objects.filter(
+            employee_id__in=employee_ids, year=year
+        )
+    }
+    openings = {
+        ob.employee_id: ob
+        for ob in LeaveOpeningBalance.objects.filter(
+            employee_id__in=employee_ids, year=year
+        )
+    }
+    availed = _availed_by_month(employee_ids, year)
+    earned = _comp_off_earned_by_month(employee_ids, year)
+
+    rows = []
+    for employee_id in employee_ids:
+        start, opening = m0, None
+        if start > 1:
+            prev = existing.get((employee_id, start - 1))
+            if prev:
+                opening = {lt: getattr(prev, f"{lt}_balance") for lt in VALID_TYPES}
+            else:
+                start = 1  # rebuild whole year forward
+        if opening is None:
+            opening = _january_opening(openings.get(employee_id))
+
+        for m in range(start, 12 + 1):
+            av = availed.get((employee_id, m)) or _zero_dict()
+            closing = {lt: opening[lt] - av[lt] for lt in VALID_TYPES}
+            # NOTE: comp_off adds earned credits for the month
+            closing["comp_off"] += earned.get((employee_id, m), Decimal("0.0"))
+
+            obj = existing.get((employee_id, m)) or MonthlyLeaveBalance(
+                employee_id=employee_id, year=year, month=m
+            )
+            for lt in VALID_TYPES:
+                setattr(obj, f"{lt}_balance", closing[lt])
+            rows.append(obj)
+
+            # Next month opening = this month closing
+            opening = closing
+
+    # New months get ids; existing ones keep theirs and hit the conflict path.
+    assign_ids(rows)
+    upsert = dict(update_conflicts=True, update_fields=BALANCE_FIELDS)
+    if connection.features.supports_update_conflicts_with_target:
+        upsert["unique_fields"] = ["employee", "year", "month"]
+    MonthlyLeaveBalance.objects.bulk_create(rows, batch_size=500, **upsert)
+    model_changed(MonthlyLeaveBalance)  # bulk upsert sends no signals
+    return len(rows)
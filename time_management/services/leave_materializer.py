@@ -0,0 +1,168 @@
+# apps/time_management/services/leave_materializer.py
+"""
+Bulk LeaveDay / leave-TimeSheet materialization for a LeavesTaken row.
+
+The leave range is resolved against the cached work calendar, the wanted
+rows are computed in memory and diffed against what is already stored, and only
+the difference is written (bulk_create / bulk_update / one delete). The
+query count no longer grows with the length of the leave.
+
+Bulk writes do not fire post_save/post_delete, so the side effects the old
+per-row saves produced (balance rebuilds, project consumed hours) are
+triggered explicitly by the callers / here, as are the ProjectHoursDaily
+cells of the bulk-written timesheets.
+"""
+from datetime import time
+from decimal import Decimal
+
+from ..models import LeaveDay, TimeSheet
+from .project_facts import mark_facts_dirty
+from .rebuild_queue import mark_dirty
+from .report_cache import model_changed
+from .sequences import assign_ids
+from .work_calendar import iter_working_days
+
+LEAVE_DAY_STATUSES = ("approved", "pending")
+TIMESHEET_START = time(9, 0)
+HALF_DAY_END = time(13, 0)
+FULL_DAY_END = time(18, 0)
+
+
+def leave_day_duration(leave) -> Decimal:
+    # Half-day leaves (x.5) are spread as 0.5 per day, as before
+    return Decimal("0.5") if (leave.duration and leave.duration % 1) else Decimal("1.0")
+
+
+def materialize_leave_days(leave):
+    """
+    Make LeaveDay rows match ``leave``: one row per working day for pending /
+    approved leaves, none otherwise. Weekends/holidays come from Calendar,
+    falling back to Sat/Sun when a date has no Calendar row.
+
+    A working day already held by another leave of the same employee is taken
+    over by this one (same as the old update_or_create on employee+date).
+    """
+    stale = LeaveDay.objects.filter(leave_taken=leave)
+
+    if leave.status not in LEAVE_DAY_STATUSES:
+        _delete_leave_days(stale)
+        return
+    if not leave.start_date or not leave.end_date or not leave.employee_id:
+        return
+
+    wanted = list(
+        iter_working_days(leave.start_date, leave.end_date, weekday_fallback=True)
+    )
+
+    # Rows of this leave that fall outside the wanted days
+    _delete_leave_days(stale.exclude(date__in=wanted))
+
+    values = {
+        "leave_taken_id": leave.pk,
+        "duration": leave_day_duration(leave),
+        "leave_type": leave.leave_type,
+        "status": leave.status,
+    }
+    existing = {
+        row.date: row
+        for row in LeaveDay.objects.filter(
+            employee_id=leave.employee_id, date__in=wanted
+        )
+    }
+
+    to_update, to_create = [], []
+    for day in wanted:
+        row = existing.get(day)
+        if row is None:
+            to_create.append(
+                LeaveDay(employee_id=leave.employee_id, date=day, **values)
+            )
+        elif any(getattr(row, f) != v for f, v in values.items()):
+            for f, v in values.items():
+                setattr(row, f, v)
+            to_update.append(row)
+
+    if to_update:
+        LeaveDay.objects.bulk_update(to_update, list(values))
+    if to_create:
+        # A concurrent leave may have claimed a day meanwhile; skip it like
+        # the old IntegrityError handler did.
+        LeaveDay.objects.bulk_create(to_create, ignore_conflicts=True)
+    if to_update or to_create:
+        model_changed(LeaveDay)
+
+    for row in to_update + to_create:
+        mark_dirty(row.employee_id, row.date.year, row.date.month, availed=True)
+
+
+def _delete_leave_days(qs):
+    months = set(qs.values_list("employee_id", "date__year", "date__month"))
+    if not months:
+        return
+    qs.delete()
+    for employee_id, year, month in months:
+        mark_dirty(employee_id, year, month, availed=True)
+
+
+def materialize_leave_timesheets(leave, task_assign) -> Decimal:
+    """
+    Make the approved leave's auto timesheets on ``task_assign`` match its
+    working days (Calendar weekends/holidays are skipped): 4h 09:00-13:00 for
+    half-day leaves, otherwise 8h 09:00-18:00. Anything else on that task in
+    the leave range is removed.
+
+    Returns the approved-hours delta of the bulk writes for the hours ledger
+    (deletes go through post_delete and are accounted for there).
+    """
+    start_date = leave.start_date
+    end_date = leave.end_date or start_date
+    duration = float(leave.duration or 1.0)
+    hours = 4 if duration <= 0.5 else 8  # Half-day support
+    values = {
+        "task_hours": Decimal(hours),
+        "start_time": TIMESHEET_START,
+        "end_time": HALF_DAY_END if hours == 4 else FULL_DAY_END,
+        "submitted": True,
+        "approved": True,
+        "rejected": False,
+    }
+
+    wanted = set(iter_working_days(start_date, end_date))
+
+    existing = TimeSheet.objects.filter(
+        employee=leave.employee,
+        task_assign=task_assign,
+        date__range=[start_date, end_date],
+    )
+
+    kept, to_update, to_delete = set(), [], []
+    delta = Decimal("0")
+    for ts in existing:
+        if ts.date not in wanted or ts.date in kept:
+            to_delete.append(ts.pk)
+            continue
+        kept.add(ts.date)
+        if any(getattr(ts, f) != v for f, v in values.items()):
+            delta -= (ts.task_hours or 0) if ts.approved else 0
+            delta += values["task_hours"]
+            for f, v in values.items():
+                setattr(ts, f, v)
+            to_update.append(ts)
+
+    to_create = [
+        TimeSheet(employee=leave.employee, task_assign=task_assign, date=day, **values)
+        for day in sorted(wanted - kept)
+    ]
+
+    if to_delete:
+        TimeSheet.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        TimeSheet.objects.bulk_update(to_update, list(values))
+    if to_create:
+        TimeSheet.objects.bulk_create(assign_ids(to_create))
+        delta += values["task_hours"] * len(to_create)
+    if to_update or to_create:
+        model_changed(TimeSheet)
+        mark_facts_dirty(task_assign.pk, [ts.date for ts in to_update + to_create])
+
+    return delta
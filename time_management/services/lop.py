@@ -0,0 +1,95 @@
+# apps/time_management/services/lop.py
+"""
+Batched loss-of-pay (LOP) days.
+
+``lop_summary(year)`` reads the LOP leaves overlapping ``year`` (all of them
+without a year) in one query and splits each leave at month boundaries in
+one BusDayEngine call: the leave's duration is spread evenly over its
+calendar days and summed per (employee, "YYYY-MM"). The result feeds the
+report serializers through context, so the endpoints cost the same number
+of queries whatever the headcount.
+
+Totals are the sum of the employee's months inside the year, i.e. a leave
+spanning New Year counts in each year for the days that fall in it.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.db.models import Q
+
+from ..models import LeavesTaken
+from .busdays import BusDayEngine
+
+
+@dataclass
+class LopSummary:
+    by_month: dict = field(default_factory=dict)  # emp -> [{"month", "days"}]
+    totals: dict = field(default_factory=dict)  # emp -> float
+
+    def months_of(self, employee_id):
+        return self.by_month.get(employee_id, [])
+
+    def total_of(self, employee_id):
+        return self.totals.get(employee_id, 0)
+
+
+def parse_year(value):
+    """``?year=`` as an int, None when missing or malformed."""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def lop_leaves(year=None, employee_ids=None):
+    qs = LeavesTaken.objects.filter(leave_type="lop", start_date__isnull=False)
+    if year:
+        year_start, year_end = date(year, 1, 1), date(year, 12, 31)
+        qs = qs.filter(start_date__lte=year_end).filter(
+            Q(end_date__gte=year_start)
+            | Q(end_date__isnull=True, start_date__gte=year_start)
+        )
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    return qs.values_list("employee_id", "start_date", "end_date", "duration")
+
+
+def split_by_month(rows, year=None):
+    """
+    {employee_id: [{"month": "YYYY-MM", "days": float}, ...]} (months in
+    order) for (employee_id, start, end, duration) rows.
+    """
+    rows = [r for r in rows if r[1]]
+    if not rows:
+        return {}
+
+    starts = [r[1] for r in rows]
+    ends = [r[2] or r[1] for r in rows]
+    per_day = [
+        float(r[3] or 0) / ((e - s).days + 1) if e >= s else 0.0
+        for r, s, e in zip(rows, starts, ends)
+    ]
+
+    # payroll month == calendar month
+    _, buckets = BusDayEngine(None, None, all_days=True).count_by_month(
+        starts, ends, keys=[r[0] for r in rows], weights=per_day
+    )
+
+    result = defaultdict(list)
+    for (employee_id, month), days in sorted(buckets.items()):
+        if year and not month.startswith(f"{year}-"):
+            continue
+        result[employee_id].append({"month": month, "days": round(days, 2)})
+    return dict(result)
+
+
+def lop_summary(year=None, employee_ids=None):
+    """Per-employee monthly LOP days and totals for ``year`` (one query)."""
+    year = parse_year(year)
+    by_month = split_by_month(lop_leaves(year, employee_ids), year)
+    totals = {
+        employee_id: round(sum(m["days"] for m in months), 2)
+        for employee_id, months in by_month.items()
+    }
+    return LopSummary(by_month=by_month, totals=totals)
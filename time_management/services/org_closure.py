@@ -0,0 +1,144 @@
+# apps/time_management/services/org_closure.py
+"""
+Org-chart closure table (OrgClosure) built from Hierarchy.
+
+Every (manager, report) pair at any depth is stored with the shortest depth
+over all edges (reporting_to + second_reporting_to) and over primary
+reporting_to edges only. "Everyone under X", optionally limited to N levels,
+is then one indexed query instead of a recursive walk.
+
+When a Hierarchy row's reporting edges change, only the changed employee and
+everyone below them get their ancestor rows recomputed. The edges are read
+in one query and walked in memory; cycles are cut by the visited sets.
+"""
+from collections import defaultdict, deque
+
+from django.db import transaction
+
+from ..models import Employee, Hierarchy, OrgClosure
+
+
+def _load_edges():
+    """(parents, children): employee_id -> [(other_id, is_primary), ...]"""
+    parents, children = defaultdict(list), defaultdict(list)
+    rows = Hierarchy.objects.filter(employee__isnull=False).values_list(
+        "employee_id", "reporting_to_id", "second_reporting_to_id"
+    )
+    for emp_id, primary, second in rows:
+        for manager_id, is_primary in ((primary, True), (second, False)):
+            if manager_id and manager_id != emp_id:
+                parents[emp_id].append((manager_id, is_primary))
+                children[manager_id].append((emp_id, is_primary))
+    return parents, children
+
+
+def _shortest_depths(start, graph, primary_only):
+    """BFS from ``start`` over ``graph``; {node: depth}, start excluded."""
+    depths, queue = {start: 0}, deque([start])
+    while queue:
+        node = queue.popleft()
+        for nxt, is_primary in graph.get(node, ()):
+            if primary_only and not is_primary:
+                continue
+            if nxt not in depths:
+                depths[nxt] = depths[node] + 1
+                queue.append(nxt)
+    depths.pop(start)
+    return depths
+
+
+def _closure_rows(employee_ids, parents):
+    rows = []
+    for emp_id in employee_ids:
+        all_depths = _shortest_depths(emp_id, parents, primary_only=False)
+        primary_depths = _shortest_depths(emp_id, parents, primary_only=True)
+        for ancestor_id, depth in all_depths.items():
+            rows.append(
+                OrgClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=emp_id,
+                    depth=depth,
+                    primary_depth=primary_depths.get(ancestor_id),
+                )
+            )
+    return rows
+
+
+@transaction.atomic
+def rebuild_closure():
+    """Recompute the whole table."""
+    parents, _ = _load_edges()
+    employee_ids = set(Employee.objects.values_list("employee_id", flat=True))
+    OrgClosure.objects.all().delete()
+    rows = _closure_rows(employee_ids, parents)
+    OrgClosure.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+@transaction.atomic
+def refresh_subtrees(employee_ids):
+    """
+    Recompute ancestor rows of ``employee_ids`` and of everyone below them
+    (over both edge kinds) after their reporting lines changed.
+    """
+    employee_ids = {e for e in employee_ids if e}
+    if not employee_ids:
+        return 0
+    parents, children = _load_edges()
+    affected = set(employee_ids)
+    for employee_id in employee_ids:
+        affected |= set(_shortest_depths(employee_id, children, primary_only=False))
+    OrgClosure.objects.filter(descendant_id__in=affected).delete()
+    rows = _closure_rows(affected, parents)
+    OrgClosure.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# ---- query API ----
+
+
+def _filter(manager_id, max_depth=None, include_second=False):
+    depth_field = "depth" if include_second else "primary_depth"
+    qs = OrgClosure.objects.filter(
+        ancestor_id=manager_id, **{f"{depth_field}__isnull": False}
+    )
+    if max_depth is not None:
+        qs = qs.filter(**{f"{depth_field}__lte": max_depth})
+    return qs
+
+
+def subordinate_ids(manager_id, max_depth=None, include_second=False):
+    """employee_ids reporting (directly or not) to ``manager_id``."""
+    return list(
+        _filter(manager_id, max_depth, include_second).values_list(
+            "descendant_id", flat=True
+        )
+    )
+
+
+def subordinates(manager_id, max_depth=None, include_second=False):
+    """Employee queryset of the reports of ``manager_id``, nearest first."""
+    depth_field = "depth" if include_second else "primary_depth"
+    # One filter() call, so every condition applies to the same closure row
+    # (the manager's); a second call would join org_ancestors again
+    conditions = {
+        "org_ancestors__ancestor_id": manager_id,
+        f"org_ancestors__{depth_field}__isnull": False,
+    }
+    if max_depth is not None:
+        conditions[f"org_ancestors__{depth_field}__lte"] = max_depth
+    return Employee.objects.filter(**conditions).order_by(
+        f"org_ancestors__{depth_field}", "employee_id"
+    )
+
+
+def manager_ids(employee_id, include_second=False):
+    """Everyone above ``employee_id``, nearest first."""
+    depth_field = "depth" if include_second else "primary_depth"
+    return list(
+        OrgClosure.objects.filter(
+            descendant_id=employee_id, **{f"{depth_field}__isnull": False}
+        )
+        .order_by(depth_field)
+        .values_list("ancestor_id", flat=True)
+    )
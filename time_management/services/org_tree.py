@@ -0,0 +1,160 @@
+# apps/time_management/services/org_tree.py
+"""
+In-memory org tree for the chart / hierarchy endpoints.
+
+``OrgTree.load()`` reads every employee with its manager links and the few
+display fields the charts show in a single ``values()`` query, and indexes
+the children of each manager in memory. Two edge kinds are kept because the
+endpoints have always used different ones:
+
+* chart edges: ``Employee.reporting_manager`` (manager_chart,
+  department_chart), and
+* hierarchy edges: ``Hierarchy.reporting_to`` (org_hierarchy,
+  manager_hierarchy).
+
+Nested chart JSON is emitted for any root and depth; a node already on the
+current path is not entered again, so a reporting cycle cannot recurse
+forever.
+
+``cached_org_payload(name, build)`` keeps a built payload in the shared
+``ORG_CACHE_ALIAS`` cache (see ``team_cache``) under the org version token,
+which Employee, Hierarchy and User writes bump, so every worker drops the
+old chart as soon as one of them changes the org.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ..models import Employee
+from .team_cache import CACHE_ALIAS, org_version
+
+KEY_PREFIX = "time_management:orgtree"
+TIMEOUT = getattr(settings, "ORG_TREE_CACHE_TIMEOUT", 300)
+
+FIELDS = (
+    "employee_id",
+    "employee_name",
+    "last_name",
+    "employee_code",
+    "designation",
+    "department",
+    "profile_picture",
+    "reporting_manager",
+    "hierarchy__reporting_to_id",
+    "user__role",
+    "user",
+)
+
+
+class OrgTree:
+    def __init__(self, rows):
+        self.nodes = {}
+        self.chart_children = defaultdict(list)
+        self.reports = defaultdict(list)
+        storage = Employee._meta.get_field("profile_picture").storage
+
+        for row in rows:
+            emp_id = row["employee_id"]
+            if emp_id in self.nodes:
+                # Extra Hierarchy rows of the same employee: first one wins
+                continue
+            picture = row["profile_picture"]
+            node = {
+                "id": emp_id,
+                "name": row["employee_name"],
+                "last_name": row["last_name"],
+                "code": row["employee_code"],
+                "designation": row["designation"],
+                "department": row["department"],
+                "profile_picture": storage.url(picture) if picture else None,
+                "reporting_manager": row["reporting_manager"],
+                "has_user": row["user"] is not None,
+                "role": row["user__role"],
+            }
+            self.nodes[emp_id] = node
+            if row["reporting_manager"]:
+                self.chart_children[row["reporting_manager"]].append(node)
+            manager_id = row["hierarchy__reporting_to_id"]
+            if manager_id:
+                self.reports[manager_id].append(node)
+
+    @classmethod
+    def load(cls):
+        return cls(Employee.objects.order_by("employee_id").values(*FIELDS))
+
+    # ---- chart edges (Employee.reporting_manager) ----
+
+    @staticmethod
+    def chart_node(node):
+        return {
+            "id": node["id"],
+            "name": node["name"],
+            "designation": node["designation"],
+            "profile_picture": node["profile_picture"],
+        }
+
+    def chart(self, root_id, depth=None, _path=frozenset()):
+        """Nested children of ``root_id``, ``depth`` levels deep (None = all)."""
+        if depth is not None and depth <= 0:
+            return []
+        path = _path | {root_id}
+        next_depth = None if depth is None else depth - 1
+        return [
+            {
+                **self.chart_node(node),
+                "children": self.chart(node["id"], next_depth, path),
+            }
+            for node in self.chart_children.get(root_id, ())
+            if node["id"] not in path
+        ]
+
+    def manager_chart(self, depth=None):
+        """{manager_id: {"manager": ..., "children": [...]}} for every manager."""
+        charts = {}
+        for manager_id in self.chart_children:
+            manager = self.nodes.get(manager_id)
+            if manager is None:
+                continue
+            charts[manager_id] = {
+                "manager": self.chart_node(manager),
+                "children": self.chart(manager_id, depth),
+            }
+        return charts
+
+    def department_chart(self, depth=None):
+        """{department: [top-level employees with nested children]}."""
+        departments = {}
+        for node in self.nodes.values():
+            roots = departments.setdefault(node["department"] or "Unassigned", [])
+            if not node["reporting_manager"]:
+                roots.append(
+                    {
+                        **self.chart_node(node),
+                        "children": self.chart(node["id"], depth),
+                    }
+                )
+        return departments
+
+    # ---- hierarchy edges (Hierarchy.reporting_to) ----
+
+    def direct_reports(self, manager_id):
+        return self.reports.get(manager_id, [])
+
+
+def load_org_tree():
+    return OrgTree.load()
+
+
+def cached_org_payload(name, build):
+    """
+    ``build(tree)`` once per org version; later calls with the same ``name``
+    are served from the cache.
+    """
+    cache = caches[CACHE_ALIAS]
+    key = f"{KEY_PREFIX}:{org_version()}:{name}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = build(load_org_tree())
+        cache.set(key, payload, TIMEOUT)
+    return payload
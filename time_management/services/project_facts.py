@@ -0,0 +1,210 @@
+# apps/time_management/services/project_facts.py
+"""
+ProjectHoursDaily fact table: approved timesheet hours and entry counts per
+(project, building, task, employee department, date).
+
+TimeSheet signals and the bulk timesheet writers call ``mark_facts_dirty()``
+with the (task_assign, date) cells they touched, before and after the
+change. When the transaction commits (immediately in autocommit) each dirty
+cell is recomputed from TimeSheet for the project/building/task its
+TaskAssign resolves to, so a cell is always rebuilt from the data rather
+than patched with deltas. A TaskAssign moved to another building or an
+employee changing department is picked up the next time one of the cells
+is written; ``rebuild_project_facts()`` (command ``rebuild_project_hours``)
+recomputes the whole table.
+
+``project_hours_by_period()`` is the report side: one GROUP BY over the
+table for every project at once.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+from ..models import ProjectHoursDaily, TaskAssign, TimeSheet
+from .report_cache import model_changed
+
+PROJECT_PATH = "task_assign__building_assign__project_assign__project"
+BUILDING_PATH = "task_assign__building_assign__building"
+TASK_PATH = "task_assign__task"
+
+PERIODS = {
+    "week": (TruncWeek, "%G-W%V"),
+    "month": (TruncMonth, "%Y-%m"),
+    "year": (TruncYear, "%Y"),
+}
+
+_state = threading.local()
+
+
+# ---- maintenance ----
+
+
+def _pending():
+    if not hasattr(_state, "pending"):
+        _state.pending = defaultdict(set)  # task_assign_id -> {date, ...}
+    return _state.pending
+
+
+def mark_facts_dirty(task_assign_id, dates):
+    """Recompute the cells of ``task_assign_id`` on ``dates`` after commit."""
+    if not task_assign_id:
+        return
+    _pending()[task_assign_id].update(dates)
+    transaction.on_commit(flush_facts)
+
+
+STORED_FIELDS = ("task_assign_id", "date")
+
+
+def remember_cell(instance, prev):
+    """
+    pre_save: note the (task_assign, date) cell the row is stored in.
+    ``prev`` is the stored row as a dict with STORED_FIELDS (None if new).
+    """
+    instance._facts_prev = None
+    if prev:
+        instance._facts_prev = (prev["task_assign_id"], prev["date"])
+
+
+def record_cell_change(instance):
+    """post_save/post_delete: the stored and the new cell are both dirty."""
+    previous = getattr(instance, "_facts_prev", None)
+    if previous and previous != (instance.task_assign_id, instance.date):
+        mark_facts_dirty(previous[0], [previous[1]])
+    mark_facts_dirty(instance.task_assign_id, [instance.date])
+
+
+def flush_facts():
+    pending = _pending()
+    if not pending:
+        return
+    batch = dict(pending)
+    pending.clear()
+    for task_assign_id, dates in batch.items():
+        refresh_project_facts(task_assign_id, dates)
+
+
+def _date_filter(dates):
+    known = {d for d in dates if d is not None}
+    q = Q(date__in=known)
+    if None in dates:
+        q |= Q(date__isnull=True)
+    return q
+
+
+def _fact_rows(timesheets):
+    rows = (
+        timesheets.filter(approved=True)
+        .exclude(**{f"{PROJECT_PATH}__isnull": True})
+        .values(
+            "date",
+            project_ref=F(PROJECT_PATH),
+            building_ref=F(BUILDING_PATH),
+            task_ref=F(TASK_PATH),
+            department=F("employee__department"),
+        )
+        .annotate(hours=Sum("task_hours"), entries=Count("pk"))
+        .order_by()
+    )
+    return [
+        ProjectHoursDaily(
+            project_id=r["project_ref"],
+            building_id=r["building_ref"],
+            task_id=r["task_ref"],
+            department=r["department"],
+            date=r["date"],
+            hours=r["hours"] or 0,
+            entries=r["entries"],
+        )
+        for r in rows
+    ]
+
+
+@transaction.atomic
+def refresh_project_facts(task_assign_id, dates):
+    """
+    Recompute every department's cell on ``dates`` for the project / building
+    / task that ``task_assign_id`` belongs to (other TaskAssigns of the same
+    task and building share those cells).
+    """
+    dates = set(dates)
+    chain = (
+        TaskAssign.objects.filter(pk=task_assign_id)
+        .values(
+            "task_id",
+            project_ref=F("building_assign__project_assign__project"),
+            building_ref=F("building_assign__building"),
+        )
+        .first()
+    )
+    if not dates or chain is None or chain["project_ref"] is None:
+        return 0
+
+    when = _date_filter(dates)
+    ProjectHoursDaily.objects.filter(
+        when,
+        project_id=chain["project_ref"],
+        building_id=chain["building_ref"],
+        task_id=chain["task_id"],
+    ).delete()
+    rows = _fact_rows(
+        TimeSheet.objects.filter(
+            when,
+            **{
+                PROJECT_PATH: chain["project_ref"],
+                BUILDING_PATH: chain["building_ref"],
+                TASK_PATH: chain["task_id"],
+            },
+        )
+    )
+    ProjectHoursDaily.objects.bulk_create(rows, ignore_conflicts=True)
+    model_changed(ProjectHoursDaily)
+    return len(rows)
+
+
+@transaction.atomic
+def rebuild_project_facts():
+    """Recompute the whole table from approved timesheets."""
+    ProjectHoursDaily.objects.all().delete()
+    rows = _fact_rows(TimeSheet.objects.all())
+    ProjectHoursDaily.objects.bulk_create(rows, batch_size=1000)
+    model_changed(ProjectHoursDaily)
+    return len(rows)
+
+
+# ---- reports ----
+
+
+def project_hours_by_period(period, project_ids=None, department=None):
+    """
+    {project_id: [{period: label, "hours": float}, ...]} in period order,
+    labels as the project reports have always shown them ("2025-W07",
+    "2025-02", "2025"; "Unknown" for undated hours).
+    """
+    trunc, label_format = PERIODS[period]
+    qs = ProjectHoursDaily.objects.all()
+    if project_ids is not None:
+        qs = qs.filter(project_id__in=project_ids)
+    if department:
+        qs = qs.filter(department=department)
+
+    rows = (
+        qs.annotate(bucket=trunc("date"))
+        .values("project_id", "bucket")
+        .annotate(total=Sum("hours"))
+        .order_by("project_id", "bucket")
+    )
+    by_project = defaultdict(list)
+    for r in rows:
+        by_project[r["project_id"]].append(
+            {
+                period: (
+                    r["bucket"].strftime(label_format) if r["bucket"] else "Unknown"
+                ),
+                "hours": float(r["total"]),
+            }
+        )
+    return by_project
@@ -0,0 +1,84 @@
+# apps/time_management/services/rebuild_queue.py
+"""
+Coalesces the leave-balance rebuilds fired by LeaveDay / CompOffRequest /
+LeaveOpeningBalance signals.
+
+Receivers call ``mark_dirty()`` instead of rebuilding straight away. The
+dirty set keeps, per (employee, year), the earliest month whose balance
+chain must be recomputed and the months whose MonthlyLeaveAvailed row is
+stale. It is flushed once per key when the surrounding transaction commits
+(immediately in autocommit), or when the outermost ``defer_rebuilds()``
+block exits.
+
+Rebuilds are recomputed from the data, so a key left behind by a rolled
+back transaction only costs one redundant rebuild on the next flush.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_state = threading.local()
+
+
+def _pending():
+    if not hasattr(_state, "pending"):
+        _state.pending = {}  # (employee_id, year) -> {"start": int, "availed": set}
+        _state.depth = 0
+    return _state.pending
+
+
+def mark_dirty(employee_id, year, month, availed=False):
+    """Record that (employee, year) must be rebuilt from ``month`` onwards."""
+    if not employee_id or not year or not month:
+        return
+
+    pending = _pending()
+    entry = pending.setdefault((employee_id, year), {"start": month, "availed": set()})
+    entry["start"] = min(entry["start"], month)
+    if availed:
+        entry["availed"].add(month)
+
+    if _state.depth == 0:
+        # Registered per mark so a callback dropped by a savepoint rollback
+        # cannot strand later keys; extra callbacks find the set empty.
+        transaction.on_commit(flush)
+
+
+@contextmanager
+def defer_rebuilds():
+    """
+    Hold every rebuild until the outermost block exits (and its transaction,
+    if any, commits). Use around bulk jobs that save many leaves::
+
+        with defer_rebuilds():
+            for leave in leaves:
+                leave.save()
+    """
+    _pending()
+    _state.depth += 1
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+        if _state.depth == 0 and _state.pending:
+            transaction.on_commit(flush)
+
+
+def flush():
+    """Run one rebuild per dirty (employee, year) key."""
+    from time_management.signals import _rebuild_month, rebuild_monthly_balances
+
+    pending = _pending()
+    if not pending or _state.depth:
+        return
+
+    batch = dict(pending)
+    pending.clear()
+
+    for (employee_id, year), entry in batch.items():
+        for month in sorted(entry["availed"]):
+            _rebuild_month(employee_id, year, month)
+        rebuild_monthly_balances(
+            employee_id=employee_id, year=year, start_month=entry["start"]
+        )
@@ -0,0 +1,226 @@
+# apps/time_management/services/report_cache.py
+"""
+Versioned response cache for the report endpoints.
+
+A cached report declares the models its payload is computed from::
+
+    @api_view(["GET"])
+    @cached_report("attrition", depends_on=(Employee,))
+    def attrition_report(request): ...
+
+Every model of the app has a version token in the cache. Its post_save /
+post_delete (and the bulk writers that skip signals, through
+``model_changed()``) write a new token once the transaction commits. The key
+of a cached payload holds the report name, the URL kwargs, the query string,
+today's date and the current token of each dependency, so any write to one
+of them makes the old entries unreachable: nothing is purged, stale entries
+just age out after ``REPORT_CACHE_TIMEOUT`` seconds.
+
+Only 200 responses carrying JSON data are stored; downloads (``?export=``)
+and errors always run the view. Entries and tokens go to the
+``REPORT_CACHE_ALIAS`` cache, which must be shared by every process that
+writes or serves reports (web workers, cron, management commands): a token
+bumped in one process's locmem is invisible to the others. When the alias is
+a ``LocMemCache`` reports are therefore not cached at all (counted as
+"bypassed"), and when the backend raises the view just runs, so a cache
+outage costs speed, never freshness. ``model_versions()`` alone falls back
+to a process-local cache, for callers that bound their own staleness.
+
+Hits and misses are counted per report in every process
+(``report_cache_stats()``) and each response says which it was in the
+``X-Report-Cache`` header.
+"""
+import functools
+import hashlib
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+ALIAS = getattr(settings, "REPORT_CACHE_ALIAS", "default")
+TIMEOUT = getattr(settings, "REPORT_CACHE_TIMEOUT", 600)
+APP_LABEL = "time_management"
+VERSION_PREFIX = "time_management:model-version"
+KEY_PREFIX = "time_management:report"
+
+_fallback = LocMemCache(
+    "time_management-report-cache",
+    {"TIMEOUT": TIMEOUT, "OPTIONS": {"MAX_ENTRIES": 500}},
+)
+_state = threading.local()
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+
+
+# ---- backend ----
+
+
+def _call(method, *args, **kwargs):
+    """Run ``method`` on the report cache, on the local fallback if it fails."""
+    try:
+        return getattr(caches[ALIAS], method)(*args, **kwargs)
+    except Exception:  # any backend error (connection refused, timeout...)
+        logger.warning("report cache %r unavailable, using locmem", ALIAS)
+        return getattr(_fallback, method)(*args, **kwargs)
+
+
+# ---- model versions ----
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _version_key(label):
+    return f"{VERSION_PREFIX}:{label}"
+
+
+def _versions_in(cache, models):
+    keys = [_version_key(_label(m)) for m in models]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            # First use or evicted: a fresh token, never a reused one
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions.append(version)
+    return versions
+
+
+def model_versions(models):
+    """Current version token of each of ``models`` (one cache round trip)."""
+    try:
+        return _versions_in(caches[ALIAS], models)
+    except Exception:
+        logger.warning("report cache %r unavailable, using locmem", ALIAS)
+        return _versions_in(_fallback, models)
+
+
+def is_shared():
+    """True when the report cache is visible to every process."""
+    return not isinstance(caches[ALIAS], LocMemCache)
+
+
+def bump_model_versions(*models):
+    """Every cached report depending on one of ``models`` is now stale."""
+    _call(
+        "set_many",
+        {_version_key(_label(m)): uuid.uuid4().hex for m in models},
+        None,
+    )
+
+
+def _pending():
+    if not hasattr(_state, "pending"):
+        _state.pending = set()
+    return _state.pending
+
+
+def _flush_pending():
+    pending = _pending()
+    if pending:
+        models = list(pending)
+        pending.clear()
+        bump_model_versions(*models)
+
+
+def model_changed(model):
+    """Signal side: bump ``model`` once, after the transaction commits."""
+    if model._meta.app_label != APP_LABEL:
+        return
+    _pending().add(model)
+    transaction.on_commit(_flush_pending)
+
+
+# ---- reports ----
+
+
+def _payload_key(name, request, kwargs, versions):
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    # today's date too: several reports default to / stop at the current month
+    raw = repr((sorted(kwargs.items()), params, versions, date.today()))
+    return f"{KEY_PREFIX}:{name}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        _stats[name][outcome] += 1
+
+
+def report_cache_stats():
+    """{report: {"hits", "misses", "bypassed", "hit_rate"}} for this process."""
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in stats.values():
+        looked_up = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / looked_up, 3) if looked_up else 0.0
+    return stats
+
+
+def cached_report(name, depends_on, timeout=None):
+    """
+    Cache a GET report view (under ``@api_view``) until one of the
+    ``depends_on`` models changes.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method != "GET"
+                or "export" in request.query_params
+                or not is_shared()
+            ):
+                _count(name, "bypassed")
+                return view(request, *args, **kwargs)
+
+            cache = caches[ALIAS]
+            try:
+                versions = _versions_in(cache, depends_on)
+                key = _payload_key(name, request, kwargs, versions)
+                data = cache.get(key)
+            except Exception:
+                logger.warning("report cache %r unavailable, %s uncached", ALIAS, name)
+                _count(name, "bypassed")
+                return view(request, *args, **kwargs)
+
+            if data is not None:
+                _count(name, "hits")
+                response = Response(data, status=status.HTTP_200_OK)
+                response["X-Report-Cache"] = "hit"
+                return response
+
+            _count(name, "misses")
+            response = view(request, *args, **kwargs)
+            if (
+                isinstance(response, Response)
+                and response.status_code == status.HTTP_200_OK
+            ):
+                try:
+                    cache.set(key, response.data, timeout or TIMEOUT)
+                except Exception:
+                    logger.warning("report cache %r unavailable", ALIAS)
+                response["X-Report-Cache"] = "miss"
+            return response
+
+        wrapper.report_dependencies = tuple(depends_on)
+        return wrapper
+
+    return decorator
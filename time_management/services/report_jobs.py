@@ -0,0 +1,216 @@
+# apps/time_management/services/report_jobs.py
+"""
+Background report jobs.
+
+Year-wide reports that outlive the proxy timeout are queued as ReportJob
+rows instead of being built inside the request. ``submit(report, params)``
+returns the job; while one is queued or running for the same report and
+parameters, identical submissions get that same job (its ``inflight_key``
+is unique and cleared when the job ends).
+
+``python manage.py run_report_jobs`` runs them with a pool of worker
+threads and no broker: each worker claims the oldest queued job with
+``SELECT ... FOR UPDATE SKIP LOCKED``, renders the report through its
+existing view with the job's query parameters (so the output is exactly
+what the endpoint returns: JSON, CSV or XLSX) and writes the body to
+``REPORT_JOB_DIR``. The status and download endpoints read the row and
+serve that file.
+"""
+import hashlib
+import json
+import os
+import re
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import ReportJob
+
+RESULT_DIR = getattr(
+    settings, "REPORT_JOB_DIR", os.path.join(settings.BASE_DIR, "report_jobs")
+)
+STALE_SECONDS = getattr(settings, "REPORT_JOB_STALE_SECONDS", 3600)
+KEEP_DAYS = getattr(settings, "REPORT_JOB_KEEP_DAYS", 7)
+
+FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+
+
+def _month(value):
+    month = int(value)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month {value!r}. Use 1..12.")
+    return month
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    view: str  # dotted path of the @api_view function
+    path_params: tuple = ()  # (name, converter) passed as URL kwargs
+    required_params: tuple = ()  # (name, converter) the view rejects without
+
+
+REPORTS = {
+    "employee-lop": ReportSpec("time_management.reports.views.employee_lop_view"),
+    "leaves-available": ReportSpec(
+        "time_management.reports.views.leaves_available_report"
+    ),
+    "active-leaves-available": ReportSpec(
+        "time_management.reports.views.active_leaves_available_report"
+    ),
+    "export-report": ReportSpec("time_management.project.views.export_report"),
+    "opening-monthly-all": ReportSpec(
+        "time_management.leaveday.views.opening_plus_monthly_availed_all",
+        path_params=(("year", int),),
+        required_params=(("month", _month),),
+    ),
+}
+
+
+# ---- submitting ----
+
+
+def _clean_params(spec, params):
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise ValueError("'params' must be an object.")
+    params = {str(k): str(v) for k, v in params.items() if v is not None}
+    # Checked here so a bad job is refused now instead of failing in a worker
+    for name, convert in spec.path_params + spec.required_params:
+        if name not in params:
+            raise ValueError(f"'{name}' is required.")
+        try:
+            convert(params[name])
+        except ValueError:
+            raise ValueError(f"Invalid '{name}': {params[name]!r}.")
+    return params
+
+
+def submit(report, params=None):
+    """(job, created): a new queued job, or the identical one already in flight."""
+    if not isinstance(report, str):
+        raise ValueError(f"'report' must be one of: {', '.join(REPORTS)}")
+    spec = REPORTS.get(report)
+    if spec is None:
+        raise ValueError(f"Unknown report '{report}'. Use one of: {', '.join(REPORTS)}")
+    params = _clean_params(spec, params)
+    key = hashlib.sha256(
+        json.dumps([report, params], sort_keys=True).encode()
+    ).hexdigest()
+
+    while True:
+        job = ReportJob.objects.filter(inflight_key=key).first()
+        if job is not None:
+            return job, False
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    report=report, params=params, params_hash=key, inflight_key=key
+                )
+            return job, True
+        except IntegrityError:
+            continue  # submitted concurrently: pick up that job
+
+
+# ---- running ----
+
+
+def claim_next():
+    """Mark the oldest queued job running and return it (None when idle)."""
+    with transaction.atomic():
+        job = (
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(status="queued")
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def render_report(report, params):
+    """Call the report's view with ``params`` as the query string."""
+    spec = REPORTS[report]
+    kwargs = {name: convert(params[name]) for name, convert in spec.path_params}
+    query = {k: v for k, v in params.items() if k not in kwargs}
+    response = import_string(spec.view)(RequestFactory().get("/", query), **kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+def _write_body(response, path):
+    try:
+        with open(path, "wb") as out:
+            if response.streaming:
+                for chunk in response.streaming_content:
+                    out.write(chunk)
+            else:
+                out.write(response.content)
+    finally:
+        response.close()  # spooled files, server-side cursors
+
+
+def run_job(job):
+    """Render ``job`` to a file under RESULT_DIR; the row records the outcome."""
+    try:
+        response = render_report(job.report, job.params)
+        content_type = response.get("Content-Type", "application/json")
+        match = FILENAME_RE.search(response.get("Content-Disposition", ""))
+        filename = match.group(1) if match else f"{job.report}.json"
+
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        path = os.path.join(RESULT_DIR, f"{job.job_id}{os.path.splitext(filename)[1]}")
+        _write_body(response, path)
+
+        if response.status_code >= 400:
+            with open(path, encoding="utf-8", errors="replace") as body:
+                job.error = body.read(2000)
+            os.remove(path)
+            job.status = "failed"
+        else:
+            job.status = "done"
+            job.result_path = path
+            job.filename = filename
+            job.content_type = content_type
+    except Exception:
+        job.status = "failed"
+        job.error = traceback.format_exc()[-4000:]
+
+    job.inflight_key = None
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+# ---- housekeeping ----
+
+
+def requeue_stale(seconds=STALE_SECONDS):
+    """Jobs left running by a worker that died go back to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return ReportJob.objects.filter(status="running", started_at__lt=cutoff).update(
+        status="queued", started_at=None
+    )
+
+
+def purge_finished(days=KEEP_DAYS):
+    """Delete finished jobs older than ``days`` and their result files."""
+    old = ReportJob.objects.filter(
+        status__in=["done", "failed"],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    )
+    for path in old.exclude(result_path=None).values_list("result_path", flat=True):
+        if os.path.exists(path):
+            os.remove(path)
+    return old.delete()[0]
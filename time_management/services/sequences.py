@@ -0,0 +1,183 @@
+# apps/time_management/services/sequences.py
+"""
+Block-allocating ID sequences for the string primary keys (EMP_00001,
+TS_000000000000001, ...).
+
+Each prefix owns one row in ``IdSequence`` holding the last number handed
+out. Reserving ids locks only that row (never the data table) and bumps it
+by the size of the block, so high-volume models take the lock once per
+block instead of once per insert.
+"""
+import threading
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+
+DEFAULT_BLOCK_SIZE = getattr(settings, "ID_SEQUENCE_BLOCK_SIZE", 50)
+
+
+@dataclass(frozen=True)
+class SequenceSpec:
+    prefix: str
+    width: int
+    block_size: int = 1
+
+    def format(self, number: int) -> str:
+        return f"{self.prefix}_{number:0{self.width}d}"
+
+
+# model name -> id format. Master data keeps block_size=1 so ids stay gapless
+# and in creation order (the UI shows "last employee/project id").
+SEQUENCES = {
+    "Employee": SequenceSpec("EMP", 5),
+    "User": SequenceSpec("USR", 5),
+    "Hierarchy": SequenceSpec("HR", 5),
+    "CompOffRequest": SequenceSpec("CR", 5, DEFAULT_BLOCK_SIZE),
+    "LeaveOpeningBalance": SequenceSpec("LVOPN", 5),
+    "MonthlyLeaveAvailed": SequenceSpec("LVAVLD", 5, DEFAULT_BLOCK_SIZE),
+    "MonthlyLeaveBalance": SequenceSpec("MNLV", 5, DEFAULT_BLOCK_SIZE),
+    "LeavesAvailable": SequenceSpec("LVAVL", 5),
+    "LeavesTaken": SequenceSpec("LVTKN", 5),
+    "Calendar": SequenceSpec("CAL", 5),
+    "BiometricData": SequenceSpec("BIO", 9, DEFAULT_BLOCK_SIZE),
+    "Project": SequenceSpec("PROJ", 5),
+    "Building": SequenceSpec("BLD", 5),
+    "Task": SequenceSpec("TASK", 5),
+    "ProjectAssign": SequenceSpec("PRASS", 5),
+    "BuildingAssign": SequenceSpec("BLASS", 5),
+    "TaskAssign": SequenceSpec("TKASS", 5),
+    "TimeSheet": SequenceSpec("TS", 15, DEFAULT_BLOCK_SIZE),
+}
+
+
+def _spec(model) -> SequenceSpec:
+    return SEQUENCES[model._meta.object_name]
+
+
+def _parse(value):
+    try:
+        return int(str(value).rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def current_max(model) -> int:
+    """Highest number already used in ``model``'s primary key column."""
+    pk_name = model._meta.pk.name
+    last = model.objects.aggregate(last=models.Max(pk_name))["last"]
+    return _parse(last) if last else 0
+
+
+def _locked_counter(model, spec):
+    IdSequence = apps.get_model("time_management", "IdSequence")
+    counter = IdSequence.objects.select_for_update().filter(prefix=spec.prefix).first()
+    if counter is not None:
+        return counter
+
+    # First use of this prefix: seed from the existing data once.
+    try:
+        with transaction.atomic():
+            return IdSequence.objects.create(
+                prefix=spec.prefix, last_value=current_max(model)
+            )
+    except IntegrityError:
+        # Another worker seeded it first.
+        return IdSequence.objects.select_for_update().get(prefix=spec.prefix)
+
+
+def _reserve(model, count):
+    """Bump the counter by ``count``; return the first number of the block."""
+    spec = _spec(model)
+    with transaction.atomic():
+        counter = _locked_counter(model, spec)
+        first = counter.last_value + 1
+        counter.last_value += count
+        counter.save(update_fields=["last_value"])
+    return first
+
+
+class SequenceAllocator:
+    """
+    Serves ids from blocks reserved in this process.
+
+    A block is only cached when its reservation commits on its own (i.e. we
+    are not inside an outer transaction). Inside a caller's transaction the
+    counter update could still roll back, so exactly the requested ids are
+    reserved and nothing is kept for later.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}  # prefix -> [next, last]
+
+    def next_id(self, model) -> str:
+        spec = _spec(model)
+        with self._lock:
+            block = self._blocks.get(spec.prefix)
+            if block and block[0] <= block[1]:
+                number = block[0]
+                block[0] += 1
+                return spec.format(number)
+
+        if spec.block_size <= 1 or transaction.get_connection().in_atomic_block:
+            return spec.format(_reserve(model, 1))
+
+        first = _reserve(model, spec.block_size)
+        with self._lock:
+            self._blocks[spec.prefix] = [first + 1, first + spec.block_size - 1]
+        return spec.format(first)
+
+    def allocate(self, model, count) -> list:
+        if count <= 0:
+            return []
+        spec = _spec(model)
+        first = _reserve(model, count)
+        return [spec.format(n) for n in range(first, first + count)]
+
+    def reset(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+allocator = SequenceAllocator()
+
+
+def next_id(model) -> str:
+    return allocator.next_id(model)
+
+
+def allocate_ids(model, count: int) -> list:
+    """Reserve ``count`` ids for ``model`` in a single round trip."""
+    return allocator.allocate(model, count)
+
+
+def assign_ids(objs) -> list:
+    """
+    Fill in the primary key of every unsaved instance in ``objs`` (all of the
+    same model) so the list can go straight to ``bulk_create``.
+    """
+    objs = list(objs)
+    missing = [obj for obj in objs if not obj.pk]
+    if missing:
+        model = type(missing[0])
+        for obj, pk in zip(missing, allocate_ids(model, len(missing))):
+            obj.pk = pk
+    return objs
+
+
+def sync_sequence(model) -> int:
+    """
+    Move the counter forward to the data's current MAX (e.g. after rows were
+    imported with explicit ids). Never moves it backwards.
+    """
+    spec = _spec(model)
+    with transaction.atomic():
+        counter = _locked_counter(model, spec)
+        highest = current_max(model)
+        if highest > counter.last_value:
+            counter.last_value = highest
+            counter.save(update_fields=["last_value"])
+    allocator.reset()
+    return counter.last_value
@@ -0,0 +1,129 @@
+# apps/time_management/services/streaming_export.py
+"""
+Flat-memory export pipeline: server-side cursor -> CSV / NDJSON -> (gzip)
+-> client.
+
+``stream_query()`` runs raw SQL on an unbuffered MySQL cursor (``SSCursor``),
+so rows come off the socket ``chunk_size`` at a time instead of being
+``fetchall()``-ed into the process. Other backends fall back to a regular
+cursor read with ``fetchmany``.
+
+``streaming_csv_response()`` sends the header line straight away (before the
+query has produced anything), then encodes the rows in batches and
+optionally runs them through one gzip stream. ``streaming_ndjson_response()``
+does the same with one JSON object per line. Nothing holds more than one
+batch of rows at a time.
+"""
+import csv
+import json
+import zlib
+from datetime import date, time
+from decimal import Decimal
+
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+def stream_query(sql, params=None, using="default", chunk_size=CHUNK_SIZE):
+    """Yield the result rows of ``sql`` as tuples, ``chunk_size`` at a time."""
+    connection = connections[using]
+    connection.ensure_connection()
+
+    if connection.vendor == "mysql":
+        from MySQLdb.cursors import SSCursor
+
+        cursor = connection.connection.cursor(SSCursor)
+    else:
+        cursor = connection.cursor()
+
+    try:
+        cursor.execute(sql, params or ())
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        # An unbuffered cursor must be drained/closed before the connection
+        # can run anything else (also when the client went away mid-stream)
+        cursor.close()
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(header, rows, rows_per_write=ROWS_PER_WRITE):
+    """Encoded CSV: the header line first, then one chunk per batch of rows."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header).encode("utf-8")
+
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= rows_per_write:
+            yield "".join(batch).encode("utf-8")
+            batch = []
+    if batch:
+        yield "".join(batch).encode("utf-8")
+
+
+def _json_default(value):
+    # Full precision isoformat: clients send timestamps back as keyset cursors
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_chunks(rows, rows_per_write=ROWS_PER_WRITE):
+    """Encoded newline-delimited JSON, one chunk per batch of row dicts."""
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row, default=_json_default))
+        if len(batch) >= rows_per_write:
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+            batch = []
+    if batch:
+        yield ("\n".join(batch) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """Compress a byte stream into one gzip member, chunk by chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        # Sync-flush so every chunk reaches the client without waiting for
+        # the compressor's window to fill up
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_csv_response(filename, header, rows, gzip=False):
+    chunks = csv_chunks(header, rows)
+    if gzip:
+        response = StreamingHttpResponse(
+            gzip_chunks(chunks), content_type="application/gzip"
+        )
+        filename = f"{filename}.gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type="text/csv")
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+def streaming_ndjson_response(rows, filename=None):
+    response = StreamingHttpResponse(
+        ndjson_chunks(rows), content_type="application/x-ndjson"
+    )
+    if filename:
+        response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
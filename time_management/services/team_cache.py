@@ -0,0 +1,126 @@
+# apps/time_management/services/team_cache.py
+"""
+Manager -> team membership cache.
+
+``team_ids(manager)`` returns the employee_ids under a manager (read from the
+OrgClosure table) as a tuple meant for ``employee_id__in`` filters. Results
+are kept in two tiers keyed by an org version token:
+
+* a bounded in-process LRU (``TEAM_CACHE_SIZE`` entries), and
+* the shared ``ORG_CACHE_ALIAS`` cache (the database-backed "reports" cache
+  unless configured), so other workers reuse the same lookup.
+
+Hierarchy, Employee and User post_save/post_delete call
+``bump_org_version()`` after commit, which writes a new token to the shared
+cache; every process compares its token with it at most every
+``TEAM_CACHE_CHECK_SECONDS`` and drops its entries when it moved.
+"""
+import threading
+import time as _time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .org_closure import subordinate_ids
+
+CACHE_ALIAS = getattr(settings, "ORG_CACHE_ALIAS", "reports")
+VERSION_KEY = "time_management:org:version"
+KEY_PREFIX = "time_management:team"
+MAX_ENTRIES = getattr(settings, "TEAM_CACHE_SIZE", 1024)
+CHECK_SECONDS = getattr(settings, "TEAM_CACHE_CHECK_SECONDS", 2)
+TIMEOUT = getattr(settings, "TEAM_CACHE_TIMEOUT", 300)
+
+
+class TeamCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (manager_id, depth) -> (ids, stored_at)
+        self._max_entries = max_entries
+        self._version = None
+        self._checked_at = 0.0
+
+    # ---- cache maintenance ----
+
+    def _check_version(self):
+        now = _time.monotonic()
+        if now - self._checked_at < CHECK_SECONDS:
+            return
+        self._checked_at = now
+        version = org_version()
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+
+    def _local_get(self, key):
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or _time.monotonic() - entry[1] >= TIMEOUT:
+                return None, self._version
+            self._entries.move_to_end(key)
+            return entry[0], self._version
+
+    def _local_set(self, key, version, ids):
+        with self._lock:
+            if version != self._version:
+                return  # the org changed while we were loading
+            self._entries[key] = (ids, _time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._checked_at = 0.0
+
+    # ---- lookups ----
+
+    def team_ids(self, manager, depth=None):
+        manager_id = getattr(manager, "pk", manager)
+        key = (manager_id, depth)
+        ids, version = self._local_get(key)
+        if ids is not None:
+            return ids
+
+        shared_key = f"{KEY_PREFIX}:{version}:{manager_id}:{depth or 'all'}"
+        cache = caches[CACHE_ALIAS]
+        ids = cache.get(shared_key)
+        if ids is None:
+            ids = tuple(subordinate_ids(manager_id, max_depth=depth))
+            cache.set(shared_key, ids, TIMEOUT)
+        self._local_set(key, version, ids)
+        return ids
+
+
+team_cache = TeamCache()
+
+
+def team_ids(manager, depth=None, include_self=False):
+    """
+    employee_ids reporting to ``manager`` (an Employee or its id) over
+    reporting_to lines, all levels or up to ``depth``.
+    """
+    ids = team_cache.team_ids(manager, depth)
+    if include_self:
+        ids = ids + (getattr(manager, "pk", manager),)
+    return ids
+
+
+def org_version():
+    """Current org version token (created on first use)."""
+    cache = caches[CACHE_ALIAS]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_org_version():
+    """Tell every process its cached teams are stale."""
+    caches[CACHE_ALIAS].set(VERSION_KEY, uuid.uuid4().hex, None)
+    team_cache.invalidate()
@@ -0,0 +1,219 @@
+# apps/time_management/services/timesheet_cube.py
+"""
+In-memory cube of approved timesheet hours for ad-hoc pivots.
+
+Every approved TimeSheet row is read once, in one query joined to its
+employee, project, building and task, into a pandas frame. Text columns are
+categoricals and the week / month / year of each row is computed at load
+time, so a pivot is a boolean mask plus one ``groupby`` on the frame:
+
+    timesheet_cube.pivot(
+        dimensions=["department", "project"],
+        measures=["hours", "employees"],
+        grain="month",
+        filters={"project": ["P001"]},
+        start=date(2025, 1, 1),
+    )
+
+The cube is cached per process under the report cache version tokens of the
+models it is built from (``report_cache.model_versions``): a process checks
+them at most every ``TIMESHEET_CUBE_CHECK_SECONDS`` and reloads when one
+moved. As with the work calendar, the default locmem cache is per process,
+so the cube is also reloaded after ``TIMESHEET_CUBE_MAX_AGE`` seconds.
+"""
+import threading
+import time as _time
+
+import pandas as pd
+from django.conf import settings
+from django.db.models import F
+
+from ..models import (
+    Building,
+    BuildingAssign,
+    Employee,
+    Project,
+    ProjectAssign,
+    Task,
+    TaskAssign,
+    TimeSheet,
+)
+from .report_cache import model_versions
+
+CHECK_SECONDS = getattr(settings, "TIMESHEET_CUBE_CHECK_SECONDS", 5)
+MAX_AGE = getattr(settings, "TIMESHEET_CUBE_MAX_AGE", 600)
+
+SOURCE_MODELS = (
+    TimeSheet,
+    TaskAssign,
+    BuildingAssign,
+    ProjectAssign,
+    Project,
+    Building,
+    Task,
+    Employee,
+)
+
+PROJECT_PATH = "task_assign__building_assign__project_assign__project"
+BUILDING_PATH = "task_assign__building_assign__building"
+TASK_PATH = "task_assign__task"
+
+# cube column -> ORM lookup (besides date, task_hours and employee_id)
+COLUMNS = {
+    "employee_name": "employee__employee_name",
+    "department": "employee__department",
+    "project": PROJECT_PATH,
+    "project_code": f"{PROJECT_PATH}__project_code",
+    "discipline": f"{PROJECT_PATH}__discipline",
+    "building": BUILDING_PATH,
+    "building_title": f"{BUILDING_PATH}__building_title",
+    "task": TASK_PATH,
+    "task_title": f"{TASK_PATH}__task_title",
+}
+
+# dimension -> label columns returned with it
+DIMENSIONS = {
+    "employee": ("employee_name",),
+    "department": (),
+    "project": ("project_code",),
+    "discipline": (),
+    "building": ("building_title",),
+    "task": ("task_title",),
+}
+
+MEASURES = {
+    "hours": ("hours", "sum"),
+    "entries": ("hours", "size"),
+    "employees": ("employee", "nunique"),
+    "avg_hours": ("hours", "mean"),
+}
+
+# time grain -> period labels as the project reports show them
+GRAINS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+
+def _load_frame():
+    lookups = {name: F(path) for name, path in COLUMNS.items()}
+    rows = (
+        TimeSheet.objects.filter(approved=True)
+        .values_list("date", "task_hours", "employee_id", *lookups.values())
+        .order_by()
+    )
+    frame = pd.DataFrame.from_records(
+        rows.iterator(chunk_size=5000),
+        columns=["date", "task_hours", "employee", *lookups],
+    )
+    frame["hours"] = frame.pop("task_hours").astype(float)
+    frame["date"] = pd.to_datetime(frame["date"])
+    for grain, label_format in GRAINS.items():
+        frame[grain] = frame["date"].dt.strftime(label_format).fillna("Unknown")
+    for column in ["employee", *lookups, *GRAINS]:
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+class TimesheetCube:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._versions = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    # ---- cache maintenance ----
+
+    def frame(self):
+        with self._lock:
+            now = _time.monotonic()
+            if self._frame is not None and now - self._loaded_at >= MAX_AGE:
+                self._frame = None
+            if self._frame is not None and now - self._checked_at < CHECK_SECONDS:
+                return self._frame
+
+            self._checked_at = now
+            versions = model_versions(SOURCE_MODELS)
+            if self._frame is None or versions != self._versions:
+                self._frame = _load_frame()
+                self._versions = versions
+                self._loaded_at = now
+            return self._frame
+
+    def invalidate(self):
+        with self._lock:
+            self._frame = None
+
+    # ---- queries ----
+
+    def pivot(
+        self,
+        dimensions,
+        measures=("hours",),
+        grain=None,
+        filters=None,
+        start=None,
+        end=None,
+    ):
+        """
+        One row per combination of ``dimensions`` (and period of ``grain``)
+        with the requested ``measures``, largest hours first. ``filters`` maps
+        dimensions to the values to keep.
+        """
+        unknown = [d for d in dimensions if d not in DIMENSIONS]
+        unknown += [m for m in measures if m not in MEASURES]
+        unknown += [d for d in (filters or {}) if d not in DIMENSIONS]
+        if grain is not None and grain not in GRAINS:
+            unknown.append(grain)
+        if unknown:
+            raise ValueError(
+                f"Unknown dimension / measure / grain: {', '.join(unknown)}"
+            )
+        if not measures:
+            raise ValueError("At least one measure is required.")
+
+        frame = self.frame()
+        mask = pd.Series(True, index=frame.index)
+        if start is not None:
+            mask &= frame["date"] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= frame["date"] <= pd.Timestamp(end)
+        for dimension, values in (filters or {}).items():
+            mask &= frame[dimension].isin(values)
+        frame = frame[mask]
+
+        keys = list(dimensions) + ([grain] if grain else [])
+        labels = [label for d in dimensions for label in DIMENSIONS[d]]
+        aggregations = {name: MEASURES[name] for name in measures}
+        aggregations.update({label: (label, "first") for label in labels})
+
+        if not keys:
+            result = pd.DataFrame(
+                [
+                    {
+                        name: frame[column].agg(func)
+                        for name, (column, func) in aggregations.items()
+                    }
+                ]
+            )
+        else:
+            # dropna=False: hours without a project / task are a group too
+            result = (
+                frame.groupby(keys, observed=True, dropna=False, sort=False)
+                .agg(**aggregations)
+                .reset_index()
+            )
+        result = result.round({"hours": 2, "avg_hours": 2})
+        if "hours" in result:
+            result = result.sort_values("hours", ascending=False, kind="stable")
+        if grain:
+            result = result.sort_values(grain, kind="stable")
+
+        result = result[keys + labels + list(measures)].astype(object)
+        return result.where(result.notna(), None).to_dict("records")
+
+
+timesheet_cube = TimesheetCube()
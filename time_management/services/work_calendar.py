@@ -0,0 +1,135 @@
+# apps/time_management/services/work_calendar.py
+"""
+Per-process working-day calendar.
+
+Each year's Calendar rows are loaded once into a 366-byte array indexed by
+day of year (bit flags: row present / weekend / holiday), so the weekend and
+holiday checks done all over the code run without a query.
+
+Calendar post_save/post_delete (and bulk writers such as generate_calendar)
+call ``bump_version()``, which writes a new token to the shared
+``CALENDAR_CACHE_ALIAS`` cache (the database-backed "reports" cache unless
+configured), so web workers and management commands all see it. Every
+process compares its token with the cache at most every
+``CALENDAR_CACHE_CHECK_SECONDS`` and reloads lazily when it changed; loaded
+years are also dropped after ``CALENDAR_CACHE_MAX_AGE`` seconds as a safety
+net for edits made outside the ORM.
+"""
+import threading
+import time as _time
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ..models import Calendar
+
+CACHE_ALIAS = getattr(settings, "CALENDAR_CACHE_ALIAS", "reports")
+VERSION_KEY = "time_management:calendar:version"
+CHECK_SECONDS = getattr(settings, "CALENDAR_CACHE_CHECK_SECONDS", 5)
+MAX_AGE = getattr(settings, "CALENDAR_CACHE_MAX_AGE", 300)
+
+PRESENT, WEEKEND, HOLIDAY = 1, 2, 4
+
+
+class WorkCalendar:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._years = {}  # year -> (bytearray, loaded_at)
+        self._version = None
+        self._checked_at = 0.0
+
+    # ---- cache maintenance ----
+
+    def _check_version(self):
+        now = _time.monotonic()
+        if now - self._checked_at < CHECK_SECONDS:
+            return
+        self._checked_at = now
+        version = caches[CACHE_ALIAS].get(VERSION_KEY)
+        if version != self._version:
+            self._version = version
+            self._years.clear()
+
+    def _load(self, year):
+        flags = bytearray(366)
+        start = date(year, 1, 1)
+        rows = Calendar.objects.filter(
+            date__gte=start, date__lt=date(year + 1, 1, 1)
+        ).values_list("date", "is_weekend", "is_holiday")
+        for day, is_weekend, is_holiday in rows:
+            flags[(day - start).days] = (
+                PRESENT | (WEEKEND if is_weekend else 0) | (HOLIDAY if is_holiday else 0)
+            )
+        return flags
+
+    def _year(self, year):
+        with self._lock:
+            self._check_version()
+            entry = self._years.get(year)
+            if entry and _time.monotonic() - entry[1] < MAX_AGE:
+                return entry[0]
+            flags = self._load(year)
+            self._years[year] = (flags, _time.monotonic())
+            return flags
+
+    def invalidate(self):
+        with self._lock:
+            self._years.clear()
+            self._checked_at = 0.0
+
+    # ---- lookups ----
+
+    def flags(self, day):
+        return self._year(day.year)[day.timetuple().tm_yday - 1]
+
+    def year_flags(self, year) -> bytes:
+        """Raw flags of ``year`` (index = day of year - 1), for vectorized use."""
+        return bytes(self._year(year))
+
+    def has_entry(self, day):
+        return bool(self.flags(day) & PRESENT)
+
+    def is_weekend(self, day):
+        return bool(self.flags(day) & WEEKEND)
+
+    def is_holiday(self, day):
+        return bool(self.flags(day) & HOLIDAY)
+
+    def is_working_day(self, day, weekday_fallback=False):
+        """
+        False for Calendar weekends/holidays. Dates without a Calendar row
+        count as working days, or as Mon-Fri only with ``weekday_fallback``.
+        """
+        f = self.flags(day)
+        if f & PRESENT:
+            return not f & (WEEKEND | HOLIDAY)
+        return not weekday_fallback or day.weekday() < 5
+
+    def iter_working_days(self, start, end, weekday_fallback=False):
+        """Working days in [start, end], inclusive."""
+        day = start
+        while day <= end:
+            if self.is_working_day(day, weekday_fallback):
+                yield day
+            day += timedelta(days=1)
+
+    def working_days_between(self, start, end, weekday_fallback=False):
+        return sum(1 for _ in self.iter_working_days(start, end, weekday_fallback))
+
+
+work_calendar = WorkCalendar()
+
+is_working_day = work_calendar.is_working_day
+is_holiday = work_calendar.is_holiday
+is_weekend = work_calendar.is_weekend
+has_entry = work_calendar.has_entry
+iter_working_days = work_calendar.iter_working_days
+working_days_between = work_calendar.working_days_between
+
+
+def bump_version():
+    """Tell every process its loaded years are stale."""
+    caches[CACHE_ALIAS].set(VERSION_KEY, uuid.uuid4().hex, None)
+    work_calendar.invalidate()
@@ -0,0 +1,91 @@
+# apps/time_management/services/xlsx_export.py
+"""
+Bounded-memory XLSX exports on openpyxl's write-only workbook.
+
+A report is a list of ``Sheet``s, each a title, a header and any row
+iterator (a generator, ``queryset.values_list(...).iterator()``, a
+server-side cursor from ``streaming_export.stream_query``...). Rows are
+appended one at a time; write-only worksheets keep them in temporary files,
+never as cell objects in memory.
+
+Values keep their type: numbers (Decimal included) and dates become numeric
+/ date cells, None an empty cell. The finished workbook is written to a
+spooled temporary file (in memory up to ``XLSX_SPOOL_MAX_BYTES``, then on
+disk) and sent with ``FileResponse`` in blocks, or saved to any path / file
+with ``write_workbook``.
+"""
+import tempfile
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Sequence
+
+from django.conf import settings
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+SPOOL_MAX_BYTES = getattr(settings, "XLSX_SPOOL_MAX_BYTES", 8 * 1024 * 1024)
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+HEADER_FONT = Font(bold=True)
+
+
+@dataclass
+class Sheet:
+    title: str
+    header: Sequence[str]
+    rows: Iterable
+    widths: Optional[Sequence[int]] = field(default=None)
+
+
+def wants_xlsx(request):
+    # ?export=xlsx (``format`` is taken by DRF's renderer negotiation)
+    return request.query_params.get("export") == "xlsx"
+
+
+def _cell_value(value):
+    if isinstance(value, str):
+        # Control characters are not allowed in XLSX cells
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+
+def write_workbook(sheets, target):
+    """Write ``sheets`` as one workbook to ``target`` (path or binary file)."""
+    workbook = Workbook(write_only=True)
+    for sheet in sheets:
+        ws = workbook.create_sheet(title=sheet.title[:31])  # Excel limit
+        for index, width in enumerate(sheet.widths or (), start=1):
+            ws.column_dimensions[get_column_letter(index)].width = width
+        ws.freeze_panes = "A2"
+
+        header = []
+        for title in sheet.header:
+            cell = WriteOnlyCell(ws, value=title)
+            cell.font = HEADER_FONT
+            header.append(cell)
+        ws.append(header)
+
+        for row in sheet.rows:
+            ws.append([_cell_value(value) for value in row])
+    workbook.save(target)
+
+
+def xlsx_response(filename, sheets):
+    """Build the workbook in a spooled temp file and stream it back."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    write_workbook(sheets, spool)
+    spool.seek(0)
+    return FileResponse(
+        spool,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def dict_rows(dicts, keys):
+    """Row tuples out of an iterable of dicts (serializer data, values())."""
+    for item in dicts:
+        yield tuple(item.get(key) for key in keys)
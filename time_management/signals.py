@@ -27,11 +27,38 @@ from .models import (
     LeaveOpeningBalance,
     MonthlyLeaveBalance,
     CompOffRequest,
+    OrgClosure,
 )
 from time_management.management.commands.utils import (
     calculate_leave_entitlement,
     create_or_update_leaves_for_employee,
 )  # create this in utils.py
+from time_management.services.holiday_posting import (
+    post_holiday_timesheets,
+    remove_holiday_timesheets,
+)
+from time_management.services.hours_ledger import (
+    STORED_FIELDS as LEDGER_FIELDS,
+    apply_hours_delta,
+    record_deleted,
+    record_saved,
+    remember_previous,
+)
+from time_management.services.leave_balances import rebuild_balances_for
+from time_management.services.leave_materializer import (
+    materialize_leave_days,
+    materialize_leave_timesheets,
+)
+from time_management.services.org_closure import refresh_subtrees, subordinate_ids
+from time_management.services.project_facts import (
+    STORED_FIELDS as FACT_FIELDS,
+    record_cell_change,
+    remember_cell,
+)
+from time_management.services.rebuild_queue import defer_rebuilds, mark_dirty
+from time_management.services.report_cache import model_changed
+from time_management.services.team_cache import bump_org_version
+from time_management.services.work_calendar import bump_version
 
 
 # @receiver(post_save, sender=Employee)
@@ -128,55 +155,27 @@ from time_management.management.commands.utils import (
 #         pass  # Optionally log
 
 
-HOLIDAY_TASK_ASSIGN_ID = "TKASS_01011"
-
-
 @receiver([post_save, post_delete], sender=Calendar)
 def update_timesheets_for_holiday_calendar_change(sender, instance, **kwargs):
 
     holiday_date = instance.date
     if not instance.is_holiday:
         # Clean up any holiday timesheets on this date
-        TimeSheet.objects.filter(
-            date=instance.date, task_assign__task_assign_id=HOLIDAY_TASK_ASSIGN_ID
-        ).delete()
+        remove_holiday_timesheets(holiday_date)
         return
 
-    # If it's not a holiday anymore or if the date is in the future, skip creating
-    if not instance.is_holiday or holiday_date > date.today():
+    # If the date is in the future, skip creating (the daily cron posts it)
+    if holiday_date > date.today():
         return
 
-    try:
-        task_assign = TaskAssign.objects.get(task_assign_id=HOLIDAY_TASK_ASSIGN_ID)
-    except TaskAssign.DoesNotExist:
-        print(f"[WARN] TaskAssign {HOLIDAY_TASK_ASSIGN_ID} not found.")
-        return
+    # One entry per active employee, inserted in bulk; stale ones are pruned
+    post_holiday_timesheets(holiday_date, prune=True)
 
-    # Clean up any stale timesheets before creating fresh ones
-    TimeSheet.objects.filter(date=holiday_date, task_assign=task_assign).delete()
-
-    # Identify active employees on the holiday date
-    active_employees = Employee.objects.filter(
-        Q(doj__lte=instance.date),
-        Q(relieving_date__isnull=True) | Q(relieving_date__gte=instance.date),
-        status="active",
-    )
 
-    for emp in active_employees:
-        # Avoid duplicates
-        if not TimeSheet.objects.filter(
-            employee=emp, date=instance.date, task_assign=task_assign
-        ).exists():
-            TimeSheet.objects.create(
-                employee=emp,
-                date=instance.date,
-                task_assign=task_assign,
-                task_hours=8,
-                start_time=timezone.datetime.strptime("09:00", "%H:%M").time(),
-                end_time=timezone.datetime.strptime("18:00", "%H:%M").time(),
-                submitted=True,
-                approved=True,
-            )
+@receiver([post_save, post_delete], sender=Calendar)
+def invalidate_work_calendar(sender, instance, **kwargs):
+    # Every process reloads its cached calendar years lazily
+    transaction.on_commit(bump_version)
 
 
 LEAVE_PROJECT_MAP = {
@@ -204,46 +203,11 @@ def handle_timesheet_for_approved_leaves(sender, instance, created, **kwargs):
         )
         return
 
-    start_date = instance.start_date
-    end_date = instance.end_date or start_date
-    employee = instance.employee
-
-    # Always clean up existing time entries for this leave period/type
-    TimeSheet.objects.filter(
-        employee=employee, task_assign=task_assign, date__range=[start_date, end_date]
-    ).delete()
-
-    current_date = start_date
-    while current_date <= end_date:
-        # Check if the date is a weekend or holiday using the Calendar table
-        calendar_data = Calendar.objects.filter(date=current_date).first()
-
-        if calendar_data and (calendar_data.is_weekend or calendar_data.is_holiday):
-            # Skip weekend or holiday dates
-            current_date += timedelta(days=1)
-            continue
-
-        duration = float(instance.duration or 1.0)
-        hours = 4 if duration <= 0.5 else 8  # Half-day support
-
-        if not TimeSheet.objects.filter(
-            employee=employee, date=current_date, task_assign=task_assign
-        ).exists():
-            TimeSheet.objects.create(
-                employee=employee,
-                date=current_date,
-                task_assign=task_assign,
-                task_hours=hours,
-                start_time=timezone.datetime.strptime("09:00", "%H:%M").time(),
-                end_time=(
-                    timezone.datetime.strptime("13:00", "%H:%M").time()
-                    if hours == 4
-                    else timezone.datetime.strptime("18:00", "%H:%M").time()
-                ),
-                submitted=True,
-                approved=True,
-            )
-        current_date += timedelta(days=1)
+    # Diff the leave's working days against the existing entries and apply
+    # the difference in bulk (bulk writes skip post_save, so post their
+    # hours to the consumed-hours ledger in one go).
+    delta = materialize_leave_timesheets(instance, task_assign)
+    apply_hours_delta(task_assign.pk, delta)
 
 
 @receiver(post_delete, sender=LeavesTaken)
@@ -361,6 +325,56 @@ def create_or_update_hierarchy(sender, instance, created, **kwargs):
     hierarchy.save()
 
 
+@receiver(pre_save, sender=Hierarchy)
+def remember_reporting_lines(sender, instance, **kwargs):
+    instance._old_reporting_lines = None
+    if not instance._state.adding:
+        instance._old_reporting_lines = (
+            Hierarchy.objects.filter(pk=instance.pk)
+            .values_list("employee_id", "reporting_to_id", "second_reporting_to_id")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Hierarchy)
+def update_org_closure(sender, instance, created, **kwargs):
+    """Refresh the closure rows below this employee when a reporting line moved."""
+    current = (
+        instance.employee_id,
+        instance.reporting_to_id,
+        instance.second_reporting_to_id,
+    )
+    old = getattr(instance, "_old_reporting_lines", None)
+    if created or old != current:
+        refresh_subtrees([instance.employee_id, old[0] if old else None])
+
+
+@receiver(pre_delete, sender=Hierarchy)
+def remember_org_subtree(sender, instance, **kwargs):
+    # Read the subtree while it is still there: when the Employee itself is
+    # being deleted its OrgClosure rows cascade away with it
+    instance._org_below = subordinate_ids(instance.employee_id, include_second=True)
+
+
+@receiver(post_delete, sender=Hierarchy)
+def prune_org_closure(sender, instance, **kwargs):
+    OrgClosure.objects.filter(descendant_id=instance.employee_id).delete()
+    refresh_subtrees(getattr(instance, "_org_below", []))
+
+
+@receiver([post_save, post_delete], sender=Hierarchy)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=User)
+def invalidate_team_cache(sender, instance, **kwargs):
+    transaction.on_commit(bump_org_version)
+
+
+@receiver([post_save, post_delete])
+def invalidate_cached_reports(sender, instance, **kwargs):
+    # Any model of this app: cached reports built on it go stale after commit
+    model_changed(sender)
+
+
 # 1. Sync Employee.status → User.status
 @receiver(post_save, sender=Employee)
 def sync_employee_status_to_user(sender, instance, **kwargs):
@@ -394,33 +408,39 @@ def update_variation_hours(sender, instance, **kwargs):
             or 0
         )
         project.variation_hours = total_variation
-        project.save()
+        # total_hours is derived from it in Project.save()
+        project.save(update_fields=["variation_hours", "total_hours", "updated_at"])
+
+
+@receiver(pre_save, sender=TimeSheet)
+def remember_stored_timesheet(sender, instance, **kwargs):
+    # One read of the stored row for both the hours ledger and the fact cells
+    prev = None
+    if not instance._state.adding and instance.pk:
+        prev = (
+            TimeSheet.objects.filter(pk=instance.pk)
+            .values(*{*LEDGER_FIELDS, *FACT_FIELDS})
+            .first()
+        )
+    remember_previous(instance, prev)
+    remember_cell(instance, prev)
 
 
-@receiver([post_save, post_delete], sender=TimeSheet)
+@receiver(post_save, sender=TimeSheet)
 def update_consumed_hours(sender, instance, **kwargs):
-    task_assign = instance.task_assign
-    if not task_assign:
-        return
+    # Apply only the change in approved hours (project, building, task level)
+    record_saved(instance)
 
-    building_assign = task_assign.building_assign
-    if not building_assign:
-        return
 
-    project_assign = building_assign.project_assign
-    if not project_assign or not project_assign.project:
-        return
+@receiver(post_delete, sender=TimeSheet)
+def release_consumed_hours(sender, instance, **kwargs):
+    record_deleted(instance)
 
-    project = project_assign.project
-    total_consumed = (
-        TimeSheet.objects.filter(
-            task_assign__building_assign__project_assign__project=project, approved=True
-        ).aggregate(Sum("task_hours"))["task_hours__sum"]
-        or 0
-    )
 
-    project.consumed_hours = total_consumed
-    project.save()
+@receiver([post_save, post_delete], sender=TimeSheet)
+def refresh_project_fact_cells(sender, instance, **kwargs):
+    # ProjectHoursDaily cells of the old and new (task, date) are recomputed
+    record_cell_change(instance)
 
 
 # @receiver(pre_save, sender=Calendar)
@@ -505,69 +525,19 @@ def update_consumed_hours(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=LeavesTaken)
+@defer_rebuilds()
 def create_leave_days_on_approval(sender, instance, created, **kwargs):
     """
     Automatically create LeaveDay records when a leave is approved or pending.
     Skips weekends and holidays from Calendar.
     Ensures no overlapping leave days exist for the same employee.
+    Balance rebuilds for the touched months run once, after the whole range.
     """
-    # Only keep LeaveDay rows for pending/approved leaves
-    if instance.status not in ["approved", "pending"]:
-        LeaveDay.objects.filter(leave_taken=instance).delete()
-        return
-
-    if not instance.start_date or not instance.end_date:
-        return
-
-    # Remove old LeaveDay rows *for this leave only*
-    LeaveDay.objects.filter(leave_taken=instance).delete()
-
-    current_date = instance.start_date
-    # Decide per-day duration (your existing logic)
-    per_day_duration = 0.5 if (instance.duration and instance.duration % 1) else 1.0
-
-    while current_date <= instance.end_date:
-        # ---- calendar / weekend / holiday check ----
-        cal = Calendar.objects.filter(date=current_date).first()
-
-        is_weekend = False
-        is_holiday = False
-
-        if cal:
-            is_weekend = cal.is_weekend
-            is_holiday = cal.is_holiday
-        else:
-            # Fallback: treat Sat/Sun as weekend if calendar row missing
-            # weekday(): Monday=0 ... Sunday=6
-            is_weekend = current_date.weekday() >= 5
-
-        if is_weekend or is_holiday:
-            # Skip creating a LeaveDay for this date
-            current_date += timedelta(days=1)
-            continue
-
-        # ---- create/update the working-day LeaveDay ----
-        try:
-            LeaveDay.objects.update_or_create(
-                employee=instance.employee,
-                date=current_date,
-                defaults={
-                    "leave_taken": instance,
-                    "duration": per_day_duration,
-                    "leave_type": instance.leave_type,
-                    "status": instance.status,
-                },
-            )
-        except IntegrityError:
-            # Another approved leave already occupies this date for this employee
-            print(
-                f"Skipped overlapping leave day: {instance.employee} on {current_date}"
-            )
-
-        current_date += timedelta(days=1)
+    materialize_leave_days(instance)
 
 
 @receiver(post_delete, sender=LeavesTaken)
+@defer_rebuilds()
 def delete_leave_days_on_leave_delete(sender, instance, **kwargs):
     """
     When a LeavesTaken record is deleted:
@@ -631,7 +601,7 @@ def _rebuild_month(employee_id, year, month):
 
 def _touch_month(instance: LeaveDay):
     y, m = instance.date.year, instance.date.month
-    _rebuild_month(instance.employee_id, y, m)
+    mark_dirty(instance.employee_id, y, m, availed=True)
 
 
 @receiver(post_save, sender=LeaveDay)
@@ -644,180 +614,23 @@ def leave_day_deleted(sender, instance: LeaveDay, **kwargs):
     _touch_month(instance)
 
 
-# ---- normalization exactly to your DB keys ----
-# Your LeaveDay.leave_type should already be one of these;
-# if not, adapt normalize() to map variants.
-VALID_TYPES = {"casual_leave", "sick_leave", "comp_off", "earned_leave"}
-
-
-def normalize(leave_type: str) -> str:
-    return leave_type.strip().lower() if leave_type else ""
-
-
-def _zero_dict():
-    return {
-        "casual_leave": Decimal("0.0"),
-        "sick_leave": Decimal("0.0"),
-        "comp_off": Decimal("0.0"),
-        "earned_leave": Decimal("0.0"),
-    }
-
-
-def _month_availed(employee_id: int, year: int, month: int):
-    """
-    Sum approved LeaveDay.duration per leave_type for the (year, month).
-    Only keys in VALID_TYPES are counted; others ignored.
-    """
-    rows = (
-        LeaveDay.objects.filter(
-            employee_id=employee_id,
-            status="approved",
-            date__year=year,
-            date__month=month,
-        )
-        .values("leave_type")
-        .annotate(total=Coalesce(Sum("duration"), Decimal("0.0")))
-    )
-
-    av = _zero_dict()
-    for r in rows:
-        lt = normalize(r["leave_type"])
-        if lt in VALID_TYPES:
-            av[lt] = r["total"] or Decimal("0.0")
-    return av
-
-
-def _comp_off_earned(employee_id: str, year: int, month: int) -> Decimal:
-    """
-    Sum of Comp-Off credits earned in the month = APPROVED compoff requests
-    whose 'date' falls in (year, month).
-    """
-    return (
-        CompOffRequest.objects.filter(
-            employee_id=employee_id,
-            status="approved",
-            date__year=year,
-            date__month=month,
-        )
-        .aggregate(s=Coalesce(Sum("duration"), Decimal("0.0")))
-        .get("s", Decimal("0.0"))
-    )
-
-
-def _get_january_opening(employee_id: int, year: int):
-    """
-    Opening for January comes from LeaveOpeningBalance (or zeros if missing).
-    """
-    opening = _zero_dict()
-    ob = LeaveOpeningBalance.objects.filter(employee_id=employee_id, year=year).first()
-    if ob:
-        opening["casual_leave"] = ob.casual_leave_opening or Decimal("0.0")
-        opening["sick_leave"] = ob.sick_leave_opening or Decimal("0.0")
-        opening["comp_off"] = ob.comp_off_opening or Decimal("0.0")
-        opening["earned_leave"] = ob.earned_leave_opening or Decimal("0.0")
-    return opening
-
-
-@transaction.atomic
 def rebuild_monthly_balances(employee_id: int, year: int, start_month: int):
     """
     Recompute MonthlyLeaveBalance for employee/year from start_month..12.
-
-    Logic per month m:
-      opening(m)  = january_opening if m == 1 else previous_month.balance
-      availed(m)  = sum(approved LeaveDay by type for (year, m))
-      balance(m)  = opening(m) - availed(m)          # for each type
-      save/update MonthlyLeaveBalance(m)
-
-    Notes:
-      * If you accrue comp-off "earned" separately, add + earned(m) into comp_off.
-      * If editing January, this cascades through the whole year — desired.
+    See services.leave_balances.rebuild_balances_for for the month chain.
     """
-    # Ensure start_month bounds
-    m0 = max(1, min(12, start_month))
-
-    # Seed opening for the first month we will compute
-    if m0 == 1:
-        opening = _get_january_opening(employee_id, year)
-    else:
-        prev = MonthlyLeaveBalance.objects.filter(
-            employee_id=employee_id, year=year, month=m0 - 1
-        ).first()
-        if prev:
-            opening = {
-                "casual_leave": prev.casual_leave_balance,
-                "sick_leave": prev.sick_leave_balance,
-                "comp_off": prev.comp_off_balance,
-                "earned_leave": prev.earned_leave_balance,
-            }
-        else:
-            # If the previous month record is missing, bootstrap from January opening
-            # and rebuild from January to keep chain consistent.
-            opening = _get_january_opening(employee_id, year)
-            m0 = 1  # rebuild whole year forward
-
-    # Walk months m0..12
-    for m in range(m0, 12 + 1):
-        av = _month_availed(employee_id, year, m)
-        co_earned = _comp_off_earned(employee_id, year, m)
-
-        # If you have comp-off earned accruals per month, add here, e.g.:
-        # earned_comp = _comp_off_earned(employee_id, year, m)   # implement if needed
-        # closing["comp_off"] = opening["comp_off"] + earned_comp - av["comp_off"]
-        closing = {
-            "casual_leave": opening["casual_leave"] - av["casual_leave"],
-            "sick_leave": opening["sick_leave"] - av["sick_leave"],
-            # NOTE: comp_off adds earned credits for the month
-            "comp_off": opening["comp_off"] + co_earned - av["comp_off"],
-            "earned_leave": opening["earned_leave"] - av["earned_leave"],
-        }
-
-        obj, _ = MonthlyLeaveBalance.objects.get_or_create(
-            employee_id=employee_id,
-            year=year,
-            month=m,
-            defaults=dict(
-                casual_leave_balance=closing["casual_leave"],
-                sick_leave_balance=closing["sick_leave"],
-                comp_off_balance=closing["comp_off"],
-                earned_leave_balance=closing["earned_leave"],
-            ),
-        )
-        # Update even if it existed
-        obj.casual_leave_balance = closing["casual_leave"]
-        obj.sick_leave_balance = closing["sick_leave"]
-        obj.comp_off_balance = closing["comp_off"]
-        obj.earned_leave_balance = closing["earned_leave"]
-        obj.save(
-            update_fields=[
-                "casual_leave_balance",
-                "sick_leave_balance",
-                "comp_off_balance",
-                "earned_leave_balance",
-            ]
-        )
-
-        # Next month opening = this month closing
-        opening = closing
+    rebuild_balances_for([employee_id], year, start_month)
 
 
 @receiver(post_save, sender=LeaveDay)
 def leave_day_saved(sender, instance: LeaveDay, created, **kwargs):
-    # Rebuild from the affected month forward in the same year
-    rebuild_monthly_balances(
-        employee_id=instance.employee_id,
-        year=instance.date.year,
-        start_month=instance.date.month,
-    )
+    # Rebuild from the affected month forward in the same year (on commit)
+    mark_dirty(instance.employee_id, instance.date.year, instance.date.month)
 
 
 @receiver(post_delete, sender=LeaveDay)
 def leave_day_deleted(sender, instance: LeaveDay, **kwargs):
-    rebuild_monthly_balances(
-        employee_id=instance.employee_id,
-        year=instance.date.year,
-        start_month=instance.date.month,
-    )
+    mark_dirty(instance.employee_id, instance.date.year, instance.date.month)
 
 
 @receiver(post_save, sender=LeaveOpeningBalance)
@@ -826,12 +639,7 @@ def leave_opening_saved(sender, instance: LeaveOpeningBalance, created, **kwargs
     Whenever the opening row is created/edited, rebuild the whole year Jan..Dec
     so monthly openings/closings reflect the new January opening.
     """
-    with transaction.atomic():
-        rebuild_monthly_balances(
-            employee_id=instance.employee_id,
-            year=instance.year,
-            start_month=1,  # IMPORTANT: start from January
-        )
+    mark_dirty(instance.employee_id, instance.year, 1)  # IMPORTANT: from January
 
 
 @receiver(post_delete, sender=LeaveOpeningBalance)
@@ -840,12 +648,7 @@ def leave_opening_deleted(sender, instance: LeaveOpeningBalance, **kwargs):
     If an opening row is deleted, treat January opening as 0.0 and rebuild Jan..Dec.
     (Adjust if you prefer to also delete the MonthlyLeaveBalance rows.)
     """
-    with transaction.atomic():
-        rebuild_monthly_balances(
-            employee_id=instance.employee_id,
-            year=instance.year,
-            start_month=1,
-        )
+    mark_dirty(instance.employee_id, instance.year, 1)
 
 
 @receiver(post_save, sender=CompOffRequest)
@@ -858,10 +661,10 @@ def compoff_saved(sender, instance: CompOffRequest, **kwargs):
       - manager re-approval, etc.
     """
     y, m = instance.date.year, instance.date.month
-    rebuild_monthly_balances(employee_id=instance.employee_id, year=y, start_month=m)
+    mark_dirty(instance.employee_id, y, m)
 
 
 @receiver(post_delete, sender=CompOffRequest)
 def compoff_deleted(sender, instance: CompOffRequest, **kwargs):
     y, m = instance.date.year, instance.date.month
-    rebuild_monthly_balances(employee_id=instance.employee_id, year=y, start_month=m)
+    mark_dirty(instance.employee_id, y, m)
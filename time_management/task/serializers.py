@@ -42,6 +42,7 @@ class TaskAssignSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskAssign
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 class TaskAndAssignSerializer(serializers.ModelSerializer):
@@ -88,6 +89,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = "__all__"
+        read_only_fields = ["consumed_hours"]
 
 
 class ProjectAssignSerializer(serializers.ModelSerializer):
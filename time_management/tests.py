@@ -1,3 +1,260 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from time_management.models import (
+    Building,
+    BuildingAssign,
+    Employee,
+    Hierarchy,
+    IdSequence,
+    Project,
+    ProjectAssign,
+    Task,
+    TaskAssign,
+    TimeSheet,
+    Variation,
+)
+from time_management.project.serializers import ProjectSerializer
+from time_management.services.org_closure import (
+    manager_ids,
+    rebuild_closure,
+    subordinate_ids,
+    subordinates,
+)
+from time_management.services.sequences import (
+    SEQUENCES,
+    allocate_ids,
+    allocator,
+    assign_ids,
+    next_id,
+    sync_sequence,
+)
+
+
+def _number(pk):
+    return int(pk.rsplit("_", 1)[1])
+
+
+class SequenceAllocatorTests(TransactionTestCase):
+    # Block caching only happens outside an atomic block, which TestCase
+    # would always wrap the test in.
+
+    def setUp(self):
+        allocator.reset()
+
+    def tearDown(self):
+        allocator.reset()
+
+    def counter(self, model):
+        prefix = SEQUENCES[model.__name__].prefix
+        return IdSequence.objects.get(prefix=prefix).last_value
+
+    def test_ids_have_the_model_format(self):
+        self.assertEqual(next_id(Building), "BLD_00001")
+        self.assertEqual(next_id(TimeSheet), "TS_000000000000001")
+
+    def test_block_reserved_outside_atomic(self):
+        block_size = SEQUENCES["TimeSheet"].block_size
+        first, second = next_id(TimeSheet), next_id(TimeSheet)
+
+        self.assertEqual(_number(second), _number(first) + 1)
+        # One counter bump for the whole block, the second id came from memory
+        self.assertEqual(self.counter(TimeSheet), block_size)
+
+    def test_inside_atomic_reserves_exactly_one(self):
+        with transaction.atomic():
+            first = next_id(TimeSheet)
+            second = next_id(TimeSheet)
+            self.assertEqual(self.counter(TimeSheet), 2)
+        self.assertEqual((_number(first), _number(second)), (1, 2))
+
+    def test_rolled_back_reservation_is_not_cached(self):
+        try:
+            with transaction.atomic():
+                next_id(TimeSheet)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # The counter rolled back with the transaction: the id is reissued,
+        # never a number from a block that does not exist in the table
+        self.assertEqual(next_id(TimeSheet), "TS_000000000000001")
+
+    def test_assign_ids_and_next_id_never_overlap(self):
+        cached = [next_id(TimeSheet)]  # leaves a block in the allocator
+        bulk = [TimeSheet(task_hours=1) for _ in range(120)]
+        assign_ids(bulk)
+        cached += [next_id(TimeSheet) for _ in range(80)]
+        with transaction.atomic():
+            cached.append(next_id(TimeSheet))
+        bulk_ids = [obj.pk for obj in bulk]
+
+        self.assertEqual(len(set(bulk_ids)), len(bulk_ids))
+        self.assertEqual(len(set(cached)), len(cached))
+        self.assertFalse(set(bulk_ids) & set(cached))
+
+    def test_allocate_ids_is_one_contiguous_run(self):
+        ids = allocate_ids(TimeSheet, 5)
+        first = _number(ids[0])
+        self.assertEqual([_number(pk) for pk in ids], list(range(first, first + 5)))
+        self.assertEqual(allocate_ids(TimeSheet, 0), [])
+
+    def test_assign_ids_keeps_existing_pks(self):
+        objs = [
+            TimeSheet(timesheet_id="TS_KEEP", task_hours=1),
+            TimeSheet(task_hours=1),
+        ]
+        assign_ids(objs)
+        self.assertEqual(objs[0].pk, "TS_KEEP")
+        self.assertTrue(objs[1].pk.startswith("TS_"))
+
+    def test_first_use_seeds_from_existing_rows(self):
+        Building.objects.create(building_id="BLD_00041", building_title="Imported")
+        self.assertEqual(next_id(Building), "BLD_00042")
+
+    def test_sync_sequence_moves_past_imported_rows(self):
+        next_id(Building)
+        Building.objects.create(building_id="BLD_00100", building_title="Imported")
+        self.assertEqual(sync_sequence(Building), 100)
+        self.assertEqual(next_id(Building), "BLD_00101")
+        # ... and never backwards
+        Building.objects.filter(pk="BLD_00100").delete()
+        self.assertEqual(sync_sequence(Building), 101)
+
+
+class SequenceInTransactionTests(TestCase):
+    def test_saves_get_distinct_ids(self):
+        allocator.reset()
+        first = Building.objects.create(building_title="A")
+        second = Building.objects.create(building_title="B")
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(_number(second.pk), _number(first.pk) + 1)
+
+
+class ConsumedHoursLedgerTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            project_title="Tower", project_code="TWR", estimated_hours=100
+        )
+        project_assign = ProjectAssign.objects.create(
+            project=self.project, project_hours=100
+        )
+        building = Building.objects.create(building_title="Block A")
+        self.building_assign = BuildingAssign.objects.create(
+            building=building, project_assign=project_assign, building_hours=100
+        )
+        task = Task.objects.create(task_title="Drawings", task_code="DRW")
+        self.task_assign = TaskAssign.objects.create(
+            task=task, building_assign=self.building_assign, task_hours=100
+        )
+        self.timesheet = TimeSheet.objects.create(
+            task_assign=self.task_assign, task_hours=Decimal("8.00")
+        )
+
+    def approve(self):
+        self.timesheet.approved = True
+        self.timesheet.save()
+
+    def assertConsumed(self, hours):
+        for obj in (self.project, self.building_assign, self.task_assign):
+            obj.refresh_from_db()
+            self.assertEqual(obj.consumed_hours, Decimal(hours), type(obj).__name__)
+
+    def test_approve_unapprove_and_delete(self):
+        self.approve()
+        self.assertConsumed("8.00")
+        self.timesheet.task_hours = Decimal("6.50")
+        self.timesheet.save()
+        self.assertConsumed("6.50")
+        self.timesheet.approved = False
+        self.timesheet.save()
+        self.assertConsumed("0.00")
+        self.approve()
+        self.timesheet.delete()
+        self.assertConsumed("0.00")
+
+    def test_variation_save_keeps_concurrent_approval(self):
+        # The variation's project was loaded before the timesheet got approved
+        stale_project = Project.objects.get(pk=self.project.pk)
+        variation = Variation(project=stale_project, title="Extra floor", hours=10)
+        self.approve()
+        variation.save()
+
+        self.assertConsumed("8.00")
+        self.assertEqual(self.project.variation_hours, Decimal("10.00"))
+        self.assertEqual(self.project.total_hours, Decimal("110.00"))
+
+    def test_project_put_keeps_concurrent_approval(self):
+        stale_project = Project.objects.get(pk=self.project.pk)
+        serializer = ProjectSerializer(
+            stale_project,
+            data={"project_title": "Tower 2", "consumed_hours": "999.00"},
+            partial=True,
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.approve()
+        serializer.save()
+
+        self.assertConsumed("8.00")
+        self.assertEqual(self.project.project_title, "Tower 2")
+
+    def test_full_save_of_stale_assigns_keeps_concurrent_approval(self):
+        stale_building = BuildingAssign.objects.get(pk=self.building_assign.pk)
+        stale_task = TaskAssign.objects.get(pk=self.task_assign.pk)
+        self.approve()
+        stale_building.status = "inprogress"
+        stale_building.save()
+        stale_task.status = "inprogress"
+        stale_task.save()
+
+        self.assertConsumed("8.00")
+
+
+class OrgClosureTests(TestCase):
+    def setUp(self):
+        # A <- B <- C <- D (reporting_to), E reports to A as second manager.
+        # bulk_create: the Employee post_save leave / hierarchy setup is not
+        # what is under test here.
+        Employee.objects.bulk_create(
+            Employee(employee_id=emp_id, employee_name=emp_id)
+            for emp_id in "ABCDE"
+        )
+        Hierarchy.objects.bulk_create(
+            [
+                Hierarchy(hierarchy_id="HR_A", employee_id="A"),
+                Hierarchy(hierarchy_id="HR_B", employee_id="B", reporting_to_id="A"),
+                Hierarchy(hierarchy_id="HR_C", employee_id="C", reporting_to_id="B"),
+                Hierarchy(hierarchy_id="HR_D", employee_id="D", reporting_to_id="C"),
+                Hierarchy(
+                    hierarchy_id="HR_E", employee_id="E", second_reporting_to_id="A"
+                ),
+            ]
+        )
+        rebuild_closure()
+
+    def ids(self, employees):
+        return [employee.employee_id for employee in employees]
+
+    def test_max_depth_limits_to_the_managers_own_rows(self):
+        self.assertEqual(self.ids(subordinates("A", max_depth=1)), ["B"])
+        self.assertEqual(self.ids(subordinates("A", max_depth=2)), ["B", "C"])
+        self.assertEqual(self.ids(subordinates("B", max_depth=2)), ["C", "D"])
+        self.assertEqual(sorted(subordinate_ids("A", max_depth=2)), ["B", "C"])
+
+    def test_all_levels_nearest_first(self):
+        self.assertEqual(self.ids(subordinates("A")), ["B", "C", "D"])
+        self.assertEqual(
+            self.ids(subordinates("A", include_second=True)), ["B", "E", "C", "D"]
+        )
+        self.assertEqual(manager_ids("D"), ["C", "B", "A"])
+
+    def test_reparenting_refreshes_the_subtree(self):
+        hierarchy = Hierarchy.objects.get(employee_id="C")
+        hierarchy.reporting_to_id = "A"
+        hierarchy.save()
+
+        self.assertEqual(self.ids(subordinates("A", max_depth=1)), ["B", "C"])
+        self.assertEqual(self.ids(subordinates("B")), [])
+        self.assertEqual(manager_ids("D"), ["C", "A"])
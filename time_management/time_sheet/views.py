@@ -5,7 +5,7 @@ from time_management.time_sheet.serializers import (
     TimeSheetDataSerializer,
     TimeSheetTaskSerializer,
 )
-from time_management.hierarchy.serializers import emp_under_manager
+from time_management.services.team_cache import team_ids
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -96,9 +96,9 @@ def timesheet_under_manager(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = emp_under_manager(manager)
+        employee_ids = team_ids(manager, depth=2)
 
-        timesheet_qs = TimeSheet.objects.filter(employee__in=employees)
+        timesheet_qs = TimeSheet.objects.filter(employee_id__in=employee_ids)
 
         serializer = TimeSheetTaskSerializer(timesheet_qs, many=True)
 
@@ -125,9 +125,9 @@ def manager_weekly_timesheet(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = emp_under_manager(manager)
+        employee_ids = team_ids(manager, depth=2)
 
-        timesheet_qs = TimeSheet.objects.filter(employee__in=employees)
+        timesheet_qs = TimeSheet.objects.filter(employee_id__in=employee_ids)
         if today:
             weekday = today.weekday()
             start = today - timedelta(days=weekday)
@@ -172,9 +172,9 @@ def manager_daily_timesheet(request, employee_id=None):
         except Employee.DoesNotExist:
             return Response({"error": "Employee not found"}, status=404)
 
-        employees = emp_under_manager(manager)
+        employee_ids = team_ids(manager, depth=2)
 
-        timesheet_qs = TimeSheet.objects.filter(employee__in=employees)
+        timesheet_qs = TimeSheet.objects.filter(employee_id__in=employee_ids)
         if today:
             # weekday = today.weekday()
             # start = today - timedelta(days=weekday)